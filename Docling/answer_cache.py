@@ -0,0 +1,141 @@
+"""
+Semantic answer cache for the Q&A app.
+
+The same questions ("what's docling?") are asked over and over, and each one
+paid for retrieval and a full gpt-4o-mini generation. AnswerCache stores
+(query embedding, supporting chunk ids, answer) in a small local LanceDB table.
+A new question reuses a cached answer when:
+
+1. the cosine similarity of the two query embeddings is at least threshold, and
+2. every supporting chunk still exists in the "docling" table. chunk_ids are
+   hashes of the chunk text and metadata, so a re-ingested or edited document
+   invalidates all answers built on it; such entries are deleted on lookup.
+
+Cached answers are replayed with stream_answer() through the same st.write_stream
+path as live answers.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+import lancedb
+from lancedb.pydantic import LanceModel, Vector
+
+from retrieval_cache import fetch_rows
+
+# Dimensions of the query embeddings (text-embedding-3-small)
+EMBEDDING_DIMS = 1536
+
+
+class CachedAnswer(LanceModel):
+    answer_id: str
+    query: str
+    vector: Vector(EMBEDDING_DIMS)  # type: ignore
+    chunk_ids: List[str]
+    answer: str
+    created_at: float
+
+
+@dataclass
+class AnswerCacheStats:
+    lookups: int = 0
+    hits: int = 0
+    # Similar question found, but its supporting chunks changed
+    stale: int = 0
+    stores: int = 0
+
+    @property
+    def misses(self) -> int:
+        return self.lookups - self.hits
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+@dataclass
+class AnswerHit:
+    query: str
+    answer: str
+    chunk_ids: List[str]
+    similarity: float
+
+
+class AnswerCache:
+    """Answers keyed by query embedding, valid while their chunks are unchanged."""
+
+    def __init__(
+        self,
+        uri: str = "data/answer_cache",
+        table_name: str = "answers",
+        threshold: float = 0.95,
+        max_age: Optional[float] = 7 * 24 * 3600,
+    ):
+        """Initialize the cache.
+
+        Args:
+            uri: LanceDB directory of the cache (separate from the chunk database)
+            table_name: Name of the cache table
+            threshold: Minimum cosine similarity between query embeddings for a hit
+            max_age: Seconds after which a cached answer is no longer served
+        """
+        self.db = lancedb.connect(uri)
+        self.table = self.db.create_table(table_name, schema=CachedAnswer, exist_ok=True)
+        self.threshold = threshold
+        self.max_age = max_age
+        self.stats = AnswerCacheStats()
+        self._lock = threading.Lock()
+
+    def _chunks_unchanged(self, chunks_table, chunk_ids: List[str]) -> bool:
+        return fetch_rows(chunks_table, chunk_ids).num_rows == len(set(chunk_ids))
+
+    def lookup(self, vector: List[float], chunks_table) -> Optional[AnswerHit]:
+        """Most similar cached answer, if similar enough and still supported."""
+        self.stats.lookups += 1
+        rows = (
+            self.table.search(vector)
+            .metric("cosine")
+            .select(["answer_id", "query", "chunk_ids", "answer", "created_at"])
+            .limit(1)
+            .to_list()
+        )
+        if not rows:
+            return None
+        row = rows[0]
+        similarity = 1.0 - row["_distance"]
+        if similarity < self.threshold:
+            return None
+        expired = self.max_age is not None and time.time() - row["created_at"] > self.max_age
+        if expired or not self._chunks_unchanged(chunks_table, row["chunk_ids"]):
+            self.stats.stale += 1
+            with self._lock:
+                self.table.delete(f"answer_id = '{row['answer_id']}'")
+            return None
+        self.stats.hits += 1
+        return AnswerHit(row["query"], row["answer"], list(row["chunk_ids"]), similarity)
+
+    def store(self, query: str, vector: List[float], chunk_ids: List[str], answer: str) -> None:
+        """Cache an answer; chunk_ids must list every chunk it was built from
+        (PackedContext.chunk_ids, which includes merged chunks)."""
+        if not answer or not chunk_ids:
+            return  # answers without supporting chunks cannot be invalidated
+        record = CachedAnswer(
+            answer_id=f"{time.time_ns():x}",
+            query=query,
+            vector=vector,
+            chunk_ids=chunk_ids,
+            answer=answer,
+            created_at=time.time(),
+        )
+        with self._lock:
+            self.table.add([record])
+        self.stats.stores += 1
+
+
+def stream_answer(answer: str, delay: float = 0.0) -> Iterator[str]:
+    """Replay a cached answer word by word, for st.write_stream."""
+    for i, word in enumerate(answer.split(" ")):
+        if delay:
+            time.sleep(delay)
+        yield word if i == 0 else f" {word}"
@@ -0,0 +1,320 @@
+"""
+Benchmark harness for Docling conversion settings.
+
+Runs every configuration against a local fixture corpus (guidlines.pdf plus
+generated PDFs and HTML pages), with warmup and repeated runs. Each configuration
+runs in a fresh process so its peak RSS is measured in isolation. Reported per
+configuration: wall time statistics, pages/sec, peak RSS and per-stage timings
+(backend load, layout, table structure, OCR, ... from docling's pipeline profiler,
+plus export). Results are written to JSON and can be compared against an earlier
+run to catch regressions.
+
+Usage:
+    python -m Docling.benchmark_conversion --out bench.json --repeats 5
+    python -m Docling.benchmark_conversion --out new.json --compare bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from datetime import datetime
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from Docling.conversion_engine import ConverterConfig
+
+# resource is Unix-only; on Windows peak RSS comes from psutil if installed
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Configurations of the old docling_tuned.py script
+BENCHMARK_CONFIGS: Dict[str, ConverterConfig] = {
+    "docling_defaults": ConverterConfig(
+        backend="dlparse_v2", do_ocr=True, do_table_structure=True, do_cell_matching=True, num_threads=4
+    ),
+    "full_features": ConverterConfig(
+        do_ocr=True, do_table_structure=True, do_cell_matching=True, num_threads=4
+    ),
+    "no_ocr_no_tables": ConverterConfig(num_threads=4),
+    "no_ocr_no_tables_2_threads": ConverterConfig(num_threads=2, document_timeout=60),
+    "dlparse_v2": ConverterConfig(backend="dlparse_v2", num_threads=2, document_timeout=60),
+}
+
+# Docling profiler scopes mapped to the names used in the report
+STAGE_NAMES = {
+    "page_init": "backend_load",
+    "ocr": "ocr",
+    "layout": "layout",
+    "table_structure": "table_structure",
+    "page_assemble": "page_assemble",
+    "reading_order": "reading_order",
+    "doc_build": "doc_build",
+    "doc_assemble": "doc_assemble",
+    "doc_enrich": "doc_enrich",
+    "pipeline_total": "pipeline_total",
+}
+
+LOREM = (
+    "Docling converts documents into a unified representation. The layout model "
+    "detects paragraphs, headings, tables and figures on every page, while the "
+    "backend extracts the text cells that are later assembled in reading order."
+)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, None if unavailable."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, "peak_wset", memory.rss) / (1024 * 1024)
+
+
+# --------------------------------------------------------------
+# Fixture corpus
+# --------------------------------------------------------------
+
+
+def write_text_pdf(path: Path, pages: List[List[str]]) -> None:
+    """Write a minimal born-digital PDF with one text line per entry."""
+    objects: List[bytes] = []
+    page_ids = []
+    for i, _ in enumerate(pages):
+        page_ids.append(4 + 2 * i)
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, lines in enumerate(pages):
+        content = ["BT", "/F1 11 Tf", "14 TL", "50 790 Td"]
+        for line in lines:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            content.append(f"({escaped}) Tj T*")
+        content.append("ET")
+        stream = "\n".join(content).encode("latin-1", "replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_ids[i] + 1} 0 R >>".encode()
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+    path.write_bytes(bytes(out))
+
+
+def build_fixture_corpus(
+    out_dir: Path, num_pdfs: int = 3, pages_per_pdf: int = 10, num_html: int = 3
+) -> List[Path]:
+    """Create the local benchmark corpus and return its files."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    files = []
+
+    guidelines = Path("guidlines.pdf")
+    if guidelines.exists():
+        target = out_dir / guidelines.name
+        shutil.copyfile(guidelines, target)
+        files.append(target)
+
+    for n in range(num_pdfs):
+        pages = []
+        for p in range(pages_per_pdf):
+            lines = [f"Section {p + 1}.{n + 1}"]
+            lines += [f"{LOREM[:90]} ({k})" for k in range(40)]
+            pages.append(lines)
+        path = out_dir / f"generated_{n + 1}.pdf"
+        write_text_pdf(path, pages)
+        files.append(path)
+
+    for n in range(num_html):
+        rows = "".join(
+            f"<tr><td>Item {r}</td><td>{r * 7 % 13}</td><td>{r * 3.5:.1f}</td></tr>"
+            for r in range(20)
+        )
+        sections = "".join(
+            f"<h2>Section {s + 1}</h2><p>{LOREM}</p><ul><li>First point</li><li>Second point</li></ul>"
+            for s in range(10)
+        )
+        html = (
+            f"<html><head><title>Fixture page {n + 1}</title></head><body>"
+            f"<h1>Fixture page {n + 1}</h1>{sections}"
+            f"<table><tr><th>Name</th><th>Count</th><th>Price</th></tr>{rows}</table>"
+            f"</body></html>"
+        )
+        path = out_dir / f"generated_{n + 1}.html"
+        path.write_text(html, encoding="utf-8")
+        files.append(path)
+    return files
+
+
+# --------------------------------------------------------------
+# Running a configuration (inside its own process)
+# --------------------------------------------------------------
+
+
+def _run_config(config: ConverterConfig, files: List[str], warmup: int, repeats: int) -> dict:
+    from docling.datamodel.settings import settings
+
+    settings.debug.profile_pipeline_timings = True
+    converter = config.build()
+
+    for _ in range(warmup):
+        for file in files:
+            converter.convert(file)
+
+    run_seconds = []
+    stage_seconds: Dict[str, List[float]] = {}
+    pages = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        stages: Dict[str, float] = {}
+        pages = 0
+        for file in files:
+            result = converter.convert(file)
+            pages += max(len(result.pages), 1)
+            for scope, item in (result.timings or {}).items():
+                name = STAGE_NAMES.get(scope, scope)
+                stages[name] = stages.get(name, 0.0) + sum(item.times)
+            export_start = time.perf_counter()
+            result.document.export_to_markdown()
+            result.document.export_to_dict()
+            stages["export"] = stages.get("export", 0.0) + time.perf_counter() - export_start
+        run_seconds.append(time.perf_counter() - start)
+        for name, seconds in stages.items():
+            stage_seconds.setdefault(name, []).append(seconds)
+
+    median = statistics.median(run_seconds)
+    return {
+        "config": asdict(config),
+        "documents": len(files),
+        "pages": pages,
+        "warmup": warmup,
+        "repeats": repeats,
+        "seconds": {
+            "median": median,
+            "mean": statistics.mean(run_seconds),
+            "stdev": statistics.stdev(run_seconds) if len(run_seconds) > 1 else 0.0,
+            "min": min(run_seconds),
+            "max": max(run_seconds),
+            "runs": run_seconds,
+        },
+        "pages_per_second": pages / median if median else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages_median_seconds": {
+            name: statistics.median(values) for name, values in sorted(stage_seconds.items())
+        },
+    }
+
+
+def run_benchmark(
+    configs: Dict[str, ConverterConfig], files: List[Path], warmup: int = 1, repeats: int = 3
+) -> dict:
+    """Benchmark every configuration, each in a fresh process."""
+    try:
+        docling_version = version("docling")
+    except PackageNotFoundError:
+        docling_version = "unknown"
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "docling": docling_version,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "files": [str(f) for f in files],
+        },
+        "results": {},
+    }
+    for name, config in configs.items():
+        print(f"Benchmarking {name} ...")
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            result = executor.submit(
+                _run_config, config, [str(f) for f in files], warmup, repeats
+            ).result()
+        report["results"][name] = result
+        peak = result["peak_rss_mb"]
+        print(
+            f"  median {result['seconds']['median']:.2f}s, "
+            f"{result['pages_per_second']:.2f} pages/s, "
+            f"peak RSS {f'{peak:.0f} MB' if peak is not None else 'n/a'}"
+        )
+    return report
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> List[str]:
+    """List configurations whose median time grew by more than threshold."""
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        old_median = old["seconds"]["median"]
+        new_median = result["seconds"]["median"]
+        if old_median and (new_median - old_median) / old_median > threshold:
+            regressions.append(
+                f"{name}: median {old_median:.2f}s -> {new_median:.2f}s "
+                f"(+{(new_median / old_median - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Docling conversion settings")
+    parser.add_argument("--out", default="benchmark_results.json", help="JSON report path")
+    parser.add_argument("--corpus-dir", default="data/benchmark_corpus")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--configs", nargs="*", choices=sorted(BENCHMARK_CONFIGS))
+    parser.add_argument("--compare", help="Earlier JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    files = build_fixture_corpus(Path(args.corpus_dir))
+    configs = {n: BENCHMARK_CONFIGS[n] for n in (args.configs or BENCHMARK_CONFIGS)}
+    report = run_benchmark(configs, files, warmup=args.warmup, repeats=args.repeats)
+
+    Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results saved to {args.out}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(baseline, report, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
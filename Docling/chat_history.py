@@ -0,0 +1,137 @@
+"""
+Conversation-history compaction.
+
+get_chat_response() used to send the whole session history on every turn, so
+prompt size and latency grew without bound; by turn 50 every answer was slow.
+ChatHistory keeps:
+
+- every message, for display,
+- a rolling summary of older turns,
+- the most recent turns verbatim.
+
+prompt_messages() returns summary + recent turns within max_tokens, counted with
+OpenAITokenizerWrapper. After a response has been shown, compact() folds the
+turns that fell out of the verbatim window into the summary in the background
+(through the retrieval service's event loop), so the user never waits for it.
+Until the new summary arrives, prompt_messages() drops the oldest verbatim turns
+if needed to stay within budget.
+
+Example:
+    history = ChatHistory(OpenAITokenizerWrapper(), summarize=service.summarize)
+    history.append("user", prompt)
+    answer = get_chat_response(history.prompt_messages(), context, service)
+    history.append("assistant", answer)
+    history.compact()
+"""
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+# Approximate per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class ChatHistory:
+    """Recent turns verbatim plus a rolling summary, within a token budget."""
+
+    def __init__(
+        self,
+        tokenizer,
+        summarize: Callable[[str, List[dict]], "Future[str]"],
+        max_tokens: int = 2000,
+        keep_recent: int = 6,
+        summary_tokens: int = 400,
+    ):
+        """Initialize the history.
+
+        Args:
+            tokenizer: OpenAITokenizerWrapper (anything with count_tokens(text))
+            summarize: Starts folding messages into a summary in the background:
+                called with (current summary, messages), returns a Future of the
+                new summary, e.g. ServiceClient.summarize
+            max_tokens: Budget of the history part of the prompt
+            keep_recent: Number of most recent messages always kept verbatim
+                (as far as the budget allows)
+            summary_tokens: Target length of the summary
+        """
+        self.tokenizer = tokenizer
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summary_tokens = summary_tokens
+        self.messages: List[dict] = []
+        self.summary = ""
+        # messages[:summarized_upto] are covered by the summary
+        self.summarized_upto = 0
+        self._pending: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def append(self, role: str, content: str) -> None:
+        with self._lock:
+            self.messages.append({"role": role, "content": content})
+
+    def _tokens(self, messages: List[dict]) -> int:
+        return sum(
+            self.tokenizer.count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages
+        )
+
+    def _summary_message(self) -> List[dict]:
+        if not self.summary:
+            return []
+        content = f"Summary of the earlier conversation:\n{self.summary}"
+        return [{"role": "system", "content": content}]
+
+    def prompt_messages(self) -> List[dict]:
+        """Summary plus as many recent messages as fit the budget (at least the last)."""
+        with self._lock:
+            summary = self._summary_message()
+            recent = self.messages[self.summarized_upto :]
+        budget = self.max_tokens - self._tokens(summary)
+        while len(recent) > 1 and self._tokens(recent) > budget:
+            recent = recent[1:]
+        return summary + recent
+
+    def _fold_point(self) -> int:
+        """Index up to which messages should be folded into the summary."""
+        end = len(self.messages)
+        start = max(self.summarized_upto, end - self.keep_recent)
+        while start < end - 1 and (
+            self._tokens(self.messages[start:]) + self.summary_tokens > self.max_tokens
+        ):
+            start += 1
+        return start
+
+    def compact(self) -> Optional[Future]:
+        """Start folding old messages into the summary, unless already running.
+
+        Returns:
+            The Future of the background summarization, or None if nothing to do
+        """
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return None
+            fold_to = self._fold_point()
+            if fold_to <= self.summarized_upto:
+                return None
+            to_fold = self.messages[self.summarized_upto : fold_to]
+            future = self.summarize(self.summary, to_fold)
+            self._pending = future
+
+        def apply(done: Future) -> None:
+            if done.cancelled() or done.exception() is not None:
+                return  # keep the old summary; the next compact() retries
+            with self._lock:
+                self.summary = done.result()
+                self.summarized_upto = max(self.summarized_upto, fold_to)
+
+        future.add_done_callback(apply)
+        return future
+
+    def stats(self) -> dict:
+        prompt = self.prompt_messages()
+        return {
+            "messages": len(self.messages),
+            "summarized": self.summarized_upto,
+            "prompt_messages": len(prompt),
+            "prompt_tokens": self._tokens(prompt),
+        }
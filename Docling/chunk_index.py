@@ -0,0 +1,268 @@
+"""
+Incremental indexing of document chunks into LanceDB.
+
+Instead of rebuilding the "docling" table with mode="overwrite" and re-embedding
+everything, every chunk gets a chunk_id: the hash of its text and ChunkMetadata.
+On each run only chunks whose id is not yet in the table are embedded and added.
+Rows of documents that changed (ids no longer produced) or disappeared from the
+corpus are deleted.
+"""
+import hashlib
+import json
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+from lancedb.embeddings import get_registry
+from lancedb.pydantic import LanceModel, Vector
+
+func = get_registry().get("openai").create(name="text-embedding-3-small")
+
+# LanceDB filters take SQL, so ids are deleted in batches of this size
+DELETE_BATCH_SIZE = 1000
+
+
+# Define the metadata schema
+
+class ChunkMetadata(LanceModel):
+    # You must order the fields in alphabetical order.
+    # This is a requirement of the Pydantic implementation.
+    filename: str | None
+    page_numbers: List[int] | None
+    title: str | None
+
+
+# Define the main Schema
+
+class Chunks(LanceModel):
+    chunk_id: str
+    text: str = func.SourceField()
+    vector: Vector(func.ndims()) = func.VectorField()  # type: ignore
+    metadata: ChunkMetadata
+
+
+def ensure_chunk_id_index(table, replace: bool = False) -> bool:
+    """Create the BTREE index on chunk_id used by chunk_id IN (...) lookups.
+
+    Those lookups serve retrieval cache hits (fetch_rows) and stale-row deletes;
+    without the index each one scans the table.
+
+    Returns:
+        True if the index was created
+    """
+    indexed = {column for index in table.list_indices() for column in index.columns}
+    if "chunk_id" in indexed and not replace:
+        return False
+    table.create_scalar_index("chunk_id", index_type="BTREE", replace=True)
+    return True
+
+
+def make_chunk_id(text: str, metadata: dict) -> str:
+    """Stable hash of a chunk's text and metadata."""
+    payload = json.dumps({"text": text, "metadata": metadata}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chunk_to_record(chunk) -> dict:
+    """Turn a docling chunk into a row for the Chunks table (without the vector)."""
+    metadata = {
+        "filename": chunk.meta.origin.filename,
+        "page_numbers": [
+            page_no
+            for page_no in sorted(
+                set(prov.page_no for item in chunk.meta.doc_items for prov in item.prov)
+            )
+        ]
+        or None,
+        "title": chunk.meta.headings[0] if chunk.meta.headings else None,
+    }
+    return {
+        "chunk_id": make_chunk_id(chunk.text, metadata),
+        "text": chunk.text,
+        "metadata": metadata,
+    }
+
+
+@dataclass
+class SyncStats:
+    added: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+
+class IncrementalIndexer:
+    """Keeps a LanceDB table in sync with a set of chunk records."""
+
+    def __init__(self, db, table_name: str = "docling", schema=Chunks, embedding_stage=None):
+        """Open (or create) the table.
+
+        Args:
+            db: A LanceDB connection
+            table_name: Name of the chunks table
+            schema: LanceModel schema of the table; must contain chunk_id
+            embedding_stage: Optional EmbeddingStage that computes vectors before
+                insertion. Without it, LanceDB embeds through the registry function.
+        """
+        self.db = db
+        self.embedding_stage = embedding_stage
+        self.table_name = table_name
+        self.schema = schema
+        # Streaming mode: stale ids per filename, deleted once that document's
+        # new rows are written (plan and write run on different threads)
+        self._pending: Dict[Optional[str], List] = {}
+        self._lock = threading.Lock()
+        self.seen_files: Set[Optional[str]] = set()
+        if table_name in db.table_names():
+            self.table = db.open_table(table_name)
+            if "chunk_id" not in self.table.schema.names:
+                # Tables built before chunk ids existed are rebuilt once
+                self.table = db.create_table(table_name, schema=schema, mode="overwrite")
+        else:
+            self.table = db.create_table(table_name, schema=schema)
+
+    def existing_ids(self) -> Dict[str, Set[str]]:
+        """Return the chunk ids already in the table, grouped by filename."""
+        num_rows = self.table.count_rows()
+        ids: Dict[str, Set[str]] = {}
+        if num_rows == 0:
+            return ids
+        rows = (
+            self.table.search()
+            .select(["chunk_id", "metadata"])
+            .limit(num_rows)
+            .to_arrow()
+            .to_pylist()
+        )
+        for row in rows:
+            ids.setdefault(row["metadata"]["filename"], set()).add(row["chunk_id"])
+        return ids
+
+    def ids_for_file(self, filename: Optional[str]) -> Set[str]:
+        """Return the chunk ids already stored for one document."""
+        if filename is None:
+            where = "metadata.filename IS NULL"
+        else:
+            escaped = filename.replace("'", "''")
+            where = f"metadata.filename = '{escaped}'"
+        rows = (
+            self.table.search()
+            .where(where)
+            .select(["chunk_id"])
+            .limit(self.table.count_rows() or 1)
+            .to_arrow()
+        )
+        return set(rows.column("chunk_id").to_pylist())
+
+    def plan_document(self, filename: Optional[str], records: List[dict]) -> List[dict]:
+        """Sync step for a single document, used by the streaming pipeline.
+
+        Returns the records that still have to be embedded and added. The
+        document's stale rows are deleted by mark_written() once all of those
+        records are in the table, so a failed embed or write never leaves the
+        document without rows. Only this document's ids are loaded, so memory
+        does not depend on the size of the table.
+
+        Args:
+            filename: Filename of the document; a document that now yields no
+                chunks at all still gets its old rows deleted
+            records: All chunk records of the document
+        """
+        new_chunks = {record["chunk_id"]: record for record in records}
+        old_ids = self.ids_for_file(filename)
+        stale = list(old_ids - new_chunks.keys())
+        to_add = [r for cid, r in new_chunks.items() if cid not in old_ids]
+        with self._lock:
+            self.seen_files.add(filename)
+            if to_add and stale:
+                pending = self._pending.setdefault(filename, [0, []])
+                pending[0] += len(to_add)
+                pending[1].extend(stale)
+        if not to_add:
+            # Nothing to write first
+            self.delete_ids(stale)
+        return to_add
+
+    def mark_written(self, records: List[dict]) -> None:
+        """Delete stale rows of the documents whose new records are all written."""
+        counts = Counter(record["metadata"]["filename"] for record in records)
+        ready: List[str] = []
+        with self._lock:
+            for filename, count in counts.items():
+                pending = self._pending.get(filename)
+                if pending is None:
+                    continue
+                pending[0] -= count
+                if pending[0] <= 0:
+                    ready.extend(self._pending.pop(filename)[1])
+        self.delete_ids(ready)
+
+    def sync(self, records: Iterable[dict], prune_missing: bool = False) -> SyncStats:
+        """Add new chunks and delete stale ones.
+
+        Args:
+            records: Chunk records as produced by chunk_to_record. Every document
+                present in records is treated as complete: its rows that are not
+                in records are deleted.
+            prune_missing: Also delete documents that do not appear in records at all
+
+        Returns:
+            Counts of added, deleted and unchanged chunks
+
+        New rows are added before stale ones are deleted, so a failed embedding
+        leaves the previous rows of a changed document in place.
+        """
+        new_by_file: Dict[Optional[str], Dict[str, dict]] = {}
+        for record in records:
+            new_by_file.setdefault(record["metadata"]["filename"], {}).setdefault(
+                record["chunk_id"], record
+            )
+
+        existing = self.existing_ids()
+        stats = SyncStats()
+        to_add: List[dict] = []
+        to_delete: List[str] = []
+
+        for filename, new_chunks in new_by_file.items():
+            old_ids = existing.get(filename, set())
+            to_add.extend(r for cid, r in new_chunks.items() if cid not in old_ids)
+            to_delete.extend(old_ids - new_chunks.keys())
+            stats.unchanged += len(old_ids & new_chunks.keys())
+
+        if prune_missing:
+            for filename, old_ids in existing.items():
+                if filename not in new_by_file:
+                    to_delete.extend(old_ids)
+
+        if to_add:
+            # Only the new rows are embedded
+            if self.embedding_stage is not None:
+                self.embedding_stage.embed_records(to_add)
+            self.table.add(to_add)
+        stats.added = len(to_add)
+
+        self.delete_ids(to_delete)
+        stats.deleted = len(to_delete)
+        return stats
+
+    def prune_files(self, keep: Iterable[Optional[str]]) -> int:
+        """Delete the rows of every document whose filename is not in keep.
+
+        Returns:
+            Number of deleted chunks
+        """
+        keep = set(keep)
+        to_delete = [
+            cid
+            for filename, ids in self.existing_ids().items()
+            if filename not in keep
+            for cid in ids
+        ]
+        self.delete_ids(to_delete)
+        return len(to_delete)
+
+    def delete_ids(self, chunk_ids: List[str]) -> None:
+        for start in range(0, len(chunk_ids), DELETE_BATCH_SIZE):
+            batch = chunk_ids[start : start + DELETE_BATCH_SIZE]
+            id_list = ", ".join(f"'{cid}'" for cid in batch)
+            self.table.delete(f"chunk_id IN ({id_list})")
@@ -0,0 +1,197 @@
+"""
+Token-budgeted context packing.
+
+get_context() used to paste every retrieved chunk into the system prompt, each
+up to MAX_TOKENS (8191) tokens, with no dedup and no budget, so one question
+could send 40k tokens. ContextPacker turns retrieved chunks into a prompt context
+that fits a token budget:
+
+1. near-duplicates (SimHash Hamming distance <= max_hamming) are dropped, keeping
+   the higher-scored copy,
+2. chunks of the same file on the same or neighbouring pages are merged, so the
+   citation is not repeated,
+3. chunks are added in score order while they fit the budget; the first one
+   that does not fit is cut at a sentence boundary.
+
+Token counts come from OpenAITokenizerWrapper, which memoizes them.
+
+Example:
+    packer = ContextPacker(OpenAITokenizerWrapper(), max_tokens=3000)
+    packed = packer.pack(get_context(prompt, service, num_results=10))
+    packed.text, packed.tokens
+"""
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+from retrieval import RetrievedChunk, format_chunk, format_context
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+CONTEXT_SEPARATOR = "\n\n"
+
+
+def simhash(text: str, bits: int = 64, shingle: int = 3) -> int:
+    """SimHash fingerprint over word shingles; similar texts differ in few bits."""
+    words = re.findall(r"\w+", text.lower())
+    shingles = [" ".join(words[i : i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    weights = [0] * bits
+    for item in shingles:
+        value = int.from_bytes(
+            hashlib.blake2b(item.encode("utf-8"), digest_size=bits // 8).digest(), "little"
+        )
+        for bit in range(bits):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _pages_adjacent(a: Optional[List[int]], b: Optional[List[int]]) -> bool:
+    if not a or not b:
+        return False
+    return min(b) <= max(a) + 1 and min(a) <= max(b) + 1
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    chunks: List[RetrievedChunk]
+    duplicates_dropped: int = 0
+    merged: int = 0
+    truncated: bool = False
+    # Chunks left out because the budget was exhausted
+    overflow: List[RetrievedChunk] = field(default_factory=list)
+
+    @property
+    def chunk_ids(self) -> List[str]:
+        """Ids of every chunk in the context, including those merged into others."""
+        return [chunk_id for chunk in self.chunks for chunk_id in chunk.chunk_ids]
+
+
+class ContextPacker:
+    """Deduplicates, merges and budget-fills retrieved chunks."""
+
+    def __init__(
+        self,
+        tokenizer,
+        max_tokens: int = 3000,
+        max_hamming: int = 3,
+        merge_adjacent: bool = True,
+        min_truncated_tokens: int = 64,
+    ):
+        """Initialize the packer.
+
+        Args:
+            tokenizer: OpenAITokenizerWrapper (anything with count_tokens(text))
+            max_tokens: Token budget of the whole context
+            max_hamming: SimHash distance at or below which chunks count as duplicates
+            merge_adjacent: Merge chunks of the same file on neighbouring pages
+            min_truncated_tokens: Do not add a truncated chunk shorter than this
+        """
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.max_hamming = max_hamming
+        self.merge_adjacent = merge_adjacent
+        self.min_truncated_tokens = min_truncated_tokens
+
+    def deduplicate(self, chunks: List[RetrievedChunk]) -> List[RetrievedChunk]:
+        """Drop near-duplicates; chunks must be in score order."""
+        kept, fingerprints = [], []
+        for chunk in chunks:
+            fingerprint = simhash(chunk.text)
+            if any(hamming(fingerprint, other) <= self.max_hamming for other in fingerprints):
+                continue
+            kept.append(chunk)
+            fingerprints.append(fingerprint)
+        return kept
+
+    def merge(self, chunks: List[RetrievedChunk]) -> List[RetrievedChunk]:
+        """Merge chunks of the same file on the same or neighbouring pages.
+
+        The merged chunk takes the place (and score) of its best-scored part;
+        texts are joined in page order and chunk_ids keeps the ids of all parts.
+        """
+        merged: List[RetrievedChunk] = []
+        for chunk in chunks:
+            for i, group in enumerate(merged):
+                if chunk.filename and chunk.filename == group.filename and _pages_adjacent(
+                    group.page_numbers, chunk.page_numbers
+                ):
+                    parts = sorted([group, chunk], key=lambda c: min(c.page_numbers))
+                    merged[i] = group._replace(
+                        text="\n".join(part.text for part in parts),
+                        merged_ids=tuple(
+                            dict.fromkeys([*group.chunk_ids, *chunk.chunk_ids])
+                        ),
+                        page_numbers=sorted(set(group.page_numbers) | set(chunk.page_numbers)),
+                        title=group.title or chunk.title,
+                    )
+                    break
+            else:
+                merged.append(chunk)
+        return merged
+
+    def truncate(self, chunk: RetrievedChunk, budget: int) -> Optional[RetrievedChunk]:
+        """Longest sentence prefix of chunk whose formatted form fits budget."""
+        sentences = SENTENCE_END.split(chunk.text)
+        lo, hi = 0, len(sentences) - 1  # number of sentences known to fit / not fit
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            candidate = chunk._replace(text=" ".join(sentences[:mid]))
+            if self.tokenizer.count_tokens(format_chunk(candidate)) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        if lo == 0:
+            return None
+        truncated = chunk._replace(text=" ".join(sentences[:lo]))
+        if self.tokenizer.count_tokens(truncated.text) < self.min_truncated_tokens:
+            return None
+        return truncated
+
+    def pack(self, chunks: Iterable[RetrievedChunk]) -> PackedContext:
+        """Build the prompt context for retrieved chunks (e.g. SearchResults)."""
+        ranked = sorted(
+            chunks, key=lambda c: c.score if c.score is not None else float("-inf"), reverse=True
+        )
+        unique = self.deduplicate(ranked)
+        duplicates_dropped = len(ranked) - len(unique)
+        candidates = self.merge(unique) if self.merge_adjacent else unique
+
+        separator_tokens = self.tokenizer.count_tokens(CONTEXT_SEPARATOR)
+        packed: List[RetrievedChunk] = []
+        used, truncated = 0, False
+        overflow: List[RetrievedChunk] = []
+        for chunk in candidates:
+            if truncated:
+                overflow.append(chunk)
+                continue
+            cost = self.tokenizer.count_tokens(format_chunk(chunk))
+            extra = separator_tokens if packed else 0
+            if used + extra + cost <= self.max_tokens:
+                packed.append(chunk)
+                used += extra + cost
+                continue
+            # The best chunk that does not fit is cut at a sentence boundary; after
+            # that the budget is full. If it cannot be cut, smaller chunks may still fit
+            cut = self.truncate(chunk, self.max_tokens - used - extra)
+            if cut is not None:
+                packed.append(cut)
+                truncated = True
+            else:
+                overflow.append(chunk)
+
+        text = format_context(packed)
+        return PackedContext(
+            text=text,
+            tokens=self.tokenizer.count_tokens(text),
+            chunks=packed,
+            duplicates_dropped=duplicates_dropped,
+            merged=len(unique) - len(candidates),
+            truncated=truncated,
+            overflow=overflow,
+        )
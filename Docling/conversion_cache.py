@@ -0,0 +1,199 @@
+"""
+On-disk cache for Docling conversion results.
+
+Conversion is by far the slowest step of ingestion, and most inputs do not change
+between runs. Entries are keyed by the SHA-256 of the document bytes plus a
+fingerprint of the PdfPipelineOptions, the PDF backend and the docling version,
+so changing any of those produces a fresh conversion. Each entry stores the
+gzipped export_to_dict() form of the DoclingDocument. When the cache grows past
+max_bytes, the least recently used entries are evicted (file mtime is bumped on
+every hit).
+"""
+import gzip
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from importlib.metadata import PackageNotFoundError, version
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from docling.datamodel.base_models import ConversionStatus, DocumentStream
+from docling.datamodel.pipeline_options import PdfPipelineOptions
+from docling.document_converter import DocumentConverter
+from docling_core.types.doc import DoclingDocument
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ConversionCache:
+    """Content-addressed store of converted documents with size-based LRU eviction."""
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = "data/conversion_cache",
+        max_bytes: int = 2 * 1024**3,
+    ):
+        """Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding the cache entries
+            max_bytes: Total size above which the oldest entries are evicted
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        for path in self._entries():
+            self.stats.entries += 1
+            self.stats.bytes += path.stat().st_size
+
+    @staticmethod
+    def fingerprint(pipeline_options: PdfPipelineOptions, backend: type) -> str:
+        """Hash of everything besides the input bytes that affects the output."""
+        try:
+            docling_version = version("docling")
+        except PackageNotFoundError:
+            docling_version = "unknown"
+        payload = json.dumps(
+            {
+                "pipeline_options": pipeline_options.model_dump(mode="json"),
+                "backend": f"{backend.__module__}.{backend.__qualname__}",
+                "docling": docling_version,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def key(content: bytes, fingerprint: str) -> str:
+        content_hash = hashlib.sha256(content).hexdigest()
+        return hashlib.sha256(f"{content_hash}:{fingerprint}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[DoclingDocument]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, OSError, json.JSONDecodeError):
+            self.stats.misses += 1
+            return None
+        os.utime(path)  # mark as recently used
+        self.stats.hits += 1
+        return DoclingDocument.model_validate(data)
+
+    def put(self, key: str, document: DoclingDocument) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        old_size = path.stat().st_size if path.exists() else None
+
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(document.export_to_dict(), f)
+        os.replace(tmp_path, path)
+
+        if old_size is None:
+            self.stats.entries += 1
+        else:
+            self.stats.bytes -= old_size
+        self.stats.bytes += path.stat().st_size
+        self._evict()
+
+    def clear(self) -> None:
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+        self.stats.entries = 0
+        self.stats.bytes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json.gz"
+
+    def _entries(self):
+        return self.cache_dir.glob("*/*.json.gz")
+
+    def _evict(self) -> None:
+        if self.stats.bytes <= self.max_bytes:
+            return
+        entries = sorted(
+            ((p.stat().st_mtime, p.stat().st_size, p) for p in self._entries()),
+            key=lambda e: e[0],
+        )
+        for _, size, path in entries:
+            if self.stats.bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self.stats.bytes -= size
+            self.stats.entries -= 1
+            self.stats.evictions += 1
+
+
+def read_source(source: Union[str, Path]) -> Tuple[str, bytes]:
+    """Read a local path or URL and return (filename, content)."""
+    source = str(source)
+    if urlparse(source).scheme in ("http", "https"):
+        response = requests.get(source, timeout=60)
+        response.raise_for_status()
+        name = Path(urlparse(source).path).name or "document"
+        return name, response.content
+    return Path(source).name, Path(source).read_bytes()
+
+
+def convert_cached(
+    converter: DocumentConverter,
+    source: Union[str, Path],
+    cache: ConversionCache,
+    pipeline_options: PdfPipelineOptions,
+    backend: type,
+    convert_bytes: Optional[
+        Callable[[str, bytes], Tuple[DoclingDocument, ConversionStatus]]
+    ] = None,
+) -> DoclingDocument:
+    """Convert a document, reusing a cached result when the bytes are unchanged.
+
+    Only fully successful conversions are cached; partial or timed-out ones are
+    returned but converted again next time.
+
+    Args:
+        converter: Converter built from pipeline_options and backend
+        source: Local path or URL of the document
+        cache: The conversion cache
+        pipeline_options: Pipeline options the converter was built with
+        backend: PDF backend class the converter was built with
+        convert_bytes: Optional replacement for converter on a cache miss, called
+            with (filename, content) and returning (document, status), e.g.
+            sharded conversion of large PDFs. It must produce the same result
+            as converter.
+
+    Returns:
+        The converted DoclingDocument
+    """
+    name, content = read_source(source)
+    key = cache.key(content, cache.fingerprint(pipeline_options, backend))
+
+    document = cache.get(key)
+    if document is None:
+        # Convert from the bytes already in memory so URLs are downloaded once
+        if convert_bytes is not None:
+            document, status = convert_bytes(name, content)
+        else:
+            result = converter.convert(DocumentStream(name=name, stream=BytesIO(content)))
+            document, status = result.document, result.status
+        if status == ConversionStatus.SUCCESS:
+            cache.put(key, document)
+    return document
@@ -0,0 +1,265 @@
+"""
+Parallel document conversion.
+
+Building a DocumentConverter is expensive: the first conversion loads the layout
+(and optionally OCR / table structure) models. The engine below starts a pool of
+worker processes, builds one converter per worker and keeps it warm for every
+document that worker takes from the shared queue. Results come back either in
+input order or as soon as they finish.
+
+Example:
+    with ConversionEngine(max_workers=4) as engine:
+        for output in engine.convert_all(urls):
+            if output.document:
+                docs.append(output.document)
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import torch
+from docling.backend.docling_parse_v2_backend import DoclingParseV2DocumentBackend
+from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
+from docling.datamodel.base_models import ConversionStatus, InputFormat
+from docling.datamodel.pipeline_options import PdfPipelineOptions
+from docling.document_converter import DocumentConverter, PdfFormatOption
+from docling_core.types.doc import DoclingDocument
+
+Source = Union[str, Path]
+# A source with the configuration it should be converted with
+RoutedSource = Tuple[Source, "ConverterConfig"]
+
+BACKENDS = {
+    "pypdfium": PyPdfiumDocumentBackend,
+    "dlparse_v2": DoclingParseV2DocumentBackend,
+}
+
+
+@dataclass(frozen=True)
+class ConverterConfig:
+    """Picklable description of a DocumentConverter.
+
+    Workers receive this instead of a converter, build the converter themselves
+    and cache it, so the models are loaded once per process.
+    """
+
+    backend: str = "pypdfium"
+    do_ocr: bool = False
+    do_table_structure: bool = False
+    do_cell_matching: bool = False
+    num_threads: int = 1
+    document_timeout: Optional[float] = None
+
+    def pipeline_options(self) -> PdfPipelineOptions:
+        pipeline_options = PdfPipelineOptions()
+        pipeline_options.do_ocr = self.do_ocr
+        pipeline_options.do_table_structure = self.do_table_structure
+        pipeline_options.table_structure_options.do_cell_matching = self.do_cell_matching
+        pipeline_options.accelerator_options.num_threads = self.num_threads
+        pipeline_options.document_timeout = self.document_timeout
+        return pipeline_options
+
+    def backend_class(self):
+        return BACKENDS[self.backend]
+
+    def build(self) -> DocumentConverter:
+        return DocumentConverter(
+            format_options={
+                InputFormat.PDF: PdfFormatOption(
+                    pipeline_options=self.pipeline_options(),
+                    backend=self.backend_class(),
+                )
+            }
+        )
+
+
+@dataclass
+class ConversionOutput:
+    """Result of converting one source.
+
+    Attributes:
+        index: Position of the source in the input iterable
+        source: The path or URL that was converted
+        status: The docling ConversionStatus value (or "failure" on exception)
+        document: The converted document, None if conversion failed
+        error: Error message if conversion failed
+        elapsed: Seconds spent converting inside the worker
+    """
+
+    index: int
+    source: str
+    status: str
+    document: Optional[DoclingDocument]
+    error: Optional[str]
+    elapsed: float
+
+
+# --------------------------------------------------------------
+# Worker side
+# --------------------------------------------------------------
+
+# One warm converter per config, per worker process
+_converters: Dict[ConverterConfig, DocumentConverter] = {}
+
+
+def _get_converter(config: ConverterConfig) -> DocumentConverter:
+    converter = _converters.get(config)
+    if converter is None:
+        converter = config.build()
+        # Instantiate the PDF pipeline now so model loading is not billed
+        # to the first document
+        converter.initialize_pipeline(InputFormat.PDF)
+        _converters[config] = converter
+    return converter
+
+
+def _init_worker(config: ConverterConfig) -> None:
+    # Each process gets its own share of cores; without this every worker
+    # spins up a full-size torch thread pool and they fight each other.
+    # torch is already imported here, so OMP_NUM_THREADS would come too late.
+    torch.set_num_threads(config.num_threads)
+    _get_converter(config)
+
+
+def _convert_one(
+    index: int, source: str, config: ConverterConfig
+) -> Tuple[int, str, str, Optional[dict], Optional[str], float]:
+    start = time.perf_counter()
+    try:
+        result = _get_converter(config).convert(source, raises_on_error=False)
+        document = None
+        if result.status in (ConversionStatus.SUCCESS, ConversionStatus.PARTIAL_SUCCESS):
+            # Documents travel back as plain dicts, which pickle much faster
+            # than the pydantic model graph
+            document = result.document.export_to_dict()
+        error = "; ".join(e.error_message for e in result.errors) or None
+        status = result.status.value
+    except Exception as e:
+        document, error, status = None, str(e), "failure"
+    return index, source, status, document, error, time.perf_counter() - start
+
+
+# --------------------------------------------------------------
+# Parent side
+# --------------------------------------------------------------
+
+
+class ConversionEngine:
+    """Pool of worker processes, each holding a warm DocumentConverter."""
+
+    def __init__(
+        self,
+        config: Optional[ConverterConfig] = None,
+        max_workers: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        """Initialize the engine.
+
+        Args:
+            config: Converter configuration used by every worker
+            max_workers: Number of worker processes (default: CPU count)
+            max_in_flight: Maximum number of documents submitted but not yet
+                yielded, including finished ones waiting for an earlier document
+                in ordered mode. Keeps memory bounded for very long source lists
+                (default: 2 per worker)
+        """
+        self.config = config or ConverterConfig()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or 2 * self.max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "ConversionEngine":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start(self) -> None:
+        if self._executor is None:
+            # "spawn" keeps the workers clear of torch/OpenMP state already
+            # initialized in the parent, which can deadlock after fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.config,),
+            )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def convert_all(
+        self, sources: Iterable[Union[Source, RoutedSource]], ordered: bool = True
+    ) -> Iterator[ConversionOutput]:
+        """Convert many sources in parallel.
+
+        Args:
+            sources: Paths or URLs to convert. An item may also be a
+                (source, ConverterConfig) pair to override the engine's config for
+                that document; workers keep one warm converter per config.
+            ordered: Yield results in input order if True, otherwise as they finish
+
+        Yields:
+            One ConversionOutput per source
+        """
+        self.start()
+        pending = set()
+        finished: Dict[int, ConversionOutput] = {}
+        next_index = 0
+        source_iter = enumerate(sources)
+        exhausted = False
+
+        while True:
+            # Results held back for ordering count too, so one slow document
+            # cannot make every later result pile up in memory
+            while not exhausted and len(pending) + len(finished) < self.max_in_flight:
+                try:
+                    index, source = next(source_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                config = self.config
+                if isinstance(source, tuple):
+                    source, config = source
+                pending.add(self._executor.submit(_convert_one, index, str(source), config))
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                output = self._to_output(*future.result())
+                if not ordered:
+                    yield output
+                else:
+                    finished[output.index] = output
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+
+    def convert(self, source: Source) -> ConversionOutput:
+        """Convert a single source on one of the workers."""
+        return next(self.convert_all([source]))
+
+    @staticmethod
+    def _to_output(index, source, status, document, error, elapsed) -> ConversionOutput:
+        if document is not None:
+            document = DoclingDocument.model_validate(document)
+        return ConversionOutput(index, source, status, document, error, elapsed)
+
+
+def convert_all(
+    sources: Iterable[Source],
+    config: Optional[ConverterConfig] = None,
+    max_workers: Optional[int] = None,
+    ordered: bool = True,
+) -> Iterator[ConversionOutput]:
+    """Convenience wrapper that runs a ConversionEngine for one batch of sources."""
+    with ConversionEngine(config=config, max_workers=max_workers) as engine:
+        yield from engine.convert_all(sources, ordered=ordered)
@@ -0,0 +1,175 @@
+"""
+Adaptive conversion profiles.
+
+OCR, table structure recognition and the PDF backend swing conversion time by an
+order of magnitude (see docling_tuned.py), yet most of our corpus is born-digital
+and needs none of the expensive steps. prescan_pdf() looks at a PDF cheaply with
+pypdfium2 (no layout model, a sample of pages only): is there a text layer, how
+many images, how many vector paths (ruled tables are drawn with lines). The scan
+routes the document to the cheapest profile that still extracts it correctly.
+
+Example:
+    with ConversionEngine() as engine:
+        for output in engine.convert_all(route_sources(paths)):
+            ...
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+from urllib.parse import urlparse
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from conversion_engine import ConverterConfig, Source
+
+PROFILES: Dict[str, ConverterConfig] = {
+    # Born-digital text, no tables: fastest backend, no models besides layout
+    "digital": ConverterConfig(backend="dlparse_v2"),
+    # Born-digital with ruled tables
+    "digital_tables": ConverterConfig(
+        backend="dlparse_v2", do_table_structure=True, do_cell_matching=True
+    ),
+    # Some pages lack a text layer (scanned inserts); OCR needed, cells from the text layer
+    "mixed": ConverterConfig(backend="dlparse_v2", do_ocr=True, do_table_structure=True),
+    # Image-only scans: everything comes from OCR
+    "scanned": ConverterConfig(do_ocr=True, do_table_structure=True),
+}
+
+# Pages with fewer characters than this are treated as having no text layer
+MIN_CHARS_PER_PAGE = 50
+# Average number of vector paths per page above which we expect ruled tables
+TABLE_PATHS_PER_PAGE = 40
+# A page without text counts as scanned if an image covers this share of it
+# (a logo on a blank or short page does not)
+SCAN_IMAGE_AREA = 0.5
+# Share of sampled pages that look scanned above which OCR is switched on
+MIXED_SCANNED_RATIO = 0.1
+
+
+@dataclass
+class PdfScan:
+    """Cheap facts about a PDF, gathered from a sample of its pages."""
+
+    num_pages: int
+    pages_sampled: int
+    pages_with_text: int
+    chars: int
+    images: int
+    paths: int
+    textless_pages_with_images: int = 0
+
+    @property
+    def text_ratio(self) -> float:
+        return self.pages_with_text / self.pages_sampled if self.pages_sampled else 0.0
+
+    @property
+    def scanned_ratio(self) -> float:
+        """Share of sampled pages with no text layer but a page-sized image."""
+        if not self.pages_sampled:
+            return 0.0
+        return self.textless_pages_with_images / self.pages_sampled
+
+    @property
+    def paths_per_page(self) -> float:
+        return self.paths / self.pages_sampled if self.pages_sampled else 0.0
+
+
+def _sample_pages(num_pages: int, max_pages: int) -> List[int]:
+    """At most max_pages page indexes spread evenly from the first to the last page."""
+    if num_pages <= max_pages:
+        return list(range(num_pages))
+    if max_pages <= 1:
+        return [0]
+    return sorted({round(i * (num_pages - 1) / (max_pages - 1)) for i in range(max_pages)})
+
+
+def _covered_share(obj, page_area: float) -> float:
+    left, bottom, right, top = obj.get_pos()
+    return (right - left) * (top - bottom) / page_area if page_area else 0.0
+
+
+def prescan_pdf(source: Union[str, Path, bytes], max_pages: int = 12) -> PdfScan:
+    """Inspect a PDF without running any Docling models.
+
+    Args:
+        source: Path to the PDF or its bytes
+        max_pages: Maximum number of pages to sample, spread over the document
+
+    Returns:
+        Counts of pages, text, images and vector paths on the sampled pages
+    """
+    pdf = pdfium.PdfDocument(source)
+    try:
+        num_pages = len(pdf)
+        scan = PdfScan(num_pages, 0, 0, 0, 0, 0)
+        for index in _sample_pages(num_pages, max_pages):
+            page = pdf[index]
+            width, height = page.get_size()
+            textpage = page.get_textpage()
+            chars = textpage.count_chars()
+            has_text = chars >= MIN_CHARS_PER_PAGE
+            scan.pages_sampled += 1
+            scan.chars += chars
+            if has_text:
+                scan.pages_with_text += 1
+            image_share = 0.0
+            for obj in page.get_objects(max_depth=2):
+                if obj.type == pdfium_c.FPDF_PAGEOBJ_IMAGE:
+                    scan.images += 1
+                    image_share = max(image_share, _covered_share(obj, width * height))
+                elif obj.type == pdfium_c.FPDF_PAGEOBJ_PATH:
+                    scan.paths += 1
+            if not has_text and image_share >= SCAN_IMAGE_AREA:
+                scan.textless_pages_with_images += 1
+            textpage.close()
+            page.close()
+        return scan
+    finally:
+        pdf.close()
+
+
+def select_profile(scan: PdfScan, default: str = "digital") -> str:
+    """Pick the cheapest profile that still extracts the document correctly.
+
+    Args:
+        scan: Result of prescan_pdf()
+        default: Profile for documents with no text and no page-sized images
+            (blank or vector-only), where OCR would find nothing
+    """
+    if scan.pages_sampled == 0:
+        return default
+    if scan.pages_with_text == 0:
+        return "scanned" if scan.scanned_ratio > MIXED_SCANNED_RATIO else default
+    if scan.scanned_ratio > MIXED_SCANNED_RATIO:
+        return "mixed"
+    if scan.paths_per_page >= TABLE_PATHS_PER_PAGE:
+        return "digital_tables"
+    return "digital"
+
+
+def is_pdf(source: Source) -> bool:
+    path = urlparse(str(source)).path if "://" in str(source) else str(source)
+    return path.lower().endswith(".pdf")
+
+
+def route(source: Source, default: str = "digital") -> Tuple[str, ConverterConfig]:
+    """Return the profile name and config for one source.
+
+    Only local PDFs are pre-scanned. Other formats do not use the PDF pipeline
+    options, and remote PDFs are not downloaded twice; both get the default.
+    """
+    if is_pdf(source) and Path(str(source)).exists():
+        try:
+            name = select_profile(prescan_pdf(str(source)), default)
+        except pdfium.PdfiumError:
+            name = "scanned"  # unreadable text layer, let the full pipeline try
+        return name, PROFILES[name]
+    return default, PROFILES[default]
+
+
+def route_sources(sources: Iterable[Source]) -> Iterator[Tuple[Source, ConverterConfig]]:
+    """Pair every source with its profile, ready for ConversionEngine.convert_all()."""
+    for source in sources:
+        _, config = route(source)
+        yield source, config
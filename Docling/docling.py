@@ -2,40 +2,54 @@
 
 from docling.document_converter import DocumentConverter
 import utils_custom as utils
+from crawl_state import CrawlStateStore, changed_pages
+from Docling.conversion_engine import ConversionEngine
 
-converter = DocumentConverter()
+# The examples run under a __main__ guard: the sitemap section converts on
+# spawned worker processes, which import this script again and must not
+# re-run the conversions below.
+if __name__ == "__main__":
+    converter = DocumentConverter()
 
-# --------------------------------------------------------------
-# Basic PDF extraction
-# --------------------------------------------------------------
+    # --------------------------------------------------------------
+    # Basic PDF extraction
+    # --------------------------------------------------------------
 
-result = converter.convert("https://arxiv.org/pdf/2408.09869")
+    result = converter.convert("https://arxiv.org/pdf/2408.09869")
 
-document = result.document
-markdown_output = document.export_to_markdown()
-json_output = document.export_to_dict()
+    document = result.document
+    markdown_output = document.export_to_markdown()
+    json_output = document.export_to_dict()
 
-print(markdown_output)
+    print(markdown_output)
 
-# --------------------------------------------------------------
-# Basic HTML extraction
-# --------------------------------------------------------------
+    # --------------------------------------------------------------
+    # Basic HTML extraction
+    # --------------------------------------------------------------
 
-result = converter.convert("https://www.grasca.si/")
+    result = converter.convert("https://www.grasca.si/")
 
-document = result.document
-markdown_output = document.export_to_markdown()
-print(markdown_output)
+    document = result.document
+    markdown_output = document.export_to_markdown()
+    print(markdown_output)
 
-# --------------------------------------------------------------
-# Scrape multiple pages using the sitemap
-# --------------------------------------------------------------
+    # --------------------------------------------------------------
+    # Scrape multiple pages using the sitemap
+    # --------------------------------------------------------------
 
-sitemap_urls = utils.get_sitemap_urls("https://ds4sd.github.io/docling/")
-conv_results_iter = converter.convert_all(sitemap_urls)
+    # Each worker process keeps its own warm DocumentConverter
+    sitemap_urls = utils.get_sitemap_urls("https://ds4sd.github.io/docling/")
 
-docs = []
-for result in conv_results_iter:
-    if result.document:
-        document = result.document
-        docs.append(document)
\ No newline at end of file
+    # Re-runs only convert pages that changed since the last successful
+    # conversion (conditional GET with the stored ETag / Last-Modified / hash)
+    store = CrawlStateStore("data/crawl_state_docling.sqlite")
+    checks = changed_pages(sitemap_urls, store)
+    print(f"{len(checks)} of {len(sitemap_urls)} pages changed")
+
+    docs = []
+    with ConversionEngine() as engine:
+        for check, output in zip(checks, engine.convert_all([check.url for check in checks])):
+            if output.document:
+                docs.append(output.document)
+                store.record_check(check)
+    store.close()
\ No newline at end of file
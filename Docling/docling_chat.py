@@ -1,81 +1,139 @@
+from dataclasses import replace
+
 import streamlit as st
-import lancedb
-import numpy as np
-from openai import OpenAI
 from dotenv import load_dotenv
+from answer_cache import AnswerCache, stream_answer
+from chat_history import ChatHistory
+from context_packer import ContextPacker
+from hybrid_search import HybridConfig
+from retrieval import SearchResults
+from retrieval_service import ServiceClient, ServiceConfig
+from search_filters import SearchScope, scope_options
+from tokenizer_custom import OpenAITokenizerWrapper
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI()
-
-# Initialize LanceDB connection
-@st.cache_resource  # Caches database connection across Streamlit sessions
-def init_db():
-    db = lancedb.connect("data/lancedb")
-    return db.open_table("docling")
-
-# Retrieve relevant context from LanceDB
-def get_context(query: str, table, num_results: int = 5) -> str:
-    results = table.search(query).limit(num_results).to_pandas()
-    contexts = []
-
-    for _, row in results.iterrows():
-        # Extract nested metadata fields
-        filename = row["metadata"]["filename"]
-        page_numbers = row["metadata"]["page_numbers"]
-        title = row["metadata"]["title"]
-
-        # Conditionally build citation from available metadata
-        source_parts = []
-        if filename:
-            source_parts.append(filename)
-        if isinstance(page_numbers, (list, tuple, set, np.ndarray)) and len(page_numbers) > 0:
-            source_parts.append(f"p. {', '.join(str(p) for p in page_numbers)}")
-
-        source = f"\nSource: {' - '.join(source_parts)}"
-        if title:
-            source += f"\nTitle: {title}"
-
-        contexts.append(f"{row['text']}{source}")
-
-    return "\n\n".join(contexts)
-
-# Get streaming response from OpenAI API using Streamlit's streaming capability
-def get_chat_response(messages, context: str) -> str:
-    system_prompt = f"""You are a helpful assistant that answers questions based on the provided context.
-    Use only the information from the context to answer questions. If you're unsure or the context
-    doesn't contain the relevant information, say so.
-    
-    Context:
-    {context}
-    """
-
-    messages_with_context = [{"role": "system", "content": system_prompt}, *messages]
-
-    stream = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages_with_context,
-        temperature=0.3,
-        stream=True,
+# One retrieval service per server process: a pooled HTTP client for the
+# embedding and chat endpoints, one shared read-only LanceDB table and request
+# coalescing, all on a background event loop (see retrieval_service.py).
+# Set OPENAI_BASE_URL to run against the local stub in openai_stub.py.
+@st.cache_resource
+def init_service():
+    return ServiceClient(ServiceConfig())
+
+# Retrieved chunks are deduplicated, merged per file/page range and packed into
+# a fixed token budget, so one question no longer sends tens of thousands of tokens
+CONTEXT_TOKENS = 3000
+
+@st.cache_resource
+def init_tokenizer():
+    return OpenAITokenizerWrapper()
+
+@st.cache_resource
+def init_packer():
+    return ContextPacker(init_tokenizer(), max_tokens=CONTEXT_TOKENS)
+
+# Answers to standalone questions are cached by query embedding and reused
+# while the chunks they were built from are unchanged (see answer_cache.py)
+@st.cache_resource
+def init_answer_cache():
+    return AnswerCache(threshold=0.95)
+
+# Optional CPU cross-encoder rerank stage (see reranker.py); imported lazily so
+# the app runs without sentence-transformers when reranking is off
+RERANK_CANDIDATES = 50
+
+@st.cache_resource
+def init_reranker():
+    from reranker import CrossEncoderReranker
+
+    return CrossEncoderReranker(max_candidates=RERANK_CANDIDATES)
+
+# Files and section titles for the scope selector, refreshed every few minutes
+@st.cache_data(ttl=300)
+def load_scope_options(_service: ServiceClient) -> dict:
+    return scope_options(_service.table)
+
+# Retrieve relevant chunks as an Arrow-backed SearchResults (text, filename,
+# page_numbers, title, score). mode="hybrid" fuses BM25 and vector results, so
+# exact terms (part numbers, product names) are found without raising num_results.
+# With a reranker, RERANK_CANDIDATES chunks are fetched and the cross-encoder
+# keeps the best num_results
+def get_context(
+    query: str,
+    service: ServiceClient,
+    num_results: int = 5,
+    mode: str = "hybrid",
+    hybrid: HybridConfig = HybridConfig(),
+    reranker=None,
+    scope: SearchScope | None = None,
+) -> SearchResults:
+    if reranker is None:
+        return service.retrieve(query, num_results, mode=mode, hybrid=hybrid, scope=scope)
+    hybrid = replace(hybrid, candidates=max(hybrid.candidates, RERANK_CANDIDATES))
+    candidates = service.retrieve(
+        query, RERANK_CANDIDATES, mode=mode, hybrid=hybrid, scope=scope
     )
+    return reranker.rerank(query, candidates, top_n=num_results)
 
-    response = st.write_stream(stream)
+# Stream the answer through the service using Streamlit's streaming capability
+def get_chat_response(messages, context: str, service: ServiceClient) -> str:
+    response = st.write_stream(service.stream_answer(messages, context))
     return response
 
 # Initialize Streamlit app
 st.title("📚 Document Q&A")
 
-# Initialize session state for chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-
-# Initialize database connection
-table = init_db()
+# Initialize the shared retrieval service
+service = init_service()
+packer = init_packer()
+answer_cache = init_answer_cache()
+
+with st.sidebar:
+    stats = answer_cache.stats
+    st.metric(
+        "Answer cache hit rate",
+        f"{stats.hit_rate:.0%}",
+        help=f"{stats.hits} hits, {stats.stale} stale, {stats.lookups} lookups",
+    )
+    use_reranker = st.toggle("Rerank with cross-encoder", value=False)
+    reranker = init_reranker() if use_reranker else None
+    if reranker is not None:
+        rerank_stats = reranker.stats.as_dict()
+        st.metric("Rerank latency p95", f"{rerank_stats['p95_ms']} ms")
+
+    # Search scope, pushed down to LanceDB as a pre-filter on the chunk metadata
+    st.subheader("Search scope")
+    options = load_scope_options(service)
+    filenames = st.multiselect("Documents", list(options), placeholder="All documents")
+    titles = sorted({t for name in filenames for t in options[name]})
+    title = st.selectbox("Section", ["All sections", *titles]) if titles else "All sections"
+    limit_pages = st.checkbox("Limit pages")
+    page_from, page_to = (None, None)
+    if limit_pages:
+        page_from = st.number_input("From page", min_value=1, value=1, step=1)
+        page_to = st.number_input("To page", min_value=page_from, value=page_from, step=1)
+    scope = SearchScope(
+        filenames=tuple(filenames),
+        title=None if title == "All sections" else title,
+        page_from=page_from,
+        page_to=page_to,
+    )
+    scope = scope if scope.to_where() else None
+
+# Initialize session state for chat history. Recent turns are sent verbatim and
+# older ones as a rolling summary, within HISTORY_TOKENS; the summary is updated
+# in the background after each answer
+HISTORY_TOKENS = 2000
+if "history" not in st.session_state:
+    st.session_state.history = ChatHistory(
+        init_tokenizer(), summarize=service.summarize, max_tokens=HISTORY_TOKENS
+    )
+history = st.session_state.history
 
 # Display existing chat messages
-for message in st.session_state.messages:
+for message in history.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
@@ -86,11 +144,32 @@ if prompt := st.chat_input("Ask a question about the document"):
         st.markdown(prompt)
 
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    history.append("user", prompt)
+
+    # Follow-up questions depend on the conversation, so only the first question
+    # of a session is answered from (and stored in) the answer cache, and only
+    # for unscoped searches
+    standalone = len(history.messages) == 1 and scope is None
+    query_vector = service.embed(prompt) if standalone else None
+    cached = answer_cache.lookup(query_vector, service.table) if standalone else None
+
+    if cached is not None:
+        with st.status("Answered from cache", expanded=False):
+            st.write(f"Same question as \"{cached.query}\" (similarity {cached.similarity:.2f})")
+        with st.chat_message("assistant"):
+            response = st.write_stream(stream_answer(cached.answer))
+        history.append("assistant", response)
+        st.stop()
 
     # Get relevant context and visually indicate processing
     with st.status("Searching document...", expanded=False) as status:
-        context = get_context(prompt, table)
+        # Over-fetch; the packer keeps what fits the token budget. The reranker
+        # already picks the best few, so less is fetched with it
+        results = get_context(
+            prompt, service, num_results=6 if reranker else 10, reranker=reranker, scope=scope
+        )
+        packed = packer.pack(results)
+        context = packed.text
         st.markdown(
             """
             <style>
@@ -119,26 +198,15 @@ if prompt := st.chat_input("Ask a question about the document"):
         )
 
         st.write("Found relevant sections:")
-        for chunk in context.split("\n\n"):
-            # Parse retrieved text and metadata for expandable display
-            parts = chunk.split("\n")
-            text = parts[0]
-            metadata = {
-                line.split(": ")[0]: line.split(": ")[1]
-                for line in parts[1:]
-                if ": " in line
-            }
-
-            source = metadata.get("Source", "Unknown source")
-            title = metadata.get("Title", "Untitled section")
-
+        for chunk in packed.chunks:
+            # Expandable display straight from the result columns
             st.markdown(
                 f"""
                 <div class="search-result">
                     <details>
-                        <summary>{source}</summary>
-                        <div class="metadata">Section: {title}</div>
-                        <div style="margin-top: 8px;">{text}</div>
+                        <summary>{chunk.source or "Unknown source"}</summary>
+                        <div class="metadata">Section: {chunk.title or "Untitled section"}</div>
+                        <div style="margin-top: 8px;">{chunk.text}</div>
                     </details>
                 </div>
             """,
@@ -147,7 +215,13 @@ if prompt := st.chat_input("Ask a question about the document"):
 
     # Display assistant response using OpenAI's streaming completion
     with st.chat_message("assistant"):
-        response = get_chat_response(st.session_state.messages, context)
-
-    # Update chat history with assistant's response
-    st.session_state.messages.append({"role": "assistant", "content": response})
+        response = get_chat_response(history.prompt_messages(), context, service)
+
+    # Update chat history with assistant's response and compact it off the
+    # critical path
+    history.append("assistant", response)
+    history.compact()
+    if standalone:
+        # Every constituent chunk, including those merged into another, so an
+        # edit to any of them invalidates the answer
+        answer_cache.store(prompt, query_vector, packed.chunk_ids, response)
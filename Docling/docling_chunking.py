@@ -6,7 +6,6 @@ exceed its token capacity.
 """
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import PdfPipelineOptions
-from docling.chunking import HybridChunker
 from docling.document_converter import DocumentConverter
 from docling.datamodel.pipeline_options import PdfPipelineOptions
 from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
@@ -14,6 +13,8 @@ from docling.document_converter import DocumentConverter, PdfFormatOption
 from dotenv import load_dotenv
 from openai import OpenAI
 from Docling.tokenizer_custom import OpenAITokenizerWrapper
+from Docling.conversion_cache import ConversionCache, convert_cached
+from Docling.fast_chunker import FastHybridChunker
 
 load_dotenv()
 """
@@ -42,7 +43,16 @@ doc_converter = DocumentConverter(
 )
 
 converter = DocumentConverter()
-result = doc_converter.convert("https://arxiv.org/pdf/2408.09869")
+# Unchanged documents are served from the conversion cache instead of Docling
+conversion_cache = ConversionCache()
+document = convert_cached(
+    doc_converter,
+    "https://arxiv.org/pdf/2408.09869",
+    conversion_cache,
+    pipeline_options,
+    PyPdfiumDocumentBackend,
+)
+print(f"Conversion cache: {conversion_cache.stats}")
                                
                               
 # Apply hybrid chunking
@@ -55,13 +65,15 @@ which can make the text less coherent for a language model.
 """
 
 
-chunker = HybridChunker(
+# Same chunks as HybridChunker, but each doc item is tokenized once and window
+# ends are found from prefix sums of the token counts
+chunker = FastHybridChunker(
     tokenizer=tokenizer,
     max_tokens=MAX_TOKENS,
     merge_peers=True,
 )
 
-chunk_iter = chunker.chunk(dl_doc=result.document)
+chunk_iter = chunker.chunk(dl_doc=document)
 chunks = list(chunk_iter)
 
 len(chunks)
\ No newline at end of file
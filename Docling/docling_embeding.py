@@ -1,20 +1,21 @@
 # when go line by line, the code is not working
 # use pip black and then reformat the code
 
-from typing import List
-
 import lancedb
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.pipeline_options import PdfPipelineOptions
-from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
-from docling.chunking import HybridChunker
-from docling.document_converter import DocumentConverter
 from dotenv import load_dotenv
-from lancedb.embeddings import get_registry
-from lancedb.pydantic import LanceModel, Vector
 from openai import OpenAI
 from tokenizer_custom import OpenAITokenizerWrapper
+from conversion_cache import ConversionCache, convert_cached
+from conversion_profiles import route
+from conversion_engine import ConversionEngine
+from sharded_conversion import make_sharded_converter
+from fast_chunker import FastHybridChunker
+from chunk_index import Chunks, IncrementalIndexer, ensure_chunk_id_index
+from embedding_stage import EmbeddingCache, EmbeddingStage
+from hybrid_search import ensure_fts_index
+from search_filters import ensure_scalar_indexes
+from streaming_pipeline import build_ingest_pipeline
+from vector_index import VectorIndexManager
 import PyPDF2
 
 """
@@ -27,113 +28,125 @@ You can think of LanceModel like a database schema that includes both text and v
 
 load_dotenv()
 
-tokenizer = OpenAITokenizerWrapper()
 MAX_TOKENS = 8191
 
-pipeline_options = PdfPipelineOptions()
-pipeline_options.do_ocr = False
-pipeline_options.do_table_structure = False
-pipeline_options.table_structure_options.do_cell_matching = False
-
-doc_converter = DocumentConverter(
-    format_options={
-        InputFormat.PDF: PdfFormatOption(
-            pipeline_options=pipeline_options, backend=PyPdfiumDocumentBackend
-        )
-    }
-)
-
-# read pdf file from disk
-
-converter = DocumentConverter()
-# result = doc_converter.convert("https://arxiv.org/pdf/2408.09869")
-
-
-result = doc_converter.convert("guidlines.pdf")
-
-
-chunker = HybridChunker(
-    tokenizer=tokenizer,
-    max_tokens=MAX_TOKENS,
-    merge_peers=True,
-)
-
-chunk_iter = chunker.chunk(dl_doc=result.document)
-chunks = list(chunk_iter)
-
-# --------------------------------------------------------------
-# Create a LanceDB database and table
-# --------------------------------------------------------------
-
-# Create a LanceDB database
-db = lancedb.connect("data/lancedb")
-
-
-func = get_registry().get("openai").create(name="text-embedding-3-small")
-
-
-# Define the metadata schema
-
-class ChunkMetadata(LanceModel):
-    # You must order the fields in alphabetical order.
-    # This is a requirement of the Pydantic implementation.
-    filename: str | None
-    page_numbers: List[int] | None
-    title: str | None
-
-
-# Define the main Schema
-
-class Chunks(LanceModel):
-    text: str = func.SourceField()
-    vector: Vector(func.ndims()) = func.VectorField()  # type: ignore
-    metadata: ChunkMetadata
-
-
-table = db.create_table("docling", schema=Chunks, mode="overwrite")
-
-# --------------------------------------------------------------
-# Prepare the chunks for the table
 """
-This list comprehension creates a list of dictionaries, each representing a processed text 
-chunk along with its metadata.
+Every PDF is pre-scanned (text layer, images, vector paths) and converted with the
+cheapest profile that still extracts it correctly: born-digital files skip OCR and
+use the faster DoclingParseV2 backend, only scans pay for full OCR. The profiles
+are defined in conversion_profiles.py; one converter is built per profile.
 """
-# --------------------------------------------------------------
-
-# Create table with processed chunks
-processed_chunks = [
-    {
-        "text": chunk.text,
-        "metadata": {
-            "filename": chunk.meta.origin.filename,
-            "page_numbers": [
-                page_no
-                for page_no in sorted(
-                    set(
-                        prov.page_no
-                        for item in chunk.meta.doc_items
-                        for prov in item.prov
-                    )
-                )
-            ]
-            or None,
-            "title": chunk.meta.headings[0] if chunk.meta.headings else None,
-        },
-    }
-    for chunk in chunks
-]
-
-# --------------------------------------------------------------
-# Add the chunks to the table (automatically embeds the text)
-# --------------------------------------------------------------
-
-table.add(processed_chunks)
-
-# --------------------------------------------------------------
-# Load the table
-# --------------------------------------------------------------
-
-table.to_pandas()
-table.count_rows()
+converters = {}
+
+# Documents to ingest. Conversion happens lazily, one document at a time,
+# inside the streaming pipeline below.
+sources = ["guidlines.pdf"]
+
+# PDFs longer than SHARD_THRESHOLD_PAGES are split into SHARD_PAGES page ranges,
+# converted on the engine's worker processes and merged back with the original
+# page numbers. The worker pool only starts when such a PDF shows up.
+SHARD_THRESHOLD_PAGES = 200
+SHARD_PAGES = 50
+
+
+def convert_documents(sources, engine, conversion_cache):
+    for source in sources:
+        profile, config = route(source)
+        if profile not in converters:
+            converters[profile] = config.build()
+        yield convert_cached(
+            converters[profile],
+            source,
+            conversion_cache,
+            config.pipeline_options(),
+            config.backend_class(),
+            convert_bytes=make_sharded_converter(
+                engine, converters[profile], config, SHARD_THRESHOLD_PAGES, SHARD_PAGES
+            ),
+        )
 
 
+# Everything else runs only as a script: sharded conversion spawns worker
+# processes, which import this file again and must not build another engine,
+# chunker or ingestion.
+if __name__ == "__main__":
+    tokenizer = OpenAITokenizerWrapper()
+
+    # Unchanged documents are served from the conversion cache instead of Docling
+    conversion_cache = ConversionCache()
+    engine = ConversionEngine()
+
+    # Same chunks as HybridChunker, but each doc item is tokenized once and window
+    # ends are found from prefix sums of the token counts
+    chunker = FastHybridChunker(
+        tokenizer=tokenizer,
+        max_tokens=MAX_TOKENS,
+        merge_peers=True,
+    )
+
+    # --------------------------------------------------------------
+    # Create a LanceDB database and table
+    # --------------------------------------------------------------
+
+    # Create a LanceDB database
+    db = lancedb.connect("data/lancedb")
+
+
+    # Embeddings are computed in token-sized batches, a few requests at a time,
+    # and cached on disk so identical chunks are never embedded twice.
+    # For offline benchmarks pass embedder=HashingEmbedder() instead.
+    embedding_stage = EmbeddingStage(tokenizer=tokenizer, cache=EmbeddingCache())
+
+    # The Chunks schema (text, vector, metadata and a content-hash chunk_id) lives
+    # in chunk_index.py so the search and chat scripts can share it.
+    indexer = IncrementalIndexer(db, "docling", schema=Chunks, embedding_stage=embedding_stage)
+    table = indexer.table
+
+    # --------------------------------------------------------------
+    # Stream the documents into the table
+    """
+    Documents flow through convert -> chunk -> plan -> embed -> write stages, each on its
+    own thread with small bounded queues in between, so memory stays flat however many
+    documents we ingest. Every chunk gets a chunk_id (a hash of its text and metadata);
+    the plan stage passes on only chunks that are not in the table yet. Those are
+    embedded in micro-batches and appended in bounded write batches; the stale rows
+    of a changed document are deleted only once its new rows are written.
+    """
+    # --------------------------------------------------------------
+
+    pipeline = build_ingest_pipeline(
+        convert_documents(sources, engine, conversion_cache),
+        chunker,
+        indexer,
+        embedding_stage,
+    )
+    rows_written = sum(pipeline.run())
+    print(f"Rows written: {rows_written}")
+    # sources is the whole corpus, so documents that were not ingested in this
+    # run were removed from it (like sync(prune_missing=True))
+    rows_pruned = indexer.prune_files(indexer.seen_files)
+    print(f"Rows of removed documents deleted: {rows_pruned}")
+    for stage in pipeline.report():
+        print(stage)
+    print(f"Conversion cache: {conversion_cache.stats}")
+    engine.close()
+    embedding_stage.close()
+
+    # Build the ANN index once the table is large enough, then keep it fresh:
+    # new rows are folded in with optimize(), and the index is retrained when
+    # the table has grown enough for the partitions to be stale
+    print(f"Vector index: {VectorIndexManager(table).maintain(background=False)}")
+
+    # BM25 index over the chunk text for hybrid search in the chat app
+    ensure_fts_index(table, rebuild=rows_written > 0 or rows_pruned > 0)
+    # Scalar indexes on filename, title and page_numbers for scoped search
+    ensure_scalar_indexes(table, replace=rows_written > 0 or rows_pruned > 0)
+    # BTREE on chunk_id so retrieval cache hits fetch their rows without a scan
+    ensure_chunk_id_index(table, replace=rows_written > 0 or rows_pruned > 0)
+
+    # --------------------------------------------------------------
+    # Load the table
+    # --------------------------------------------------------------
+
+    table.to_pandas()
+    table.count_rows()
@@ -1,4 +1,10 @@
+import sys
+
 import lancedb
+import pandas as pd
+
+from search_filters import SearchScope, ensure_scalar_indexes
+from vector_index import VectorIndexManager
 
 # --------------------------------------------------------------
 # Connect to the database
@@ -19,5 +25,41 @@ table = db.open_table("docling")
 # Search the table
 # --------------------------------------------------------------
 
-result = table.search(query="what's docling?", query_type="vector").limit(3)
-result.to_pandas()
\ No newline at end of file
+# Builds an IVF_PQ index once the table is large enough; below that a flat
+# scan is fast enough. apply() sets the tuned nprobes / refine_factor.
+index = VectorIndexManager(table)
+index.ensure_index()
+
+result = index.apply(table.search(query="what's docling?", query_type="vector")).limit(3)
+result.to_pandas()
+
+
+# --------------------------------------------------------------
+# Tune the index: recall vs latency against exact search
+# --------------------------------------------------------------
+
+# Picks the fastest nprobes / refine_factor with recall@10 >= 0.95 and saves
+# it to data/vector_index.json, where the chat app picks it up. The sweep runs
+# hundreds of queries, so only on request:
+#   python docling_search.py --tune
+if "--tune" in sys.argv:
+    report = index.tune(k=10, target_recall=0.95)
+else:
+    report = index.settings.tuning_report  # from the last tuning run
+pd.DataFrame(report)
+
+
+# --------------------------------------------------------------
+# Scoped search: one document, a page range
+# --------------------------------------------------------------
+
+# Scalar indexes on the metadata fields back the pre-filter
+ensure_scalar_indexes(table)
+
+scope = SearchScope(filenames=("guidlines.pdf",), page_from=1, page_to=10)
+result = (
+    index.apply(table.search(query="what's docling?", query_type="vector"))
+    .where(scope.to_where(), prefilter=True)
+    .limit(3)
+)
+result.to_pandas()
@@ -0,0 +1,253 @@
+"""
+Batched, concurrent embedding with a persistent cache.
+
+Letting table.add() embed through the LanceDB registry gives no control over
+batch size, concurrency or re-use. The EmbeddingStage below:
+
+- packs texts into batches by token count (OpenAITokenizerWrapper),
+- keeps a bounded number of batches in flight with asyncio,
+- caches vectors on disk keyed by (model, text hash), so identical chunks are
+  never embedded twice.
+
+The embedder is pluggable. HashingEmbedder is a deterministic offline embedder
+for benchmarking throughput without network access.
+"""
+import asyncio
+import hashlib
+import math
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Protocol, Sequence, Union
+
+from openai import AsyncOpenAI
+
+Vector = List[float]
+
+
+class Embedder(Protocol):
+    """Anything that can embed a batch of texts asynchronously."""
+
+    model: str
+    ndims: int
+
+    async def embed(self, texts: Sequence[str]) -> List[Vector]: ...
+
+
+class OpenAIEmbedder:
+    """Embeds texts with the OpenAI embeddings endpoint."""
+
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        ndims: int = 1536,
+        client: Optional[AsyncOpenAI] = None,
+    ):
+        self.model = model
+        self.ndims = ndims
+        self.client = client or AsyncOpenAI()
+
+    async def embed(self, texts: Sequence[str]) -> List[Vector]:
+        response = await self.client.embeddings.create(model=self.model, input=list(texts))
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words feature hashing embedder.
+
+    The vectors carry only lexical similarity, but they are stable across runs
+    and cost no network round trips, which makes them suitable for offline
+    benchmarks and tests.
+    """
+
+    def __init__(self, ndims: int = 1536, model: str = "hashing"):
+        self.model = f"{model}-{ndims}"
+        self.ndims = ndims
+
+    def embed_one(self, text: str) -> Vector:
+        vector = [0.0] * self.ndims
+        for token in text.lower().split():
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.ndims] += sign
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    async def embed(self, texts: Sequence[str]) -> List[Vector]:
+        return [self.embed_one(text) for text in texts]
+
+
+class EmbeddingCache:
+    """SQLite store of vectors keyed by (model, text hash)."""
+
+    def __init__(self, path: Union[str, Path] = "data/embedding_cache.sqlite"):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, Vector]:
+        found: Dict[str, Vector] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters
+            for start in range(0, len(unique), 500):
+                batch = unique[start : start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                )
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob).tolist()
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, Vector]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, h, array("f", v).tobytes()) for h, v in items.items()],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class EmbeddingStage:
+    """Embeds texts in token-bounded batches, concurrently, through a cache."""
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        tokenizer=None,
+        cache: Optional[EmbeddingCache] = None,
+        max_batch_tokens: int = 100_000,
+        max_batch_size: int = 2048,
+        max_concurrency: int = 4,
+    ):
+        """Initialize the stage.
+
+        Args:
+            embedder: The embedder to use (default: OpenAIEmbedder)
+            tokenizer: OpenAITokenizerWrapper used to size batches; if None,
+                batches are sized by max_batch_size only
+            cache: Persistent vector cache; None disables caching
+            max_batch_tokens: Token budget of a single request
+                (the OpenAI limit is 300k tokens per request)
+            max_batch_size: Maximum number of texts per request
+                (the OpenAI limit is 2048)
+            max_concurrency: Maximum number of requests in flight
+        """
+        self.embedder = embedder or OpenAIEmbedder()
+        self.tokenizer = tokenizer
+        self.cache = cache
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        # embed_sync() runs on one long-lived loop: an AsyncOpenAI client keeps its
+        # pooled connections on the loop of its first request
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+    def make_batches(self, texts: Sequence[str]) -> List[List[str]]:
+        """Group texts so that no batch exceeds the token or size limit."""
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        batch_tokens = 0
+        if self.tokenizer is not None:
+            token_counts = self.tokenizer.count_tokens_batch(texts)
+        else:
+            token_counts = [0] * len(texts)
+        for text, tokens in zip(texts, token_counts):
+            if batch and (
+                batch_tokens + tokens > self.max_batch_tokens
+                or len(batch) >= self.max_batch_size
+            ):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def embed(self, texts: Sequence[str]) -> List[Vector]:
+        """Embed texts, returning one vector per input in input order."""
+        hashes = [EmbeddingCache.text_hash(text) for text in texts]
+        vectors: Dict[str, Vector] = {}
+        if self.cache is not None:
+            vectors.update(self.cache.get_many(self.embedder.model, hashes))
+
+        # Each distinct missing text is embedded once
+        missing: Dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in vectors:
+                missing.setdefault(text_hash, text)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_batch(batch: List[str]) -> None:
+            async with semaphore:
+                batch_vectors = await self.embedder.embed(batch)
+            computed = {EmbeddingCache.text_hash(t): v for t, v in zip(batch, batch_vectors)}
+            vectors.update(computed)
+            if self.cache is not None:
+                self.cache.put_many(self.embedder.model, computed)
+
+        await asyncio.gather(
+            *(run_batch(batch) for batch in self.make_batches(list(missing.values())))
+        )
+        return [vectors[text_hash] for text_hash in hashes]
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="embedding-stage", daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    def embed_sync(self, texts: Sequence[str]) -> List[Vector]:
+        """Blocking version of embed() for scripts; safe to call from any thread.
+
+        Every call runs on the same background event loop, so the embedder's
+        client can be reused across calls.
+        """
+        return asyncio.run_coroutine_threadsafe(self.embed(texts), self._background_loop()).result()
+
+    def close(self) -> None:
+        """Stop the background loop of embed_sync(), if it was started."""
+        with self._loop_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    def embed_records(self, records: List[dict], text_key: str = "text") -> List[dict]:
+        """Add a "vector" field to every record."""
+        vectors = self.embed_sync([record[text_key] for record in records])
+        for record, vector in zip(records, vectors):
+            record["vector"] = vector
+        return records
@@ -0,0 +1,174 @@
+"""
+HybridChunker with token-count memoization for large documents.
+
+HybridChunker grows windows one doc item (or one peer chunk) at a time and
+re-tokenizes the whole window on every step, which is quadratic in the window
+length. On 500+ page manuals this dominates CPU time after conversion.
+
+FastHybridChunker tokenizes each doc item once, keeps the counts in a compact
+array and uses prefix sums to estimate where a window has to end. The estimate is
+then confirmed with exact counts of the real window text, found by galloping and
+binary search, so only O(log n) windows are tokenized per chunk instead of O(n).
+
+The output is identical to HybridChunker as long as the token count of a window
+never shrinks when an item is added to it, which holds for BPE tokenizers such as
+tiktoken. It relies on the HybridChunker internals of docling-core before 2.30
+(_make_chunk_from_doc_items, _count_chunk_tokens); tests/test_fast_chunker.py checks
+the output against HybridChunker.
+"""
+from array import array
+from bisect import bisect_right
+from typing import Callable, List, Optional, Sequence
+
+from docling.chunking import HybridChunker
+from docling_core.transforms.chunker.hierarchical_chunker import DocChunk, DocMeta
+from docling_core.types.doc import TextItem
+
+
+def _last_fitting(lo: int, hi: int, fits: Callable[[int], bool], guess: int) -> int:
+    """Largest e in [lo, hi] with fits(e), given fits(lo) and that fits is monotone.
+
+    Starts at guess and gallops towards the boundary, so a good guess costs only a
+    couple of exact checks.
+    """
+    guess = min(max(guess, lo), hi)
+    if fits(guess):
+        good, step = guess, 1
+        while good + step <= hi and fits(good + step):
+            good += step
+            step *= 2
+        bad = min(good + step, hi + 1)
+    else:
+        bad, step = guess, 1
+        while bad - step > lo and not fits(bad - step):
+            bad -= step
+            step *= 2
+        good = max(bad - step, lo)
+    while bad - good > 1:
+        mid = (good + bad) // 2
+        if fits(mid):
+            good = mid
+        else:
+            bad = mid
+    return good
+
+
+class FastHybridChunker(HybridChunker):
+    """Drop-in HybridChunker that derives window ends from prefix sums."""
+
+    def _count(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        tokenizer = self._tokenizer
+        if hasattr(tokenizer, "count_tokens"):
+            return tokenizer.count_tokens(text)  # memoized, see OpenAITokenizerWrapper
+        return len(tokenizer.tokenize(text))
+
+    def _prefix_sums(self, counts: Sequence[int]) -> array:
+        """P[i] = sum of (count + delimiter) over the first i entries."""
+        delim = self._count(self.delim)
+        prefix = array("Q", [0])
+        running = 0
+        for count in counts:
+            running += count + delim
+            prefix.append(running)
+        return prefix
+
+    def _estimate_end(self, prefix: array, start: int, overhead: int) -> int:
+        """Last index e whose estimated window [start, e] fits into max_tokens."""
+        delim = self._count(self.delim)
+        bound = self.max_tokens - overhead + prefix[start] + delim
+        return bisect_right(prefix, bound) - 2
+
+    def _meta_overhead(self, meta) -> int:
+        return sum(self._count(t) for t in (meta.headings or [])) + sum(
+            self._count(t) for t in (meta.captions or [])
+        )
+
+    def _split_by_doc_items(self, doc_chunk: DocChunk) -> List[DocChunk]:
+        items = doc_chunk.meta.doc_items
+        num_items = len(items)
+        if num_items <= 1:
+            return super()._split_by_doc_items(doc_chunk)
+
+        # Token count of every doc item, computed once
+        counts = array(
+            "I", (self._count(it.text) if isinstance(it, TextItem) else 0 for it in items)
+        )
+        prefix = self._prefix_sums(counts)
+        overhead = self._meta_overhead(doc_chunk.meta)
+
+        def make(start: int, end: int) -> DocChunk:
+            return self._make_chunk_from_doc_items(
+                doc_chunk=doc_chunk, window_start=start, window_end=end
+            )
+
+        chunks: List[DocChunk] = []
+        start = 0
+        while start < num_items:
+            cache = {}
+
+            def fits(end: int) -> bool:
+                if end not in cache:
+                    cache[end] = self._count_chunk_tokens(doc_chunk=make(start, end)) <= self.max_tokens
+                return cache[end]
+
+            if not fits(start):
+                # A single item that does not fit; the plain-text splitter handles it
+                chunks.append(make(start, start))
+                start += 1
+                continue
+
+            guess = self._estimate_end(prefix, start, overhead)
+            end = _last_fitting(start, num_items - 1, fits, guess)
+            chunks.append(make(start, end))
+            start = end + 1
+        return chunks
+
+    def _merge_chunks_with_matching_metadata(self, chunks: List[DocChunk]) -> List[DocChunk]:
+        num_chunks = len(chunks)
+        counts = array("I", (self._count(chunk.text) for chunk in chunks))
+        prefix = self._prefix_sums(counts)
+
+        output_chunks: List[DocChunk] = []
+        start = 0
+        while start < num_chunks:
+            first = chunks[start]
+            key = (first.meta.headings, first.meta.captions)
+
+            # Peers that may be merged: the following chunks with the same
+            # headings and captions
+            run_end = start
+            while (
+                run_end + 1 < num_chunks
+                and (chunks[run_end + 1].meta.headings, chunks[run_end + 1].meta.captions) == key
+            ):
+                run_end += 1
+
+            def make(end: int) -> DocChunk:
+                window = chunks[start : end + 1]
+                return DocChunk(
+                    text=self.delim.join(chk.text for chk in window),
+                    meta=DocMeta(
+                        doc_items=[it for chk in window for it in chk.meta.doc_items],
+                        headings=first.meta.headings,
+                        captions=first.meta.captions,
+                        origin=chunks[end].meta.origin,
+                    ),
+                )
+
+            cache = {start: True}
+
+            def fits(end: int) -> bool:
+                if end not in cache:
+                    cache[end] = self._count_chunk_tokens(doc_chunk=make(end)) <= self.max_tokens
+                return cache[end]
+
+            end = start
+            if run_end > start:
+                guess = self._estimate_end(prefix, start, self._meta_overhead(first.meta))
+                end = _last_fitting(start, run_end, fits, guess)
+
+            output_chunks.append(first if end == start else make(end))
+            start = end + 1
+        return output_chunks
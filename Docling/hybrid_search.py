@@ -0,0 +1,146 @@
+"""
+Hybrid BM25 + vector retrieval.
+
+Pure vector search misses exact-term questions (part numbers, product names like
+"scott-spark-920"), and raising num_results to compensate bloats the prompt.
+Here a full-text (BM25) index over Chunks.text runs next to the vector search
+and both ranked lists are fused with reciprocal-rank fusion (RRF):
+
+    score(chunk) = sum over lists of weight / (rrf_k + rank)
+
+RRF only uses ranks, so BM25 scores and cosine distances never have to be put on
+the same scale. We fuse ourselves instead of using query_type="hybrid" so the
+query vector can come from RetrievalCache instead of being re-embedded.
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+
+from retrieval import DISTANCE_METRIC, PROJECTION
+
+TEXT_COLUMN = "text"
+SCORE_COLUMN = "_relevance_score"
+
+
+@dataclass(frozen=True)
+class HybridConfig:
+    """Fusion settings; hashable so it can be part of a cache key."""
+
+    # Candidates fetched from each of the two searches before fusion
+    candidates: int = 20
+    # RRF damping constant; 60 is the value from the original RRF paper
+    rrf_k: int = 60
+    vector_weight: float = 1.0
+    fts_weight: float = 1.0
+
+
+def has_fts_index(table, column: str = TEXT_COLUMN) -> bool:
+    return any(
+        index.index_type == "FTS" and column in index.columns for index in table.list_indices()
+    )
+
+
+def ensure_fts_index(table, column: str = TEXT_COLUMN, rebuild: bool = False) -> None:
+    """Create the full-text index on column, or rebuild it after large inserts.
+
+    Rows added after the index was built are still searched, just without the
+    index, so rebuilding after every small insert is not necessary.
+    """
+    if rebuild or not has_fts_index(table, column):
+        table.create_fts_index(column, use_tantivy=False, replace=True)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]],
+    rrf_k: int = 60,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists.
+
+    Args:
+        rankings: Ranked lists of ids, best first
+        rrf_k: Damping constant; larger values flatten the rank contribution
+        weights: Weight per list (default 1.0 each)
+
+    Returns:
+        (id, fused score) pairs, best first
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def vector_search(
+    table,
+    vector: List[float],
+    limit: int,
+    search_options: Optional[Callable] = None,
+    where: Optional[str] = None,
+) -> pa.Table:
+    search = table.search(vector).metric(DISTANCE_METRIC)
+    if search_options is not None:
+        search = search_options(search)
+    if where:
+        search = search.where(where, prefilter=True)
+    return search.select(PROJECTION).limit(limit).to_arrow()
+
+
+def fts_search(table, query: str, limit: int, where: Optional[str] = None) -> pa.Table:
+    search = table.search(query, query_type="fts")
+    if where:
+        search = search.where(where, prefilter=True)
+    return search.select(PROJECTION).limit(limit).to_arrow()
+
+
+def hybrid_search(
+    table,
+    query: str,
+    vector: List[float],
+    k: int,
+    config: HybridConfig = HybridConfig(),
+    search_options: Optional[Callable] = None,
+    where: Optional[str] = None,
+) -> pa.Table:
+    """Top-k rows by RRF over a BM25 search and a vector search.
+
+    Falls back to vector search alone if the table has no full-text index yet.
+
+    Args:
+        table: The LanceDB table
+        query: Query text for the full-text search
+        vector: Query embedding for the vector search
+        k: Number of rows to return
+        config: Fusion settings
+        search_options: Function applied to the vector query (nprobes etc.)
+        where: SQL pre-filter applied to both searches (see SearchScope)
+
+    Returns:
+        PROJECTION columns in fused order plus a _relevance_score column
+    """
+    candidates = max(k, config.candidates)
+    vector_rows = vector_search(table, vector, candidates, search_options, where)
+    if not has_fts_index(table):
+        rows = vector_rows.select(PROJECTION).slice(0, k)
+        ranks = range(1, rows.num_rows + 1)
+        scores = [config.vector_weight / (config.rrf_k + rank) for rank in ranks]
+        return rows.append_column(SCORE_COLUMN, pa.array(scores, pa.float64()))
+    fts_rows = fts_search(table, query, candidates, where)
+
+    fused = reciprocal_rank_fusion(
+        [vector_rows.column("chunk_id").to_pylist(), fts_rows.column("chunk_id").to_pylist()],
+        rrf_k=config.rrf_k,
+        weights=[config.vector_weight, config.fts_weight],
+    )[:k]
+
+    # Both candidate lists have the same projected schema; take each fused id
+    # from its first occurrence
+    pool = pa.concat_tables([vector_rows.select(PROJECTION), fts_rows.select(PROJECTION)])
+    first_row: Dict[str, int] = {}
+    for row, chunk_id in enumerate(pool.column("chunk_id").to_pylist()):
+        first_row.setdefault(chunk_id, row)
+    result = pool.take([first_row[chunk_id] for chunk_id, _ in fused])
+    return result.append_column(SCORE_COLUMN, pa.array([score for _, score in fused], pa.float64()))
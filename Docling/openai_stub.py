@@ -0,0 +1,137 @@
+"""
+Local stand-in for the OpenAI embeddings and chat completions endpoints.
+
+Point RetrievalService (ServiceConfig.base_url) or any OpenAI client at it to
+exercise the retrieval service and load-test the chat app without network
+access or API cost. Embeddings come from HashingEmbedder, so they are
+deterministic; chat completions echo the question word by word, streamed as
+server-sent events like the real API. latency adds a fixed delay per request.
+
+Run:
+    python openai_stub.py --port 8765
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+from embedding_stage import HashingEmbedder
+
+
+def make_handler(embedder: HashingEmbedder, latency: float):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload: dict, status: int = 200) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(latency)
+            if self.path.endswith("/embeddings"):
+                self._embeddings(request)
+            elif self.path.endswith("/chat/completions"):
+                self._chat(request)
+            else:
+                self._send_json({"error": {"message": f"unknown path {self.path}"}}, 404)
+
+        def _embeddings(self, request: dict) -> None:
+            texts = request["input"]
+            texts = [texts] if isinstance(texts, str) else texts
+            data = [
+                {"object": "embedding", "index": i, "embedding": embedder.embed_one(text)}
+                for i, text in enumerate(texts)
+            ]
+            tokens = sum(len(text.split()) for text in texts)
+            self._send_json(
+                {
+                    "object": "list",
+                    "data": data,
+                    "model": request.get("model", embedder.model),
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                }
+            )
+
+        def _chat(self, request: dict) -> None:
+            question = next(
+                (m["content"] for m in reversed(request["messages"]) if m["role"] == "user"), ""
+            )
+            words = f"Stub answer to: {question}".split(" ")
+            base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": request["model"]}
+
+            if not request.get("stream"):
+                message = {"role": "assistant", "content": " ".join(words)}
+                self._send_json(
+                    {
+                        **base,
+                        "object": "chat.completion",
+                        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                    }
+                )
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            deltas = [{"role": "assistant", "content": ""}]
+            deltas += [{"content": word if i == 0 else f" {word}"} for i, word in enumerate(words)]
+            for i, delta in enumerate(deltas):
+                finish = "stop" if i == len(deltas) - 1 else None
+                chunk = {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                }
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, text: str) -> None:
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return StubHandler
+
+
+def start_stub_server(
+    host: str = "127.0.0.1", port: int = 0, ndims: int = 1536, latency: float = 0.0
+) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub on a background thread.
+
+    Returns:
+        The server (call shutdown() to stop it) and its base_url
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(HashingEmbedder(ndims), latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ndims", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(
+        (args.host, args.port), make_handler(HashingEmbedder(args.ndims), args.latency)
+    )
+    print(f"Serving on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
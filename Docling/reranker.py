@@ -0,0 +1,140 @@
+"""
+Optional cross-encoder rerank stage.
+
+Retrieval ranks by embedding distance (or RRF), and we used to compensate for its
+mistakes by sending more chunks to the LLM. Instead, over-fetch candidates (e.g.
+top-50) and let a small cross-encoder, which reads query and chunk together,
+pick the best few.
+
+To keep per-query latency predictable on CPU:
+
+- at most max_candidates chunks are scored per query,
+- pairs are scored in batches of at most batch_size on a bounded thread pool,
+  with torch limited to torch_threads threads so batches do not oversubscribe
+  the cores,
+- scores are cached per (normalized query, chunk_id), so a repeated question
+  only scores chunks it has not seen.
+
+Latency is recorded separately from retrieval in RerankStats.
+"""
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, List, Optional
+
+import pyarrow as pa
+import torch
+from sentence_transformers import CrossEncoder
+
+from retrieval import SearchResults
+from retrieval_cache import TTLCache, normalize_query
+
+
+@dataclass
+class RerankStats:
+    queries: int = 0
+    pairs_scored: int = 0
+    cache_hits: int = 0
+    latencies_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def percentile(self, percent: float) -> float:
+        ordered = sorted(self.latencies_ms)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(percent / 100 * len(ordered)))]
+
+    def as_dict(self) -> dict:
+        return {
+            "queries": self.queries,
+            "pairs_scored": self.pairs_scored,
+            "cache_hits": self.cache_hits,
+            "p50_ms": round(self.percentile(50), 1),
+            "p95_ms": round(self.percentile(95), 1),
+        }
+
+
+class CrossEncoderReranker:
+    """Scores (query, chunk) pairs with a CPU cross-encoder and keeps the best."""
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        max_candidates: int = 50,
+        batch_size: int = 16,
+        max_workers: int = 2,
+        torch_threads: Optional[int] = 2,
+        max_length: int = 512,
+        cache_size: int = 65536,
+        cache_ttl: Optional[float] = 24 * 3600,
+    ):
+        """Initialize the reranker.
+
+        Args:
+            model_name: Sentence-transformers cross-encoder to load (on CPU)
+            max_candidates: Maximum number of chunks scored per query
+            batch_size: Maximum number of pairs per forward pass
+            max_workers: Number of batches scored concurrently
+            torch_threads: Intra-op threads for torch (None leaves the default)
+            max_length: Tokens per pair; longer chunks are truncated
+            cache_size: Maximum number of cached (query, chunk) scores
+            cache_ttl: Seconds a cached score stays valid
+        """
+        if torch_threads is not None:
+            torch.set_num_threads(torch_threads)
+        self.model = CrossEncoder(model_name, device="cpu", max_length=max_length)
+        self.max_candidates = max_candidates
+        self.batch_size = batch_size
+        self.scores: TTLCache[float] = TTLCache(cache_size, cache_ttl)
+        self.stats = RerankStats()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="rerank")
+
+    def _score_batch(self, query: str, texts: List[str]) -> List[float]:
+        with torch.inference_mode():
+            scores = self.model.predict(
+                [(query, text) for text in texts],
+                batch_size=len(texts),
+                show_progress_bar=False,
+            )
+        return [float(score) for score in scores]
+
+    def score(self, query: str, chunk_ids: List[str], texts: List[str]) -> List[float]:
+        """Cross-encoder score of every chunk, from the cache where possible."""
+        key = normalize_query(query)
+        scores: List[Optional[float]] = [self.scores.get((key, cid)) for cid in chunk_ids]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        self.stats.cache_hits += len(chunk_ids) - len(missing)
+
+        batches = [missing[i : i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        futures = [
+            self._executor.submit(self._score_batch, query, [texts[i] for i in batch])
+            for batch in batches
+        ]
+        for batch, future in zip(batches, futures):
+            for i, score in zip(batch, future.result()):
+                scores[i] = score
+                self.scores.put((key, chunk_ids[i]), score)
+        self.stats.pairs_scored += len(missing)
+        return scores
+
+    def rerank(self, query: str, results: SearchResults, top_n: int = 5) -> SearchResults:
+        """The top_n results by cross-encoder score, with that score in the score column."""
+        start = time.perf_counter()
+        candidates = results.table.slice(0, self.max_candidates)
+        chunk_ids = candidates.column("chunk_id").to_pylist()
+        texts = candidates.column("text").to_pylist()
+        scores = self.score(query, chunk_ids, texts)
+
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_n]
+        best = candidates.take(order)
+        best = best.set_column(
+            best.column_names.index("score"),
+            "score",
+            pa.array([scores[i] for i in order], pa.float64()),
+        )
+        self.stats.queries += 1
+        self.stats.latencies_ms.append((time.perf_counter() - start) * 1000)
+        return SearchResults(best)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,120 @@
+"""
+Arrow-backed retrieval results.
+
+Search results used to go through to_pandas() and iterrows(), digging into the
+nested metadata struct row by row, and the chat UI then re-parsed the joined
+context string to get source and title back. SearchResults keeps the top-k rows
+as a flat pyarrow Table instead:
+
+    chunk_id | text | filename | page_numbers | title | score
+
+Queries fetch only PROJECTION (never the 1536-float vector column), the
+metadata struct is flattened with pyarrow.compute, and both the prompt context
+and the UI read the columns directly.
+"""
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Columns fetched from the "docling" table for retrieval
+PROJECTION = ["chunk_id", "text", "metadata"]
+# Distance of every vector query (and of the vector index); LanceDB defaults to
+# L2, so queries must set it explicitly: table.search(vector).metric(DISTANCE_METRIC)
+DISTANCE_METRIC = "cosine"
+METADATA_FIELDS = ("filename", "page_numbers", "title")
+# Columns of SearchResults.table
+RESULT_COLUMNS = ("chunk_id", "text", *METADATA_FIELDS, "score")
+# Score columns LanceDB adds, in order of preference
+SCORE_COLUMNS = ("_relevance_score", "_score", "_distance")
+
+
+class RetrievedChunk(NamedTuple):
+    chunk_id: str
+    text: str
+    filename: Optional[str]
+    page_numbers: Optional[List[int]]
+    title: Optional[str]
+    score: Optional[float]
+    # Ids of every chunk merged into this one (ContextPacker.merge), chunk_id first
+    merged_ids: Tuple[str, ...] = ()
+
+    @property
+    def chunk_ids(self) -> List[str]:
+        """Ids of all chunks this one is made of."""
+        return list(self.merged_ids) or [self.chunk_id]
+
+    @property
+    def source(self) -> str:
+        """Citation such as "guidelines.pdf - p. 3, 4"."""
+        parts = []
+        if self.filename:
+            parts.append(self.filename)
+        if self.page_numbers:
+            parts.append(f"p. {', '.join(str(p) for p in self.page_numbers)}")
+        return " - ".join(parts)
+
+
+def _scores(raw: pa.Table) -> pa.Array:
+    """Higher-is-better score from whichever score column the query produced."""
+    for name in SCORE_COLUMNS:
+        if name in raw.column_names:
+            column = raw.column(name)
+            if name == "_distance":
+                # Cosine distance (queries use DISTANCE_METRIC) -> cosine similarity
+                column = pc.subtract(1.0, column)
+            return pc.cast(column, pa.float64())
+    return pa.nulls(raw.num_rows, pa.float64())
+
+
+class SearchResults:
+    """Top-k retrieval results as a flat Arrow table."""
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+
+    @classmethod
+    def from_arrow(cls, raw: pa.Table, scores: Optional[Sequence[float]] = None) -> "SearchResults":
+        """Flatten a LanceDB result table.
+
+        Args:
+            raw: Result of a query selecting at least PROJECTION
+            scores: Scores to use instead of the query's own score column
+        """
+        metadata = raw.column("metadata")
+        score = pa.array(scores, pa.float64()) if scores is not None else _scores(raw)
+        columns = {
+            "chunk_id": raw.column("chunk_id"),
+            "text": raw.column("text"),
+            **{name: pc.struct_field(metadata, name) for name in METADATA_FIELDS},
+            "score": score,
+        }
+        return cls(pa.table(columns))
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def __iter__(self) -> Iterator[RetrievedChunk]:
+        columns = [self.table.column(name).to_pylist() for name in RESULT_COLUMNS]
+        return (RetrievedChunk(*values) for values in zip(*columns))
+
+    @property
+    def chunk_ids(self) -> List[str]:
+        return self.table.column("chunk_id").to_pylist()
+
+    @property
+    def scores(self) -> List[Optional[float]]:
+        return self.table.column("score").to_pylist()
+
+
+def format_chunk(chunk: RetrievedChunk) -> str:
+    """One chunk of prompt context, followed by its source and title."""
+    context = f"{chunk.text}\nSource: {chunk.source}"
+    if chunk.title:
+        context += f"\nTitle: {chunk.title}"
+    return context
+
+
+def format_context(results: Iterable[RetrievedChunk]) -> str:
+    """Prompt context from SearchResults or a list of chunks."""
+    return "\n\n".join(format_chunk(chunk) for chunk in results)
@@ -0,0 +1,200 @@
+"""
+Two-level cache for chat retrieval.
+
+Every chat turn used to re-embed the question through the OpenAI embedding
+function and re-run the vector search, even when the same question was asked a
+minute ago. RetrievalCache keeps:
+
+1. normalized query text -> query embedding
+2. (normalized query, table version, k, mode, scope) -> chunk ids of the top-k results
+
+Both levels have TTL and LRU eviction. The second level is cleared as soon as
+the table version changes, so new or re-indexed chunks are never hidden behind
+stale results; embeddings stay valid because the model does not change.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, List, Optional, TypeVar
+
+import pyarrow as pa
+
+from hybrid_search import HybridConfig, fts_search, hybrid_search, vector_search
+from retrieval import PROJECTION, SearchResults
+from search_filters import SearchScope
+
+V = TypeVar("V")
+
+
+@dataclass
+class CacheCounters:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TTLCache(Generic[V]):
+    """Thread-safe LRU cache whose entries also expire after ttl seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.counters = CacheCounters()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+                self._data.move_to_end(key)
+                self.counters.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.counters.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: V) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+
+def fetch_rows(table, chunk_ids: List[str]) -> pa.Table:
+    """Load the PROJECTION columns of rows by chunk_id, in the order of chunk_ids.
+
+    Backed by the chunk_id BTREE index (chunk_index.ensure_chunk_id_index).
+    """
+    if not chunk_ids:
+        return table.search().select(PROJECTION).limit(0).to_arrow()
+    id_list = ", ".join(f"'{cid}'" for cid in chunk_ids)
+    rows = (
+        table.search()
+        .where(f"chunk_id IN ({id_list})")
+        .select(PROJECTION)
+        .limit(len(chunk_ids))
+        .to_arrow()
+    )
+    position = {cid: i for i, cid in enumerate(rows.column("chunk_id").to_pylist())}
+    # Chunks deleted since the ids were cached are skipped
+    return rows.take([position[cid] for cid in chunk_ids if cid in position])
+
+
+class RetrievalCache:
+    """Query-embedding and top-k result cache in front of table.search()."""
+
+    def __init__(
+        self,
+        embed_query: Callable[[str], List[float]],
+        max_embeddings: int = 4096,
+        embedding_ttl: Optional[float] = 24 * 3600,
+        max_results: int = 4096,
+        result_ttl: Optional[float] = 3600,
+        search_options: Optional[Callable] = None,
+    ):
+        """Initialize the cache.
+
+        Args:
+            embed_query: Function returning the embedding of a query
+            max_embeddings: Maximum number of cached query embeddings
+            embedding_ttl: Seconds a query embedding stays valid
+            max_results: Maximum number of cached result lists
+            result_ttl: Seconds a result list stays valid
+            search_options: Function applied to every vector query before it
+                runs, e.g. VectorIndexManager.apply to set nprobes/refine_factor
+        """
+        self.embed_query = embed_query
+        self.embeddings: TTLCache[List[float]] = TTLCache(max_embeddings, embedding_ttl)
+        # Cached as (chunk ids, scores)
+        self.results: TTLCache[tuple] = TTLCache(max_results, result_ttl)
+        self.search_options = search_options
+        self._table_version: Optional[int] = None
+
+    def query_vector(self, query: str) -> List[float]:
+        key = normalize_query(query)
+        vector = self.embeddings.get(key)
+        if vector is None:
+            vector = self.embed_query(query)
+            self.embeddings.put(key, vector)
+        return vector
+
+    def _current_version(self, table) -> int:
+        version = table.version
+        if version != self._table_version:
+            # The table changed since the results were cached
+            self.results.clear()
+            self._table_version = version
+        return version
+
+    def search(
+        self,
+        table,
+        query: str,
+        k: int,
+        mode: str = "vector",
+        hybrid: HybridConfig = HybridConfig(),
+        scope: Optional[SearchScope] = None,
+    ) -> SearchResults:
+        """Top-k rows for query, served from the cache when possible.
+
+        Args:
+            table: The LanceDB table
+            query: The user question
+            k: Number of rows to return
+            mode: "vector", "fts" (BM25 only) or "hybrid" (RRF of both)
+            hybrid: Fusion settings for mode="hybrid"
+            scope: Restricts the search to files, a title and/or pages
+        """
+        key = (normalize_query(query), self._current_version(table), k, mode, hybrid, scope)
+        where = scope.to_where() if scope is not None else None
+        cached = self.results.get(key)
+        if cached is not None:
+            chunk_ids, scores = cached
+            rows = fetch_rows(table, chunk_ids)
+            if rows.num_rows == len(chunk_ids):
+                return SearchResults.from_arrow(rows, scores)
+
+        if mode == "vector":
+            rows = vector_search(table, self.query_vector(query), k, self.search_options, where)
+        elif mode == "fts":
+            rows = fts_search(table, query, k, where)
+        elif mode == "hybrid":
+            rows = hybrid_search(
+                table, query, self.query_vector(query), k, hybrid, self.search_options, where
+            )
+        else:
+            raise ValueError(f"Unknown search mode {mode!r}")
+        results = SearchResults.from_arrow(rows)
+        self.results.put(key, (results.chunk_ids, results.scores))
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "embedding_hit_rate": self.embeddings.counters.hit_rate,
+            "result_hit_rate": self.results.counters.hit_rate,
+            "embeddings": len(self.embeddings),
+            "results": len(self.results),
+            "table_version": self._table_version,
+        }
@@ -0,0 +1,305 @@
+"""
+Async retrieval service behind the chat app.
+
+The Streamlit script thread used to embed the question, search LanceDB and
+stream the answer one step after another, per session. RetrievalService moves
+that work onto one asyncio event loop shared by all sessions:
+
+1. one pooled httpx.AsyncClient for the embedding and chat endpoints (keep-alive
+   connections instead of a new TLS handshake per request),
+2. one shared read-only LanceDB table, searched on a small thread pool,
+3. request coalescing: concurrent identical questions share one embedding call
+   and one search.
+
+It is used from async code directly, or through ServiceClient, which runs the
+loop on a background thread and exposes plain blocking calls (Streamlit, scripts).
+base_url points the service at any OpenAI-compatible server, e.g. the local stub
+in openai_stub.py.
+
+Example:
+    with ServiceClient(ServiceConfig(base_url="http://127.0.0.1:8765/v1")) as client:
+        results = client.retrieve("what's docling?")
+        for token in client.stream_answer(messages, format_context(results)):
+            print(token, end="")
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional
+
+import httpx
+import lancedb
+from openai import AsyncOpenAI
+
+from embedding_stage import OpenAIEmbedder
+from hybrid_search import HybridConfig
+from retrieval import SearchResults
+from retrieval_cache import RetrievalCache, normalize_query
+from search_filters import SearchScope
+from vector_index import VectorIndexManager
+
+SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided context.
+    Use only the information from the context to answer questions. If you're unsure or the context
+    doesn't contain the relevant information, say so.
+
+    Context:
+    {context}
+    """
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and an assistant
+    about a document collection. Keep facts, names, numbers and open questions the user may refer
+    back to; drop pleasantries. Answer with the updated summary only, at most {max_words} words.
+
+    Current summary:
+    {summary}
+    """
+
+
+@dataclass
+class ServiceConfig:
+    # None uses OPENAI_BASE_URL or the OpenAI default
+    base_url: Optional[str] = None
+    api_key: Optional[str] = None
+    embedding_model: str = "text-embedding-3-small"
+    chat_model: str = "gpt-4o-mini"
+    temperature: float = 0.3
+    db_uri: str = "data/lancedb"
+    table_name: str = "docling"
+    # Connection pool shared by all sessions
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    timeout: float = 60.0
+    # Threads running LanceDB searches
+    search_threads: int = 8
+    read_consistency_interval: timedelta = timedelta(seconds=5)
+
+
+@dataclass
+class ServiceStats:
+    requests: int = 0
+    coalesced: int = 0
+    in_flight: Dict[str, int] = field(default_factory=dict)
+
+
+class Coalescer:
+    """Runs one coroutine per key; concurrent callers with the same key share its result."""
+
+    def __init__(self):
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable]):
+        future = self._pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield: one caller being cancelled must not cancel the shared work
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(factory())
+        self._pending[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+
+class RetrievalService:
+    """Embedding, search and answer streaming on one asyncio loop."""
+
+    def __init__(self, config: Optional[ServiceConfig] = None, table=None):
+        """Initialize the service; call start() before use.
+
+        Args:
+            config: Endpoints, models, pool sizes
+            table: An already opened LanceDB table (default: open config.table_name)
+        """
+        self.config = config or ServiceConfig()
+        self.table = table
+        self.http: Optional[httpx.AsyncClient] = None
+        self.openai: Optional[AsyncOpenAI] = None
+        self.embedder: Optional[OpenAIEmbedder] = None
+        self.cache: Optional[RetrievalCache] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._embeddings = Coalescer()
+        self._searches = Coalescer()
+        self._requests = 0
+
+    async def start(self) -> "RetrievalService":
+        config = self.config
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+            ),
+            timeout=config.timeout,
+        )
+        self.openai = AsyncOpenAI(
+            base_url=config.base_url or os.getenv("OPENAI_BASE_URL"),
+            api_key=config.api_key or os.getenv("OPENAI_API_KEY", "not-needed"),
+            http_client=self.http,
+        )
+        self.embedder = OpenAIEmbedder(model=config.embedding_model, client=self.openai)
+        self._executor = ThreadPoolExecutor(config.search_threads, thread_name_prefix="lancedb")
+
+        if self.table is None:
+            db = lancedb.connect(
+                config.db_uri, read_consistency_interval=config.read_consistency_interval
+            )
+            self.table = db.open_table(config.table_name)
+        self._loop = asyncio.get_running_loop()
+        index = VectorIndexManager(self.table)
+        self.cache = RetrievalCache(embed_query=self._embed_blocking, search_options=index.apply)
+        return self
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self.http is not None:
+            await self.http.aclose()
+
+    async def __aenter__(self) -> "RetrievalService":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def _embed_blocking(self, query: str) -> List[float]:
+        # retrieve() embeds before searching, so this only runs if the cached
+        # vector expired in between; called on a search thread, never on the loop
+        return asyncio.run_coroutine_threadsafe(self.embed(query), self._loop).result()
+
+    async def embed(self, query: str) -> List[float]:
+        """Query embedding, cached and coalesced on the normalized query."""
+        key = normalize_query(query)
+        vector = self.cache.embeddings.get(key)
+        if vector is not None:
+            return vector
+
+        async def compute() -> List[float]:
+            vector = (await self.embedder.embed([query]))[0]
+            self.cache.embeddings.put(key, vector)
+            return vector
+
+        return await self._embeddings.run(key, compute)
+
+    async def retrieve(
+        self,
+        query: str,
+        k: int = 5,
+        mode: str = "hybrid",
+        hybrid: HybridConfig = HybridConfig(),
+        scope: Optional[SearchScope] = None,
+    ) -> SearchResults:
+        """Top-k chunks for query; see RetrievalCache.search() for the options."""
+        self._requests += 1
+        key = (normalize_query(query), k, mode, hybrid, scope)
+
+        async def compute() -> SearchResults:
+            if mode != "fts":
+                await self.embed(query)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor,
+                lambda: self.cache.search(
+                    self.table, query, k, mode=mode, hybrid=hybrid, scope=scope
+                ),
+            )
+
+        return await self._searches.run(key, compute)
+
+    async def stream_answer(self, messages: List[dict], context: str) -> AsyncIterator[str]:
+        """Stream the chat completion for messages, answered from context."""
+        system = {"role": "system", "content": SYSTEM_PROMPT.format(context=context)}
+        stream = await self.openai.chat.completions.create(
+            model=self.config.chat_model,
+            messages=[system, *messages],
+            temperature=self.config.temperature,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def summarize(self, summary: str, messages: List[dict], max_words: int = 250) -> str:
+        """Fold messages into the running conversation summary."""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = SUMMARY_PROMPT.format(max_words=max_words, summary=summary or "(none)")
+        response = await self.openai.chat.completions.create(
+            model=self.config.chat_model,
+            messages=[
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": transcript},
+            ],
+            temperature=0.0,
+        )
+        return response.choices[0].message.content.strip()
+
+    def stats(self) -> ServiceStats:
+        return ServiceStats(
+            requests=self._requests,
+            coalesced=self._embeddings.coalesced + self._searches.coalesced,
+            in_flight={"embeddings": len(self._embeddings), "searches": len(self._searches)},
+        )
+
+
+class ServiceClient:
+    """Blocking facade: runs a RetrievalService on a background event loop."""
+
+    def __init__(self, config: Optional[ServiceConfig] = None, table=None):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.service = self._call(RetrievalService(config, table).start())
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    @property
+    def table(self):
+        return self.service.table
+
+    def embed(self, query: str) -> List[float]:
+        return self._call(self.service.embed(query))
+
+    def retrieve(self, query: str, k: int = 5, **kwargs) -> SearchResults:
+        return self._call(self.service.retrieve(query, k, **kwargs))
+
+    def stream_answer(self, messages: List[dict], context: str) -> Iterator[str]:
+        """Blocking generator over the answer tokens (usable with st.write_stream)."""
+        stream = self.service.stream_answer(messages, context)
+        try:
+            while True:
+                try:
+                    yield self._call(stream.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self._call(stream.aclose())
+
+    def summarize(self, summary: str, messages: List[dict]) -> Future:
+        """Start a summarization on the service loop without waiting for it."""
+        return asyncio.run_coroutine_threadsafe(
+            self.service.summarize(summary, messages), self._loop
+        )
+
+    def stats(self) -> ServiceStats:
+        return self.service.stats()
+
+    def close(self) -> None:
+        self._call(self.service.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def __enter__(self) -> "ServiceClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,87 @@
+"""
+Scoped search on chunk metadata.
+
+Every question used to search the whole "docling" table, even when the user
+only cares about one manual. A SearchScope restricts a search to some files, a
+section title and/or a page range. It becomes a SQL filter on the metadata
+struct that LanceDB applies as a pre-filter (before the vector or full-text
+search, so the top-k are all in scope), backed by scalar indexes:
+
+- metadata.filename: BITMAP (few distinct values, many rows each)
+- metadata.title: BTREE
+- metadata.page_numbers: LABEL_LIST (for array_has_any on the page list)
+
+Example:
+    scope = SearchScope(filenames=("guidlines.pdf",), page_from=3, page_to=10)
+    table.search(vector).where(scope.to_where(), prefilter=True).limit(5)
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+SCALAR_INDEXES = {
+    "metadata.filename": "BITMAP",
+    "metadata.title": "BTREE",
+    "metadata.page_numbers": "LABEL_LIST",
+}
+# Page ranges are expanded into a list for array_has_any; longer ranges are capped
+MAX_PAGE_RANGE = 2000
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+@dataclass(frozen=True)
+class SearchScope:
+    """Files, section title and page range a search is restricted to."""
+
+    filenames: Tuple[str, ...] = ()
+    title: Optional[str] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+
+    def to_where(self) -> Optional[str]:
+        """SQL filter for table.search().where(), or None for an unscoped search."""
+        clauses = []
+        if self.filenames:
+            clauses.append(
+                f"metadata.filename IN ({', '.join(_quote(name) for name in self.filenames)})"
+            )
+        if self.title:
+            clauses.append(f"metadata.title = {_quote(self.title)}")
+        if self.page_from is not None or self.page_to is not None:
+            first = self.page_from if self.page_from is not None else 1
+            last = self.page_to if self.page_to is not None else first + MAX_PAGE_RANGE - 1
+            last = min(last, first + MAX_PAGE_RANGE - 1)
+            pages = ", ".join(str(page) for page in range(first, last + 1))
+            clauses.append(f"array_has_any(metadata.page_numbers, [{pages}])")
+        return " AND ".join(clauses) or None
+
+
+def ensure_scalar_indexes(table, replace: bool = False) -> List[str]:
+    """Create the scalar indexes backing scoped search.
+
+    Returns:
+        Columns for which an index was created
+    """
+    indexed = {column for index in table.list_indices() for column in index.columns}
+    created = []
+    for column, index_type in SCALAR_INDEXES.items():
+        if replace or column not in indexed:
+            table.create_scalar_index(column, index_type=index_type, replace=True)
+            created.append(column)
+    return created
+
+
+def scope_options(table) -> Dict[str, List[str]]:
+    """Filenames in the table, each with the section titles it contains.
+
+    Reads only the metadata column; meant to be cached by the caller.
+    """
+    rows = table.search().select(["metadata"]).limit(table.count_rows()).to_arrow()
+    options: Dict[str, set] = {}
+    for metadata in rows.column("metadata").to_pylist():
+        titles = options.setdefault(metadata["filename"] or "", set())
+        if metadata["title"]:
+            titles.add(metadata["title"])
+    return {name: sorted(titles) for name, titles in sorted(options.items()) if name}
@@ -0,0 +1,193 @@
+"""
+Page-range sharding of a single large PDF.
+
+One 800-page PDF runs on a single pipeline instance, and num_threads is the only
+knob. Here the PDF is split into page ranges with pypdfium2, the ranges are
+converted on separate processes (ConversionEngine), and the partial
+DoclingDocuments are merged back into one document. The merge works on the
+export_to_dict() form: item references (#/texts/3, #/groups/1, ...) are shifted
+past the items of earlier shards and page numbers are shifted by the shard's
+first page, so chunk.meta.doc_items[].prov.page_no keeps pointing at the right
+page of the original file.
+
+Scripts using this must guard their entry point with if __name__ == "__main__":
+because the workers are spawned processes.
+"""
+import hashlib
+import re
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import pypdfium2 as pdfium
+from docling.datamodel.base_models import ConversionStatus, DocumentStream
+from docling.document_converter import DocumentConverter
+from docling_core.types.doc import DoclingDocument
+
+from conversion_engine import ConversionEngine, ConverterConfig
+
+# Top-level lists of DoclingDocument whose entries are addressed as #/<list>/<index>
+ITEM_LISTS = ("texts", "groups", "pictures", "tables", "key_value_items", "form_items")
+REF_KEYS = ("$ref", "self_ref")
+_REF_PATTERN = re.compile(r"^#/(%s)/(\d+)$" % "|".join(ITEM_LISTS))
+
+
+def split_pdf(content: bytes, shard_pages: int) -> List[Tuple[int, bytes]]:
+    """Split a PDF into shards of at most shard_pages pages.
+
+    Returns:
+        (first page number, 1-based, shard PDF bytes) for every shard
+    """
+    source = pdfium.PdfDocument(content)
+    try:
+        shards = []
+        for start in range(0, len(source), shard_pages):
+            end = min(start + shard_pages, len(source))
+            shard = pdfium.PdfDocument.new()
+            shard.import_pages(source, pages=list(range(start, end)))
+            buffer = BytesIO()
+            shard.save(buffer)
+            shard.close()
+            shards.append((start + 1, buffer.getvalue()))
+        return shards
+    finally:
+        source.close()
+
+
+def _shift(node, ref_offsets: Dict[str, int], page_offset: int):
+    """Copy of an item subtree with references and page numbers shifted."""
+    if isinstance(node, list):
+        return [_shift(value, ref_offsets, page_offset) for value in node]
+    if not isinstance(node, dict):
+        return node
+    shifted = {}
+    for key, value in node.items():
+        if key in REF_KEYS and isinstance(value, str):
+            match = _REF_PATTERN.match(value)
+            if match:
+                name, index = match.group(1), int(match.group(2))
+                value = f"#/{name}/{index + ref_offsets.get(name, 0)}"
+            shifted[key] = value
+        elif key == "page_no" and isinstance(value, int):
+            shifted[key] = value + page_offset
+        else:
+            shifted[key] = _shift(value, ref_offsets, page_offset)
+    return shifted
+
+
+def merge_documents(parts: List[Tuple[int, dict]]) -> dict:
+    """Merge shard documents (export_to_dict form) into one document dict.
+
+    Args:
+        parts: (first page number, document dict) per shard, in page order
+
+    Returns:
+        The merged document dict
+    """
+    merged = _shift(parts[0][1], {}, parts[0][0] - 1)
+    merged["pages"] = {}
+    for name in ITEM_LISTS:
+        merged[name] = []
+    merged["body"]["children"] = []
+    merged["furniture"]["children"] = []
+
+    for first_page, part in parts:
+        page_offset = first_page - 1
+        ref_offsets = {name: len(merged[name]) for name in ITEM_LISTS}
+        for name in ITEM_LISTS:
+            merged[name].extend(_shift(part.get(name, []), ref_offsets, page_offset))
+        for tree in ("body", "furniture"):
+            merged[tree]["children"].extend(
+                _shift(part[tree]["children"], ref_offsets, page_offset)
+            )
+        for page_key, page in part.get("pages", {}).items():
+            merged["pages"][str(int(page_key) + page_offset)] = _shift(page, {}, page_offset)
+
+    for name in ITEM_LISTS:
+        if not merged[name] and name not in parts[0][1]:
+            del merged[name]  # keep the schema of the docling-core version in use
+    return merged
+
+
+def count_pages(content: bytes) -> int:
+    pdf = pdfium.PdfDocument(content)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def convert_sharded(
+    source: Union[str, Path],
+    engine: ConversionEngine,
+    shard_pages: int = 50,
+    content: Optional[bytes] = None,
+    config: Optional[ConverterConfig] = None,
+) -> Tuple[DoclingDocument, ConversionStatus]:
+    """Convert one PDF by converting page ranges in parallel and merging them.
+
+    Args:
+        source: Path of the PDF (also used for the document name and filename)
+        engine: ConversionEngine whose workers convert the shards
+        shard_pages: Pages per shard
+        content: PDF bytes, if already in memory
+        config: Converter config for the shards (default: the engine's config)
+
+    Returns:
+        One DoclingDocument covering all pages with original page numbers, and
+        SUCCESS if every shard converted fully, otherwise PARTIAL_SUCCESS
+    """
+    content = content if content is not None else Path(source).read_bytes()
+    shards = split_pdf(content, shard_pages)
+    filename = Path(str(source)).name
+
+    with tempfile.TemporaryDirectory(prefix="docling_shards_") as tmp_dir:
+        paths = []
+        for first_page, shard_bytes in shards:
+            path = Path(tmp_dir) / f"{Path(filename).stem}_p{first_page:05d}.pdf"
+            path.write_bytes(shard_bytes)
+            paths.append(path)
+
+        parts = []
+        status = ConversionStatus.SUCCESS
+        items = [(path, config) for path in paths] if config is not None else paths
+        for (first_page, _), output in zip(shards, engine.convert_all(items, ordered=True)):
+            if output.document is None:
+                raise RuntimeError(
+                    f"Shard starting at page {first_page} of {filename} failed: {output.error}"
+                )
+            if output.status != ConversionStatus.SUCCESS.value:
+                status = ConversionStatus.PARTIAL_SUCCESS
+            parts.append((first_page, output.document.export_to_dict()))
+
+    merged = merge_documents(parts)
+    merged["name"] = Path(filename).stem
+    origin = merged.get("origin") or {}
+    origin["filename"] = filename
+    # Hash of the whole file rather than of the first shard
+    origin["binary_hash"] = int.from_bytes(hashlib.sha256(content).digest()[:8], "big")
+    merged["origin"] = origin
+    return DoclingDocument.model_validate(merged), status
+
+
+def make_sharded_converter(
+    engine: ConversionEngine,
+    converter: DocumentConverter,
+    config: ConverterConfig,
+    threshold_pages: int = 200,
+    shard_pages: int = 50,
+) -> Callable[[str, bytes], Tuple[DoclingDocument, ConversionStatus]]:
+    """Build a convert_bytes callback for convert_cached().
+
+    PDFs with more than threshold_pages pages are sharded across the engine's
+    workers; everything else is converted directly with converter.
+    """
+
+    def convert_bytes(name: str, content: bytes) -> Tuple[DoclingDocument, ConversionStatus]:
+        if name.lower().endswith(".pdf") and count_pages(content) > threshold_pages:
+            return convert_sharded(name, engine, shard_pages, content=content, config=config)
+        result = converter.convert(DocumentStream(name=name, stream=BytesIO(content)))
+        return result.document, result.status
+
+    return convert_bytes
@@ -0,0 +1,252 @@
+"""
+Streaming convert -> chunk -> embed -> index pipeline.
+
+Each stage runs on its own thread and hands items to the next stage through a
+bounded queue. A slow stage fills its input queue, which blocks the stage before
+it (backpressure), so at any time only a handful of documents, chunks and batches
+are held in memory, no matter how large the corpus is.
+
+Every stage records how many items it consumed and produced, how long it was busy
+and the current depth of its input queue, so the bottleneck is easy to spot:
+
+    pipeline = build_ingest_pipeline(documents, chunker, indexer, embedding_stage)
+    for _ in pipeline.run():
+        pass
+    print(pipeline.report())
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from docling_core.types.doc import DoclingDocument
+
+from chunk_index import chunk_to_record
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+
+@dataclass
+class StageStats:
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    busy_seconds: float = 0.0
+    input_queue: Optional[queue.Queue] = field(default=None, repr=False)
+
+    @property
+    def queue_depth(self) -> int:
+        return self.input_queue.qsize() if self.input_queue is not None else 0
+
+    @property
+    def throughput(self) -> float:
+        """Items produced per busy second."""
+        return self.items_out / self.busy_seconds if self.busy_seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "throughput": round(self.throughput, 2),
+            "queue_depth": self.queue_depth,
+        }
+
+
+@dataclass
+class _Stage:
+    name: str
+    fn: Callable
+    kind: str  # "map", "flat_map" or "batch"
+    batch_size: int = 1
+
+
+class StreamingPipeline:
+    """A chain of threaded stages connected by bounded queues."""
+
+    def __init__(self, source: Iterable, name: str = "source", queue_size: int = 4):
+        """Initialize the pipeline.
+
+        Args:
+            source: Iterable feeding the first stage; it is consumed on its own thread
+            name: Name of the source stage in the stats
+            queue_size: Capacity of each queue between stages
+        """
+        self.source = source
+        self.source_name = name
+        self.queue_size = queue_size
+        self.stages: List[_Stage] = []
+        self.stats: List[StageStats] = []
+
+    def map(self, name: str, fn: Callable[[Any], Any]) -> "StreamingPipeline":
+        """Add a stage producing one output per input."""
+        self.stages.append(_Stage(name, fn, "map"))
+        return self
+
+    def flat_map(self, name: str, fn: Callable[[Any], Iterable]) -> "StreamingPipeline":
+        """Add a stage producing any number of outputs per input."""
+        self.stages.append(_Stage(name, fn, "flat_map"))
+        return self
+
+    def batch(
+        self, name: str, batch_size: int, fn: Callable[[List[Any]], Iterable]
+    ) -> "StreamingPipeline":
+        """Add a stage that collects up to batch_size inputs and processes them together."""
+        self.stages.append(_Stage(name, fn, "batch", batch_size))
+        return self
+
+    def run(self) -> Iterator[Any]:
+        """Start all stages and yield the outputs of the last one."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        self.stats = [StageStats(self.source_name)]
+        self.stats += [StageStats(s.name, input_queue=queues[i]) for i, s in enumerate(self.stages)]
+
+        threads = [
+            threading.Thread(
+                target=self._run_source, args=(queues[0], self.stats[0]), daemon=True
+            )
+        ]
+        for i, stage in enumerate(self.stages):
+            threads.append(
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(stage, queues[i], queues[i + 1], self.stats[i + 1]),
+                    daemon=True,
+                )
+            )
+        for thread in threads:
+            thread.start()
+
+        out_queue = queues[-1]
+        while True:
+            item = out_queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _StageError):
+                raise RuntimeError(f"Stage '{item.stage}' failed") from item.error
+            yield item
+
+        for thread in threads:
+            thread.join()
+
+    def report(self) -> List[dict]:
+        return [s.as_dict() for s in self.stats]
+
+    def _run_source(self, out_queue: queue.Queue, stats: StageStats) -> None:
+        iterator = iter(self.source)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stats.busy_seconds += time.perf_counter() - start
+                stats.items_out += 1
+                out_queue.put(item)
+        except BaseException as e:
+            out_queue.put(_StageError(stats.name, e))
+        out_queue.put(_DONE)
+
+    def _run_stage(
+        self, stage: _Stage, in_queue: queue.Queue, out_queue: queue.Queue, stats: StageStats
+    ) -> None:
+        def emit(outputs) -> None:
+            for output in outputs:
+                stats.items_out += 1
+                out_queue.put(output)
+
+        def process(items) -> None:
+            start = time.perf_counter()
+            if stage.kind == "map":
+                outputs = [stage.fn(items)]
+            else:
+                outputs = list(stage.fn(items))
+            stats.busy_seconds += time.perf_counter() - start
+            emit(outputs)
+
+        pending: List[Any] = []
+        failed = False
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                break
+            if failed:
+                continue  # drain upstream so it can finish
+            if isinstance(item, _StageError):
+                out_queue.put(item)
+                failed = True
+                continue
+            stats.items_in += 1
+            try:
+                if stage.kind == "batch":
+                    pending.append(item)
+                    if len(pending) >= stage.batch_size:
+                        batch, pending = pending, []
+                        process(batch)
+                else:
+                    process(item)
+            except BaseException as e:
+                out_queue.put(_StageError(stage.name, e))
+                failed = True
+
+        if pending and not failed:
+            try:
+                process(pending)
+            except BaseException as e:
+                out_queue.put(_StageError(stage.name, e))
+        out_queue.put(_DONE)
+
+
+def build_ingest_pipeline(
+    documents: Iterable[DoclingDocument],
+    chunker,
+    indexer,
+    embedding_stage,
+    embed_batch_size: int = 64,
+    write_batch_size: int = 256,
+    queue_size: int = 4,
+) -> StreamingPipeline:
+    """Wire up the standard ingestion pipeline.
+
+    Args:
+        documents: Converted documents, e.g. a generator over ConversionEngine
+            outputs or convert_cached() calls, so conversion is streamed as well
+        chunker: A HybridChunker
+        indexer: IncrementalIndexer of the target table
+        embedding_stage: EmbeddingStage computing the vectors
+        embed_batch_size: Number of chunks per embedding micro-batch
+        write_batch_size: Number of rows per LanceDB append
+        queue_size: Capacity of each queue between stages
+
+    Returns:
+        The pipeline; iterate pipeline.run() to execute it. It yields the number
+        of rows written by each append.
+    """
+    def chunk_document(document: DoclingDocument) -> Tuple[Optional[str], List[dict]]:
+        filename = document.origin.filename if document.origin else None
+        return filename, [chunk_to_record(chunk) for chunk in chunker.chunk(dl_doc=document)]
+
+    def write(records: List[dict]) -> List[int]:
+        indexer.table.add(records)
+        # Stale rows of a changed document go only after its new rows landed
+        indexer.mark_written(records)
+        return [len(records)]
+
+    return (
+        StreamingPipeline(documents, name="convert", queue_size=queue_size)
+        .map("chunk", chunk_document)
+        # Passes on only new chunks; stale rows are deleted after the write
+        .flat_map("plan", lambda document: indexer.plan_document(*document))
+        .batch("embed", embed_batch_size, embedding_stage.embed_records)
+        .batch("write", write_batch_size, write)
+    )
@@ -0,0 +1,12 @@
+import sys
+from pathlib import Path
+
+# Docling/docling.py would shadow the docling package once its folder is on the
+# path; import the installed package first
+try:
+    import docling  # noqa: F401
+except ImportError:
+    pass
+
+# The Docling modules import each other by bare name, as when run as scripts
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
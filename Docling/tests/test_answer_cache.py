@@ -0,0 +1,69 @@
+"""AnswerCache invalidation for answers built from packed (merged) context."""
+import lancedb
+import pyarrow as pa
+import pytest
+
+from answer_cache import EMBEDDING_DIMS, AnswerCache
+from context_packer import ContextPacker
+from embedding_stage import HashingEmbedder
+from retrieval import RetrievedChunk
+
+QUESTION = "how do I install docling?"
+
+
+class WordTokenizer:
+    def count_tokens(self, text: str) -> int:
+        return len(text.split())
+
+
+def row(chunk_id: str, text: str, page: int) -> dict:
+    metadata = {"filename": "guide.pdf", "page_numbers": [page], "title": None}
+    return {"chunk_id": chunk_id, "text": text, "metadata": metadata}
+
+
+@pytest.fixture
+def chunks_table(tmp_path):
+    rows = [
+        row("c1", "Install docling with pip.", 3),
+        row("c2", "Then run the converter on a PDF.", 4),
+    ]
+    db = lancedb.connect(str(tmp_path / "lancedb"))
+    return db.create_table("docling", pa.Table.from_pylist(rows))
+
+
+@pytest.fixture
+def packed():
+    # Same file, neighbouring pages: c2 is merged into c1
+    chunks = [
+        RetrievedChunk("c1", "Install docling with pip.", "guide.pdf", [3], None, 0.9),
+        RetrievedChunk("c2", "Then run the converter on a PDF.", "guide.pdf", [4], None, 0.8),
+    ]
+    packed = ContextPacker(WordTokenizer(), max_tokens=500).pack(chunks)
+    assert [chunk.chunk_id for chunk in packed.chunks] == ["c1"]
+    return packed
+
+
+def test_merged_chunk_ids_are_stored(tmp_path, chunks_table, packed):
+    cache = AnswerCache(uri=str(tmp_path / "answers"))
+    vector = HashingEmbedder(EMBEDDING_DIMS).embed_one(QUESTION)
+    cache.store(QUESTION, vector, packed.chunk_ids, "pip install docling")
+
+    hit = cache.lookup(vector, chunks_table)
+    assert hit is not None
+    assert hit.chunk_ids == ["c1", "c2"]
+
+
+def test_editing_a_merged_away_chunk_invalidates_the_answer(tmp_path, chunks_table, packed):
+    cache = AnswerCache(uri=str(tmp_path / "answers"))
+    vector = HashingEmbedder(EMBEDDING_DIMS).embed_one(QUESTION)
+    cache.store(QUESTION, vector, packed.chunk_ids, "pip install docling")
+
+    # Re-ingesting the edited chunk replaces its row under a new content-hash id
+    chunks_table.delete("chunk_id = 'c2'")
+    chunks_table.add([row("c2-edited", "Then run docling convert on a PDF.", 4)])
+
+    assert cache.lookup(vector, chunks_table) is None
+    assert cache.stats.stale == 1
+    # The stale entry is gone, so the next lookup is a plain miss
+    assert cache.lookup(vector, chunks_table) is None
+    assert cache.stats.stale == 1
@@ -0,0 +1,37 @@
+"""Profile selection from prescan results."""
+import pytest
+
+pytest.importorskip("pypdfium2")
+pytest.importorskip("docling.document_converter")
+
+from conversion_profiles import PdfScan, select_profile
+
+
+def scan(pages_with_text=0, textless_pages_with_images=0, paths=0, pages=10):
+    return PdfScan(
+        num_pages=pages,
+        pages_sampled=pages,
+        pages_with_text=pages_with_text,
+        chars=pages_with_text * 1000,
+        images=textless_pages_with_images,
+        paths=paths,
+        textless_pages_with_images=textless_pages_with_images,
+    )
+
+
+def test_textless_pdf_without_page_images_is_not_ocred():
+    # Blank or vector-only: nothing for OCR to read
+    assert select_profile(scan()) == "digital"
+    assert select_profile(scan(paths=1000)) == "digital"
+    assert select_profile(scan(), default="digital_tables") == "digital_tables"
+
+
+def test_image_only_pdf_is_scanned():
+    assert scan(textless_pages_with_images=10).scanned_ratio == 1.0
+    assert select_profile(scan(textless_pages_with_images=10)) == "scanned"
+
+
+def test_some_scanned_pages_switch_on_ocr():
+    assert select_profile(scan(pages_with_text=8, textless_pages_with_images=2)) == "mixed"
+    assert select_profile(scan(pages_with_text=10)) == "digital"
+    assert select_profile(scan(pages_with_text=10, paths=400)) == "digital_tables"
@@ -0,0 +1,28 @@
+"""EmbeddingStage against the local OpenAI stub."""
+import pytest
+from openai import AsyncOpenAI
+
+from embedding_stage import EmbeddingStage, HashingEmbedder, OpenAIEmbedder
+from openai_stub import start_stub_server
+
+NDIMS = 16
+
+
+@pytest.fixture
+def stage():
+    server, base_url = start_stub_server(ndims=NDIMS)
+    client = AsyncOpenAI(base_url=base_url, api_key="test")
+    stage = EmbeddingStage(OpenAIEmbedder("hashing", NDIMS, client), max_batch_size=2)
+    yield stage
+    stage.close()
+    server.shutdown()
+
+
+def test_embed_records_reuses_the_client_across_calls(stage):
+    # Like build_ingest_pipeline: one embed_records call per micro-batch
+    first = stage.embed_records([{"text": "docling converts pdfs"}, {"text": "lancedb"}])
+    second = stage.embed_records([{"text": "hybrid search"}, {"text": "chat app"}, {"text": "x"}])
+
+    expected = HashingEmbedder(NDIMS)
+    for record in first + second:
+        assert record["vector"] == pytest.approx(expected.embed_one(record["text"]))
@@ -0,0 +1,87 @@
+"""FastHybridChunker must chunk exactly like docling's HybridChunker."""
+import inspect
+from typing import Dict, List
+
+import pytest
+
+pytest.importorskip("docling")
+pytest.importorskip("semchunk")
+
+from docling.chunking import HybridChunker
+from docling_core.types.doc import DocItemLabel, DoclingDocument
+from transformers.tokenization_utils_base import PreTrainedTokenizerBase
+
+from fast_chunker import FastHybridChunker
+
+if "doc_serializer" in inspect.signature(HybridChunker._split_by_doc_items).parameters:
+    pytest.skip(
+        "FastHybridChunker targets the HybridChunker internals of docling-core < 2.30",
+        allow_module_level=True,
+    )
+
+MAX_TOKENS = 40
+
+
+class WordTokenizer(PreTrainedTokenizerBase):
+    """Offline stand-in for OpenAITokenizerWrapper: one token per word."""
+
+    def __init__(self):
+        super().__init__(model_max_length=MAX_TOKENS)
+        self._ids: Dict[str, int] = {}
+
+    def count_tokens(self, text: str) -> int:
+        return len(text.split())
+
+    def tokenize(self, text: str, **kwargs) -> List[int]:
+        return [self._ids.setdefault(word, len(self._ids)) for word in text.split()]
+
+    def encode(self, text: str, add_special_tokens: bool = False, **kwargs) -> List[int]:
+        return self.tokenize(text)
+
+    def decode(self, ids, **kwargs) -> str:
+        words = {index: word for word, index in self._ids.items()}
+        return " ".join(words[index] for index in ids)
+
+    def get_vocab(self) -> Dict[str, int]:
+        return dict(self._ids)
+
+    @property
+    def vocab_size(self) -> int:
+        return len(self._ids)
+
+
+def words(prefix: str, count: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+@pytest.fixture
+def document():
+    doc = DoclingDocument(name="guide")
+    doc.add_title(text="Guide")
+    doc.add_heading(text="Short paragraphs", level=1)
+    # Small peers under one heading, merged up to MAX_TOKENS
+    for i in range(12):
+        doc.add_text(label=DocItemLabel.TEXT, text=words(f"p{i}w", 3 + i % 5))
+    doc.add_heading(text="Steps", level=1)
+    # One list chunk with many doc items, split into windows
+    group = doc.add_group(label="list", name="steps")
+    for i in range(25):
+        doc.add_list_item(text=words(f"s{i}w", 2 + i % 4), parent=group)
+    doc.add_heading(text="Long paragraph", level=1)
+    # Larger than MAX_TOKENS on its own: split as plain text
+    doc.add_text(label=DocItemLabel.TEXT, text=words("long", 3 * MAX_TOKENS))
+    doc.add_text(label=DocItemLabel.TEXT, text=words("tail", 4))
+    return doc
+
+
+@pytest.mark.parametrize("merge_peers", [True, False])
+def test_same_chunks_as_hybrid_chunker(document, merge_peers):
+    def chunks(chunker_class):
+        chunker = chunker_class(
+            tokenizer=WordTokenizer(), max_tokens=MAX_TOKENS, merge_peers=merge_peers
+        )
+        return [(chunk.text, chunk.meta.export_json_dict()) for chunk in chunker.chunk(document)]
+
+    expected = chunks(HybridChunker)
+    assert len(expected) > 5  # the document exercises splitting and merging
+    assert chunks(FastHybridChunker) == expected
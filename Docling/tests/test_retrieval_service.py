@@ -0,0 +1,127 @@
+"""RetrievalService, Coalescer and ServiceClient against the local OpenAI stub."""
+import asyncio
+
+import lancedb
+import pyarrow as pa
+import pytest
+
+from embedding_stage import HashingEmbedder
+from openai_stub import start_stub_server
+from retrieval_service import Coalescer, RetrievalService, ServiceClient, ServiceConfig
+
+NDIMS = 32
+TEXTS = [
+    "Docling converts PDF documents into structured data",
+    "LanceDB stores vectors next to the chunk text",
+    "The chat app streams answers from the retrieved context",
+]
+
+
+@pytest.fixture
+def stub():
+    # A little latency so concurrent requests overlap
+    server, base_url = start_stub_server(ndims=NDIMS, latency=0.05)
+    yield base_url
+    server.shutdown()
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # keep data/vector_index.json of the repo out of it
+    embedder = HashingEmbedder(NDIMS)
+    metadata = pa.struct(
+        [("filename", pa.string()), ("page_numbers", pa.list_(pa.int32())), ("title", pa.string())]
+    )
+    schema = pa.schema(
+        [
+            ("chunk_id", pa.string()),
+            ("text", pa.string()),
+            ("vector", pa.list_(pa.float32(), NDIMS)),
+            ("metadata", metadata),
+        ]
+    )
+    rows = [
+        {
+            "chunk_id": f"c{i}",
+            "text": text,
+            "vector": embedder.embed_one(text),
+            "metadata": {"filename": "guide.pdf", "page_numbers": [i + 1], "title": None},
+        }
+        for i, text in enumerate(TEXTS)
+    ]
+    db = lancedb.connect(str(tmp_path / "lancedb"))
+    return db.create_table("docling", pa.Table.from_pylist(rows, schema=schema))
+
+
+def test_coalescer_runs_factory_once_for_concurrent_callers():
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        coalescer = Coalescer()
+        results = await asyncio.gather(*(coalescer.run("key", factory) for _ in range(10)))
+        return coalescer, results
+
+    coalescer, results = asyncio.run(main())
+    assert results == ["result"] * 10
+    assert calls == 1
+    assert coalescer.coalesced == 9
+    assert len(coalescer) == 0
+
+
+def test_coalescer_cancelled_caller_does_not_cancel_shared_work():
+    async def factory():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        coalescer = Coalescer()
+        first = asyncio.ensure_future(coalescer.run("key", factory))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(coalescer.run("key", factory))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == 42
+
+
+def test_service_coalesces_identical_concurrent_questions(stub, table):
+    async def main():
+        config = ServiceConfig(base_url=stub, api_key="test", embedding_model="hashing")
+        async with RetrievalService(config, table) as service:
+            results = await asyncio.gather(
+                *(service.retrieve(TEXTS[0], k=2, mode="vector") for _ in range(5))
+            )
+            return results, service.stats()
+
+    results, stats = asyncio.run(main())
+    assert all(r.chunk_ids == results[0].chunk_ids for r in results)
+    assert results[0].chunk_ids[0] == "c0"
+    assert stats.requests == 5
+    assert stats.coalesced == 4
+    assert stats.in_flight == {"embeddings": 0, "searches": 0}
+
+
+def test_client_round_trip(stub, table):
+    config = ServiceConfig(base_url=stub, api_key="test", embedding_model="hashing")
+    with ServiceClient(config, table) as client:
+        assert client.embed(TEXTS[1]) == pytest.approx(HashingEmbedder(NDIMS).embed_one(TEXTS[1]))
+
+        results = client.retrieve(TEXTS[1], k=1, mode="vector")
+        assert results.chunk_ids == ["c1"]
+        assert results.scores[0] == pytest.approx(1.0, abs=1e-4)
+
+        messages = [{"role": "user", "content": "what is docling?"}]
+        tokens = list(client.stream_answer(messages, context=TEXTS[0]))
+        assert len(tokens) > 1
+        assert "".join(tokens) == "Stub answer to: what is docling?"
+
+        summary = client.summarize("", messages).result(timeout=10)
+        # The stub echoes the transcript it was asked to summarize
+        assert summary == "Stub answer to: user: what is docling?"
@@ -1,41 +1,130 @@
-from typing import Dict, List, Tuple
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Dict, Iterator, List, Sequence, Tuple
 
 from tiktoken import get_encoding
 from transformers.tokenization_utils_base import PreTrainedTokenizerBase
 
 
+class _LazyVocab(Mapping):
+    """Read-only view of the vocabulary that never materializes ~100k entries.
+
+    Tokens are the string form of their ids, so lookups are computed on the fly.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+
+    def __getitem__(self, token: str) -> int:
+        try:
+            index = int(token)
+        except (TypeError, ValueError):
+            raise KeyError(token)
+        if not 0 <= index < self._size:
+            raise KeyError(token)
+        return index
+
+    def __iter__(self) -> Iterator[str]:
+        return (str(i) for i in range(self._size))
+
+    def __len__(self) -> int:
+        return self._size
+
+
 # Create a wrapper class to make OpenAI's tokenizer compatible with the HybridChunker interface
 class OpenAITokenizerWrapper(PreTrainedTokenizerBase):
-    """Minimal wrapper for OpenAI's tokenizer."""
+    """Minimal wrapper for OpenAI's tokenizer.
+
+    HybridChunker only needs token counts, and it asks for them many times for the
+    same segments while merging peers. Tokens are therefore kept as integer ids
+    (never converted to strings), and both encodings and counts are memoized.
+    """
 
     def __init__(
-        self, model_name: str = "cl100k_base", max_length: int = 8191, **kwargs
+        self,
+        model_name: str = "cl100k_base",
+        max_length: int = 8191,
+        encode_cache_size: int = 1024,
+        count_cache_size: int = 65536,
+        **kwargs
     ):
         """Initialize the tokenizer.
 
         Args:
             model_name: The name of the OpenAI encoding to use
             max_length: Maximum sequence length
+            encode_cache_size: Number of recent encodings (id tuples) kept in memory
+            count_cache_size: Number of recent token counts kept in memory
         """
         super().__init__(model_max_length=max_length, **kwargs)
         self.tokenizer = get_encoding(model_name)
         self._vocab_size = self.tokenizer.max_token_value
+        self._vocab = None
+        # Per-instance caches; counts are cheap to keep, full encodings less so
+        self._encode_cached = lru_cache(maxsize=encode_cache_size)(self._encode)
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._count_cache_size = count_cache_size
+        # One instance is shared by pipeline stage threads and chat sessions;
+        # the LRU reorders and evicts on every access
+        self._counts_lock = threading.Lock()
+
+    def _encode(self, text: str) -> Tuple[int, ...]:
+        return tuple(self.tokenizer.encode_ordinary(text))
+
+    def _remember_count(self, text: str, count: int) -> None:
+        with self._counts_lock:
+            self._counts[text] = count
+            if len(self._counts) > self._count_cache_size:
+                self._counts.popitem(last=False)
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens in text, memoized with an LRU (thread-safe)."""
+        with self._counts_lock:
+            count = self._counts.get(text)
+            if count is not None:
+                self._counts.move_to_end(text)
+                return count
+        # Encode outside the lock so threads do not serialize on tiktoken
+        count = len(self.tokenizer.encode_ordinary(text))
+        self._remember_count(text, count)
+        return count
+
+    def count_tokens_batch(self, texts: Sequence[str], num_threads: int = 8) -> List[int]:
+        """Count tokens for many texts, encoding the uncached ones in one batched call."""
+        with self._counts_lock:
+            missing = list(dict.fromkeys(t for t in texts if t not in self._counts))
+        if missing:
+            encoded = self.tokenizer.encode_ordinary_batch(missing, num_threads=num_threads)
+            for text, ids in zip(missing, encoded):
+                self._remember_count(text, len(ids))
+        return [self.count_tokens(text) for text in texts]
+
+    def tokenize(self, text: str, **kwargs) -> List[int]:
+        """Main method used by HybridChunker.
+
+        Returns integer token ids; the chunker only takes the length.
+        """
+        return list(self._encode_cached(text))
 
-    def tokenize(self, text: str, **kwargs) -> List[str]:
-        """Main method used by HybridChunker."""
-        return [str(t) for t in self.tokenizer.encode(text)]
+    def encode(self, text: str, add_special_tokens: bool = False, **kwargs) -> List[int]:
+        """Used by semchunk when HybridChunker splits oversized text."""
+        return list(self._encode_cached(text))
 
-    def _tokenize(self, text: str) -> List[str]:
+    def _tokenize(self, text: str) -> List[int]:
         return self.tokenize(text)
 
-    def _convert_token_to_id(self, token: str) -> int:
+    def _convert_token_to_id(self, token) -> int:
         return int(token)
 
     def _convert_id_to_token(self, index: int) -> str:
         return str(index)
 
     def get_vocab(self) -> Dict[str, int]:
-        return dict(enumerate(range(self.vocab_size)))
+        if self._vocab is None:
+            self._vocab = _LazyVocab(self.vocab_size)
+        return self._vocab
 
     @property
     def vocab_size(self) -> int:
@@ -47,4 +136,4 @@ class OpenAITokenizerWrapper(PreTrainedTokenizerBase):
     @classmethod
     def from_pretrained(cls, *args, **kwargs):
         """Class method to match HuggingFace's interface."""
-        return cls()
\ No newline at end of file
+        return cls()
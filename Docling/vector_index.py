@@ -0,0 +1,278 @@
+"""
+ANN index lifecycle for the "docling" table.
+
+Without a vector index every query is a brute-force scan, so latency grows
+linearly with the number of chunks. VectorIndexManager:
+
+- builds an IVF_PQ (or IVF_HNSW_SQ) index once the table passes min_rows,
+- folds new rows into the index with table.optimize() and rebuilds it in a
+  background thread once the table has grown enough that the partitions are stale,
+- tunes nprobes / refine_factor against exact search and writes a
+  recall-vs-latency report,
+- persists the tuned search parameters so the chat and search scripts use them.
+
+Example:
+    manager = VectorIndexManager(table)
+    manager.ensure_index()
+    report = manager.tune()
+    results = manager.apply(table.search(vector)).limit(5).to_pandas()
+"""
+import json
+import math
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from retrieval import DISTANCE_METRIC
+
+VECTOR_COLUMN = "vector"
+
+
+@dataclass
+class IndexSettings:
+    index_type: str = "IVF_PQ"  # or "IVF_HNSW_SQ"
+    metric: str = DISTANCE_METRIC
+    # Below this many rows a flat scan is fast enough and an index is not worth it
+    min_rows: int = 100_000
+    # Rebuild once the table has grown by this fraction since the last build
+    rebuild_growth: float = 0.5
+    # Fold new rows into the index once this many are unindexed
+    optimize_after_rows: int = 10_000
+    nprobes: int = 20
+    refine_factor: Optional[int] = 10
+    built_at_rows: int = 0
+    tuning_report: List[dict] = field(default_factory=list)
+
+
+class VectorIndexManager:
+    """Builds, maintains and tunes the vector index of one LanceDB table."""
+
+    def __init__(
+        self,
+        table,
+        settings: Optional[IndexSettings] = None,
+        settings_path: Optional[str] = "data/vector_index.json",
+    ):
+        """Initialize the manager.
+
+        Args:
+            table: The LanceDB table
+            settings: Index settings; loaded from settings_path if omitted, and
+                reloaded whenever a tuning run rewrites that file
+            settings_path: JSON file in which tuned settings are persisted
+        """
+        self.table = table
+        self.settings_path = Path(settings_path) if settings_path else None
+        self._settings_mtime: Optional[float] = None
+        self._reload = settings is None
+        self.settings = settings or self._load_settings()
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._index_state: Optional[tuple] = None  # (table version, has index)
+
+    # --------------------------------------------------------------
+    # Settings
+    # --------------------------------------------------------------
+
+    def _settings_file_mtime(self) -> Optional[float]:
+        try:
+            return self.settings_path.stat().st_mtime if self.settings_path else None
+        except FileNotFoundError:
+            return None
+
+    def _load_settings(self) -> IndexSettings:
+        self._settings_mtime = self._settings_file_mtime()
+        if self._settings_mtime is not None:
+            return IndexSettings(**json.loads(self.settings_path.read_text(encoding="utf-8")))
+        return IndexSettings()
+
+    def refresh_settings(self) -> None:
+        """Pick up settings saved by a tuning run in another process."""
+        if self._reload and self._settings_file_mtime() != self._settings_mtime:
+            self.settings = self._load_settings()
+
+    def save_settings(self) -> None:
+        if self.settings_path:
+            self.settings_path.parent.mkdir(parents=True, exist_ok=True)
+            self.settings_path.write_text(json.dumps(asdict(self.settings), indent=2), encoding="utf-8")
+            self._settings_mtime = self._settings_file_mtime()
+
+    # --------------------------------------------------------------
+    # Lifecycle
+    # --------------------------------------------------------------
+
+    def has_index(self) -> bool:
+        # list_indices() reads table metadata; only re-check when the version changes
+        version = self.table.version
+        if self._index_state is None or self._index_state[0] != version:
+            indexed = any(VECTOR_COLUMN in index.columns for index in self.table.list_indices())
+            self._index_state = (version, indexed)
+        return self._index_state[1]
+
+    def build_index(self) -> None:
+        """(Re)build the vector index from scratch."""
+        num_rows = self.table.count_rows()
+        ndims = self.table.schema.field(VECTOR_COLUMN).type.list_size
+        # Rules of thumb from the LanceDB docs: ~sqrt(rows) partitions and
+        # sub-vectors of 8-16 dimensions
+        num_partitions = max(1, int(math.sqrt(num_rows)))
+        num_sub_vectors = max(1, ndims // 16)
+        kwargs = dict(
+            metric=self.settings.metric,
+            vector_column_name=VECTOR_COLUMN,
+            num_partitions=num_partitions,
+            index_type=self.settings.index_type,
+            replace=True,
+        )
+        if self.settings.index_type == "IVF_PQ":
+            kwargs["num_sub_vectors"] = num_sub_vectors
+        with self._lock:
+            self.table.create_index(**kwargs)
+            self.settings.built_at_rows = num_rows
+            self.save_settings()
+
+    def ensure_index(self) -> bool:
+        """Build the index if the table is large enough and has none.
+
+        Returns:
+            True if an index exists afterwards
+        """
+        if self.has_index():
+            return True
+        if self.table.count_rows() < self.settings.min_rows:
+            return False
+        self.build_index()
+        return True
+
+    def unindexed_rows(self) -> int:
+        for index in self.table.list_indices():
+            if VECTOR_COLUMN in index.columns:
+                return self.table.index_stats(index.name).num_unindexed_rows
+        return self.table.count_rows()
+
+    def maintain(self, background: bool = True) -> str:
+        """Keep the index fresh after incremental inserts.
+
+        Returns:
+            What was done: "none", "optimize", "rebuild" or "rebuilding"
+        """
+        if not self.ensure_index():
+            return "none"
+        if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+            return "rebuilding"
+
+        num_rows = self.table.count_rows()
+        built_at = self.settings.built_at_rows or num_rows
+        if num_rows > built_at * (1 + self.settings.rebuild_growth):
+            if background:
+                self._rebuild_thread = threading.Thread(target=self.build_index, daemon=True)
+                self._rebuild_thread.start()
+            else:
+                self.build_index()
+            return "rebuild"
+        if self.unindexed_rows() >= self.settings.optimize_after_rows:
+            # Adds the new rows to the existing partitions without retraining
+            with self._lock:
+                self.table.optimize()
+            return "optimize"
+        return "none"
+
+    # --------------------------------------------------------------
+    # Querying and tuning
+    # --------------------------------------------------------------
+
+    def apply(self, query, nprobes: Optional[int] = None, refine_factor: Optional[int] = None):
+        """Set the metric and the tuned search parameters on a LanceDB vector query."""
+        query = query.metric(self.settings.metric)
+        if not self.has_index():
+            return query
+        self.refresh_settings()
+        query = query.nprobes(nprobes or self.settings.nprobes)
+        refine = refine_factor if refine_factor is not None else self.settings.refine_factor
+        if refine:
+            query = query.refine_factor(refine)
+        return query
+
+    def sample_queries(self, num_queries: int = 50) -> List[List[float]]:
+        """Use stored vectors as representative queries."""
+        rows = self.table.search().select([VECTOR_COLUMN]).limit(num_queries).to_arrow()
+        return [list(v) for v in rows.column(VECTOR_COLUMN).to_pylist()]
+
+    def recall_report(
+        self,
+        queries: Sequence[List[float]],
+        k: int = 10,
+        nprobes_grid: Sequence[int] = (5, 10, 20, 40, 80),
+        refine_grid: Sequence[Optional[int]] = (None, 5, 10),
+    ) -> List[dict]:
+        """Measure recall@k and latency of each setting against exact search."""
+        exact_ids, exact_ms = [], []
+        for vector in queries:
+            start = time.perf_counter()
+            rows = (
+                self.table.search(vector)
+                .metric(self.settings.metric)
+                .bypass_vector_index()
+                .limit(k)
+                .select(["chunk_id"])
+                .to_arrow()
+            )
+            exact_ms.append((time.perf_counter() - start) * 1000)
+            exact_ids.append(set(rows.column("chunk_id").to_pylist()))
+
+        report = []
+        for nprobes in nprobes_grid:
+            for refine in refine_grid:
+                recalls, latencies = [], []
+                for vector, truth in zip(queries, exact_ids):
+                    start = time.perf_counter()
+                    query = (
+                        self.table.search(vector)
+                        .metric(self.settings.metric)
+                        .limit(k)
+                        .select(["chunk_id"])
+                        .nprobes(nprobes)
+                    )
+                    if refine:
+                        query = query.refine_factor(refine)
+                    found = set(query.to_arrow().column("chunk_id").to_pylist())
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    recalls.append(len(found & truth) / len(truth) if truth else 1.0)
+                report.append(
+                    {
+                        "nprobes": nprobes,
+                        "refine_factor": refine,
+                        "recall": statistics.mean(recalls),
+                        "p50_ms": statistics.median(latencies),
+                        "p95_ms": _percentile(latencies, 95),
+                        "exact_p50_ms": statistics.median(exact_ms),
+                        "exact_p95_ms": _percentile(exact_ms, 95),
+                    }
+                )
+        return report
+
+    def tune(self, k: int = 10, target_recall: float = 0.95, num_queries: int = 50) -> List[dict]:
+        """Pick the fastest setting that reaches target_recall and persist it."""
+        if not self.has_index():
+            return []
+        report = self.recall_report(self.sample_queries(num_queries), k)
+        good = [r for r in report if r["recall"] >= target_recall] or [
+            max(report, key=lambda r: r["recall"])
+        ]
+        best = min(good, key=lambda r: r["p95_ms"])
+        self.settings.nprobes = best["nprobes"]
+        self.settings.refine_factor = best["refine_factor"]
+        self.settings.tuning_report = report
+        self.save_settings()
+        return report
+
+
+def _percentile(values: Sequence[float], percent: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
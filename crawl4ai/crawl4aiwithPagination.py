@@ -2,7 +2,7 @@ import asyncio
 import os
 from datetime import datetime
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
-from crawl4ai.extraction_strategy import JsonCssExtractionStrategy
+from css_extraction import CompiledSchema
 import json
 
 async def css_extraction():
@@ -19,7 +19,8 @@ async def css_extraction():
     os.makedirs(results_folder, exist_ok=True)
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    extraction_strategy = JsonCssExtractionStrategy(schema)
+    # Compiled once; extracts from the rendered HTML with lxml
+    extractor = CompiledSchema(schema)
     session_id = f"session_{timestamp}"
 
     all_quotes = []  # Collect all quotes here
@@ -29,7 +30,6 @@ async def css_extraction():
     async with AsyncWebCrawler() as crawler:
         for page in range(5):  # Crawl 4 pages
             run_config = CrawlerRunConfig(
-                extraction_strategy=extraction_strategy,
                 verbose=True,
                 session_id=session_id,
                 js_code=[
@@ -40,7 +40,7 @@ async def css_extraction():
             result = await crawler.arun(url=url, config=run_config)
 
             if result.success:
-                quotes_data = json.loads(result.extracted_content)
+                quotes_data = extractor.extract_html(result.html)
                 all_quotes.extend(quotes_data) 
                 
                 print(f"Extracted from page {page + 1}:")
@@ -2,7 +2,7 @@ import asyncio
 import os
 from datetime import datetime
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
-from crawl4ai.extraction_strategy import JsonCssExtractionStrategy
+from css_extraction import CompiledSchema
 import json
 import sys
 
@@ -13,11 +13,11 @@ async def css_extraction_imdb_reviews():
         "fields": [
             {"name": "author",        "selector": "[data-testid='author-link']","type": "text"}, 
             {"name": "date",          "selector": ".review-date","type": "text"},
-            {"name": "rating",        "selector": ".ipc-rating-star--rating","type": "text"},
+            {"name": "rating",        "selector": ".ipc-rating-star--rating","type": "text", "coerce": "float"},
             {"name": "title",         "selector": "[data-testid='review-summary'] a","type": "text"},
             {"name": "review_text",   "selector": ".ipc-html-content-inner-div","type": "text"},
-            {"name": "helpful_votes", "selector": ".ipc-voting__label__count--up","type": "text"},
-            {"name": "unhelpful_votes","selector": ".ipc-voting__label__count--down","type": "text"}
+            {"name": "helpful_votes", "selector": ".ipc-voting__label__count--up","type": "text", "coerce": "int"},
+            {"name": "unhelpful_votes","selector": ".ipc-voting__label__count--down","type": "text", "coerce": "int"}
         ]
     }
 
@@ -26,7 +26,8 @@ async def css_extraction_imdb_reviews():
     os.makedirs(results_folder, exist_ok=True)
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    extraction_strategy = JsonCssExtractionStrategy(schema)
+    # Compiled once; extracts from the rendered HTML with lxml
+    extractor = CompiledSchema(schema)
     session_id = f"imdb_reviews_all_single_{timestamp}" 
 
 
@@ -40,7 +41,6 @@ async def css_extraction_imdb_reviews():
 
     async with AsyncWebCrawler() as crawler:
         run_config = CrawlerRunConfig(
-            extraction_strategy=extraction_strategy,
             verbose=False, 
             session_id=session_id,
             js_code=js_click_all,
@@ -49,15 +49,14 @@ async def css_extraction_imdb_reviews():
 
         result = await crawler.arun(url=url, config=run_config)
 
-        if result.success:
-                reviews_data = json.loads(result.extracted_content)
-                all_reviews.extend(reviews_data)          
-        elif not result.success:
+        if not result.success:
              print(f"Error: Extraction failed: {result.error_message}", file=sys.stderr)
-        elif not result.extracted_content:
-             print("Warning: No content extracted. 'All' button issue or insufficient wait_time?", file=sys.stderr)
         else:
-            print("I have no idea why it doesnt work!")
+            reviews_data = extractor.extract_html(result.html)
+            if reviews_data:
+                all_reviews.extend(reviews_data)
+            else:
+                print("Warning: No content extracted. 'All' button issue or insufficient wait_time?", file=sys.stderr)
 
 
     json_filename = os.path.join(results_folder, f"imdb_reviews_all_{timestamp}.json")
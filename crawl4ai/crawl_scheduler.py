@@ -0,0 +1,343 @@
+# Concurrent crawling of many URLs with one shared browser
+#
+# The other scripts in this folder open an AsyncWebCrawler and await crawler.arun()
+# one URL at a time, so a 5,000-URL sitemap takes hours. CrawlScheduler crawls a
+# URL frontier with:
+# - a global concurrency limit (max_concurrency workers),
+# - a per-host politeness limit (at most per_host requests in flight per host and
+#   at least min_host_delay seconds between request starts on the same host),
+# - one shared browser: every worker keeps its own tab (a crawl4ai session) and
+#   reuses it for all its URLs instead of opening a new page each time,
+# - results streamed out as they complete,
+# - optionally a CrawlStateStore (crawl_state.py): every URL first gets a cheap
+#   conditional GET, and pages that did not change since the last crawl skip the
+#   browser and come back with their stored extraction; with discover, the links
+#   stored for them are followed again.
+#
+# Seeds come straight from utils_custom.get_sitemap_urls(), so the repository
+# root must be on PYTHONPATH (as for the Docling scripts):
+#   PYTHONPATH=. python crawl4ai/crawl_scheduler.py https://ds4sd.github.io/docling/
+
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+from urllib.parse import urldefrag, urlparse
+
+import httpx
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+
+from crawl_state import CrawlStateStore, PageCheck, check_page
+from utils_custom import get_sitemap_urls
+
+
+@dataclass
+class CrawlOutcome:
+    url: str
+    result: Optional[object] = None  # crawl4ai CrawlResult
+    error: Optional[str] = None
+    attempts: int = 1
+    elapsed: float = 0.0
+    unchanged: bool = False  # skipped: same content as the last recorded crawl
+    extraction: Optional[Any] = None  # stored extraction of an unchanged page
+
+    @property
+    def success(self) -> bool:
+        return self.unchanged or (self.result is not None and self.result.success)
+
+
+@dataclass
+class CrawlStats:
+    started: float = field(default_factory=time.monotonic)
+    pages: int = 0
+    failures: int = 0
+    unchanged: int = 0
+    per_host: Counter = field(default_factory=Counter)
+
+    @property
+    def pages_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.pages / elapsed if elapsed else 0.0
+
+
+class Frontier:
+    """Queue of URLs still to crawl; every URL is crawled at most once."""
+
+    def __init__(self, max_pages: Optional[int] = None):
+        self.max_pages = max_pages
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.seen: Set[str] = set()
+
+    @staticmethod
+    def normalize(url: str) -> str:
+        return urldefrag(url.strip())[0]
+
+    def add(self, url: str) -> bool:
+        url = self.normalize(url)
+        if not url or url in self.seen:
+            return False
+        if self.max_pages is not None and len(self.seen) >= self.max_pages:
+            return False
+        self.seen.add(url)
+        self.queue.put_nowait(url)
+        return True
+
+    def add_all(self, urls: Iterable[str]) -> int:
+        return sum(self.add(url) for url in urls)
+
+
+class HostLimiter:
+    """Per-host concurrency limit and minimum delay between request starts."""
+
+    def __init__(self, per_host: int = 2, min_delay: float = 0.5):
+        self.per_host = per_host
+        self.min_delay = min_delay
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_start: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        host = urlparse(url).netloc
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.min_delay
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+
+def internal_links(url: str, result) -> List[str]:
+    """Links on a crawled page that stay on the same host (for discover=)."""
+    host = urlparse(url).netloc
+    links = (result.links or {}).get("internal", [])
+    return [link["href"] for link in links if urlparse(link["href"]).netloc == host]
+
+
+class CrawlScheduler:
+    """Crawls a URL frontier concurrently with one shared browser."""
+
+    def __init__(
+        self,
+        browser_config: Optional[BrowserConfig] = None,
+        run_config: Optional[CrawlerRunConfig] = None,
+        max_concurrency: int = 8,
+        per_host: int = 2,
+        min_host_delay: float = 0.5,
+        max_retries: int = 1,
+        max_pages: Optional[int] = None,
+        discover: Optional[Callable[[str, object], Iterable[str]]] = None,
+        state: Optional[CrawlStateStore] = None,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            browser_config: Config of the shared browser
+            run_config: Config used for every page; each worker gets its own copy
+                with a session_id, so it reuses one tab
+            max_concurrency: Number of pages crawled at the same time (= tabs)
+            per_host: Maximum number of pages in flight per host
+            min_host_delay: Minimum seconds between request starts on one host
+            max_retries: Extra attempts for a failed page
+            max_pages: Stop adding URLs to the frontier after this many
+            discover: Function (url, result) returning more URLs to crawl,
+                e.g. internal_links; None crawls only the seeds. Unchanged pages
+                are not rendered; the links recorded for them are followed instead
+            state: Store of validators and content hashes (with a file of its
+                own); pages unchanged since the last crawl are skipped, crawled
+                pages are recorded with their extraction and discovered links
+        """
+        self.browser_config = browser_config or BrowserConfig(headless=True, verbose=False)
+        self.run_config = run_config or CrawlerRunConfig(verbose=False)
+        self.max_concurrency = max_concurrency
+        self.hosts = HostLimiter(per_host, min_host_delay)
+        self.max_retries = max_retries
+        self.max_pages = max_pages
+        self.discover = discover
+        self.state = state
+        self.stats = CrawlStats()
+
+    async def _fetch(
+        self, crawler: AsyncWebCrawler, url: str, config: CrawlerRunConfig
+    ) -> CrawlOutcome:
+        start = time.monotonic()
+        outcome = CrawlOutcome(url, attempts=0)
+        for attempt in range(1 + self.max_retries):
+            outcome.attempts = attempt + 1
+            async with self.hosts.slot(url):
+                try:
+                    outcome.result = await crawler.arun(url=url, config=config)
+                    outcome.error = None if outcome.result.success else outcome.result.error_message
+                except Exception as e:
+                    outcome.result, outcome.error = None, str(e)
+            if outcome.success:
+                break
+            if attempt < self.max_retries:
+                await asyncio.sleep(2**attempt)  # back off before retrying
+        outcome.elapsed = time.monotonic() - start
+        return outcome
+
+    async def _check(self, client: httpx.AsyncClient, url: str) -> Optional[PageCheck]:
+        """Conditional GET against the state store; None if it could not be made."""
+        async with self.hosts.slot(url):
+            try:
+                return await check_page(url, self.state, client)
+            except httpx.HTTPError:
+                return None  # let the browser crawl report the error
+
+    def _record(
+        self, check: Optional[PageCheck], outcome: CrawlOutcome, links: Optional[List[str]]
+    ) -> None:
+        # 304 and same-hash 200s are recorded too: they reach the browser only to
+        # find the links of a page stored without them
+        if check is None or check.status not in (200, 304) or not outcome.success:
+            return
+        extraction = outcome.result.extracted_content
+        if extraction:
+            try:
+                extraction = json.loads(extraction)
+            except ValueError:
+                pass
+        self.state.record_check(check, extraction, links)
+
+    async def _crawl_url(
+        self,
+        crawler: AsyncWebCrawler,
+        url: str,
+        config: CrawlerRunConfig,
+        frontier: Frontier,
+        client: Optional[httpx.AsyncClient],
+    ) -> CrawlOutcome:
+        check = await self._check(client, url) if client is not None else None
+        stored = self.state.get(url) if check is not None and not check.changed else None
+        # Without recorded links (older state) the page is crawled to discover them
+        if stored is not None and (self.discover is None or stored.links is not None):
+            if self.discover is not None:
+                frontier.add_all(stored.links)
+            self.stats.unchanged += 1
+            return CrawlOutcome(url, unchanged=True, extraction=stored.extraction)
+        outcome = await self._fetch(crawler, url, config)
+        links = None
+        if outcome.success and self.discover is not None:
+            links = list(self.discover(url, outcome.result))
+        if client is not None:
+            self._record(check, outcome, links)
+        self.stats.pages += 1
+        self.stats.per_host[urlparse(url).netloc] += 1
+        if not outcome.success:
+            self.stats.failures += 1
+        elif links:
+            frontier.add_all(links)
+        return outcome
+
+    async def _worker(
+        self,
+        index: int,
+        crawler: AsyncWebCrawler,
+        frontier: Frontier,
+        results: asyncio.Queue,
+        client: Optional[httpx.AsyncClient],
+    ) -> None:
+        session_id = f"scheduler_tab_{index}"
+        config = self.run_config.clone(session_id=session_id)
+        try:
+            while True:
+                url = await frontier.queue.get()
+                if url is None:
+                    return
+                try:
+                    try:
+                        outcome = await self._crawl_url(crawler, url, config, frontier, client)
+                    except Exception as e:
+                        # A failing discover() or state store fails this URL only; a
+                        # dead worker would leave the frontier to hang queue.join()
+                        outcome = CrawlOutcome(url, error=f"{type(e).__name__}: {e}")
+                        self.stats.failures += 1
+                    await results.put(outcome)
+                finally:
+                    frontier.queue.task_done()
+        finally:
+            await crawler.crawler_strategy.kill_session(session_id)
+
+    async def crawl(self, seeds: Iterable[str]) -> AsyncIterator[CrawlOutcome]:
+        """Crawl seeds (and discovered URLs), yielding outcomes as they complete."""
+        frontier = Frontier(self.max_pages)
+        frontier.add_all(seeds)
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency * 2)
+        self.stats = CrawlStats()
+
+        # One pooled HTTP client for the conditional GETs of all workers
+        client = (
+            httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_concurrency), timeout=30
+            )
+            if self.state is not None
+            else None
+        )
+        async with AsyncWebCrawler(config=self.browser_config) as crawler:
+            workers = [
+                asyncio.create_task(self._worker(i, crawler, frontier, results, client))
+                for i in range(self.max_concurrency)
+            ]
+
+            async def finish() -> None:
+                # Frontier drained and nothing in flight (in-flight pages may add URLs)
+                await frontier.queue.join()
+                for _ in workers:
+                    frontier.queue.put_nowait(None)
+                await asyncio.gather(*workers)
+                await results.put(None)
+
+            supervisor = asyncio.create_task(finish())
+            try:
+                while (outcome := await results.get()) is not None:
+                    yield outcome
+            finally:
+                for task in (*workers, supervisor):
+                    task.cancel()
+                await asyncio.gather(*workers, supervisor, return_exceptions=True)
+                if client is not None:
+                    await client.aclose()
+
+
+async def main(base_url: str) -> None:
+    results_folder = os.path.join(os.getcwd(), "crawl_results")
+    os.makedirs(results_folder, exist_ok=True)
+
+    seeds = get_sitemap_urls(base_url)
+    print(f"Crawling {len(seeds)} URLs from the sitemap of {base_url}")
+
+    # Markdown files keep a stable name per URL, so unchanged pages keep theirs.
+    # The scheduler has its own state file: pages checked by the Docling scripts
+    # must still be crawled (and written) here
+    state = CrawlStateStore("data/crawl_state_scheduler.sqlite")
+    scheduler = CrawlScheduler(max_concurrency=8, per_host=4, min_host_delay=0.2, state=state)
+    async for outcome in scheduler.crawl(seeds):
+        if outcome.unchanged:
+            print(f"SAME {outcome.url}")
+        elif outcome.success:
+            name = urlparse(outcome.url).path.strip("/").replace("/", "_") or "index"
+            with open(os.path.join(results_folder, f"{name}.md"), "w", encoding="utf-8") as f:
+                f.write(outcome.result.markdown)
+            print(f"OK   {outcome.elapsed:5.1f}s {outcome.url}")
+        else:
+            print(f"FAIL {outcome.url}: {outcome.error}", file=sys.stderr)
+
+    state.close()
+
+    stats = scheduler.stats
+    print(
+        f"{stats.pages} pages crawled, {stats.unchanged} unchanged, {stats.failures} failed, "
+        f"{stats.pages_per_second:.2f} pages/s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "https://ds4sd.github.io/docling/"))
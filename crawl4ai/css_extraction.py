@@ -0,0 +1,325 @@
+# Compiled CSS schema extraction with lxml
+#
+# crawl4aiwithPagination.py and crawl4aiwithScrolling.py describe what to scrape as
+# a JSON schema (baseSelector plus a list of fields), which JsonCssExtractionStrategy
+# re-interprets on every page. Once fetching is parallel, that per-page overhead
+# dominates. CompiledSchema:
+# - translates every CSS selector to XPath once and compiles it with lxml,
+# - parses pages with lxml.html (libxml2) and runs the compiled selectors,
+# - coerces values while extracting: a field may add "coerce": "int" or "float"
+#   (e.g. helpful_votes, rating); crawl4ai ignores the extra key, so the same
+#   schema still works with JsonCssExtractionStrategy,
+# - has the same extract(url, html) method as the crawl4ai strategies, so it can
+#   be passed to TieredFetcher.
+# ExtractionPool extracts many documents in a process pool; every worker compiles
+# the schema once.
+#
+# Supported field types: text, attribute, html, regex, nested, nested_list and
+# list, with optional "default" and "transform" (lowercase, uppercase, strip).
+#
+#   python crawl4ai/css_extraction.py --documents 2000
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from lxml import etree, html as lxml_html
+from lxml.cssselect import CSSSelector
+from cssselect import HTMLTranslator
+
+Document = Union[str, bytes]
+
+# The k/m suffix must be a whole token: "1.2K" but not "12 Members"
+_NUMBER = re.compile(r"[-+]?\d[\d,]*(?:\.\d+)?(?:([kKmM])\b)?")
+_MULTIPLIERS = {"k": 1_000, "m": 1_000_000}
+_TRANSFORMS: Dict[str, Callable[[str], str]] = {
+    "lowercase": str.lower,
+    "uppercase": str.upper,
+    "strip": str.strip,
+}
+
+
+def _parse_number(value: Any) -> Optional[float]:
+    """First number in a label such as "1,234", "8/10" or "1.2K"."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    match = _NUMBER.search(str(value))
+    if match is None:
+        return None
+    number = float(match.group(0).rstrip("kKmM").replace(",", ""))
+    suffix = match.group(1)
+    return number * _MULTIPLIERS[suffix.lower()] if suffix else number
+
+
+def to_int(value: Any) -> Optional[int]:
+    number = _parse_number(value)
+    return int(round(number)) if number is not None else None
+
+
+def to_float(value: Any) -> Optional[float]:
+    return _parse_number(value)
+
+
+COERCIONS: Dict[str, Callable[[Any], Any]] = {"int": to_int, "float": to_float, "str": str}
+
+
+class CompiledField:
+    """One schema field with its selector compiled to XPath."""
+
+    def __init__(self, spec: Dict[str, Any], translator: HTMLTranslator):
+        self.name = spec["name"]
+        self.type = spec.get("type", "text")
+        self.default = spec.get("default")
+        self.attribute = spec.get("attribute")
+        self.pattern = re.compile(spec["pattern"]) if self.type == "regex" else None
+        self.transform = _TRANSFORMS[spec["transform"]] if spec.get("transform") else None
+        coerce = spec.get("coerce")
+        if coerce is not None and coerce not in COERCIONS:
+            raise ValueError(f"Unknown coerce {coerce!r} for field {self.name!r}")
+        self.coerce = COERCIONS.get(coerce)
+        if self.type not in ("text", "attribute", "html", "regex", "nested", "nested_list", "list"):
+            raise ValueError(f"Unknown field type {self.type!r} for field {self.name!r}")
+
+        # No selector means the item element itself; a selector only matches
+        # descendants, so "div" under a div item never returns the item
+        selector = spec.get("selector")
+        if selector:
+            xpath = translator.css_to_xpath(selector, prefix="descendant::")
+            self.find_all = etree.XPath(xpath)
+            self.find_first = etree.XPath(f"({xpath})[1]")
+        else:
+            self.find_all = self.find_first = etree.XPath("self::*")
+        self.fields = [CompiledField(sub, translator) for sub in spec.get("fields", [])]
+
+    def _value(self, element) -> Any:
+        if self.type == "text":
+            value = element.text_content().strip()
+        elif self.type == "attribute":
+            value = element.get(self.attribute)
+        elif self.type == "html":
+            value = etree.tostring(element, encoding="unicode", method="html")
+        else:  # regex
+            match = self.pattern.search(element.text_content())
+            value = match.group(1 if match.groups() else 0) if match else None
+        if value is None or value == "":
+            return self.default
+        if self.transform is not None:
+            value = self.transform(value)
+        if self.coerce is not None:
+            value = self.coerce(value)
+            if value is None:
+                return self.default
+        return value
+
+    def extract(self, element) -> Any:
+        if self.type == "nested_list":
+            return [_extract_item(found, self.fields) for found in self.find_all(element)]
+        if self.type == "list":
+            # Values of the single sub-field for every match
+            return [self.fields[0].extract(found) for found in self.find_all(element)]
+        found = self.find_first(element)
+        if not found:
+            return self.default
+        if self.type == "nested":
+            return _extract_item(found[0], self.fields)
+        return self._value(found[0])
+
+
+def _extract_item(element, fields: List[CompiledField]) -> Dict[str, Any]:
+    return {field.name: field.extract(element) for field in fields}
+
+
+class CompiledSchema:
+    """A crawl4ai JSON CSS schema compiled once and applied with lxml."""
+
+    def __init__(self, schema: Dict[str, Any]):
+        """Compile the schema.
+
+        Args:
+            schema: Dict with name, baseSelector and fields, as for
+                JsonCssExtractionStrategy; fields may add "coerce"
+
+        Raises:
+            ValueError: If a field type, transform or coercion is unknown
+            cssselect.SelectorError: If a selector is not valid CSS
+        """
+        translator = HTMLTranslator()
+        self.schema = schema
+        self.name = schema.get("name")
+        self.base = CSSSelector(schema["baseSelector"], translator=translator)
+        self.fields = [CompiledField(spec, translator) for spec in schema["fields"]]
+
+    def extract_tree(self, root) -> List[Dict[str, Any]]:
+        """Items of an already parsed lxml element."""
+        items = []
+        for element in self.base(root):
+            item = _extract_item(element, self.fields)
+            if any(value is not None and value != [] for value in item.values()):
+                items.append(item)
+        return items
+
+    def extract_html(self, document: Optional[Document]) -> List[Dict[str, Any]]:
+        """Items of one HTML document (str or bytes)."""
+        if not document or not document.strip():
+            return []
+        try:
+            root = lxml_html.fromstring(document)
+        except (etree.ParserError, ValueError):
+            return []
+        return self.extract_tree(root)
+
+    def extract(self, url: str, html: Document, *args, **kwargs) -> List[Dict[str, Any]]:
+        """Same call as crawl4ai's JsonCssExtractionStrategy.extract()."""
+        return self.extract_html(html)
+
+
+# --------------------------------------------------------------
+# Batch extraction in a process pool
+# --------------------------------------------------------------
+
+_worker_schema: Optional[CompiledSchema] = None
+
+
+def _init_worker(schema: Dict[str, Any]) -> None:
+    global _worker_schema
+    _worker_schema = CompiledSchema(schema)
+
+
+def _extract_in_worker(document: Document) -> List[Dict[str, Any]]:
+    return _worker_schema.extract_html(document)
+
+
+class ExtractionPool:
+    """Extracts many HTML documents with one schema on a pool of processes."""
+
+    def __init__(self, schema: Dict[str, Any], max_workers: Optional[int] = None):
+        """Initialize the pool.
+
+        Args:
+            schema: Schema to extract with; every worker compiles it once
+            max_workers: Number of processes (default: CPU count)
+        """
+        CompiledSchema(schema)  # fail here, not in the workers, on a bad schema
+        self.schema = schema
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.max_workers, initializer=_init_worker, initargs=(self.schema,)
+            )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self) -> "ExtractionPool":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def map(self, documents: Iterable[Document], chunksize: int = 32) -> Iterator[List[Dict[str, Any]]]:
+        """Items of every document, in input order.
+
+        Args:
+            documents: HTML documents (str or bytes)
+            chunksize: Documents sent to a worker at a time; larger chunks cut
+                inter-process overhead for small pages
+        """
+        self.start()
+        return self._executor.map(_extract_in_worker, documents, chunksize=chunksize)
+
+
+def extract_many(
+    schema: Dict[str, Any],
+    documents: Iterable[Document],
+    max_workers: Optional[int] = None,
+    chunksize: int = 32,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Convenience wrapper that runs an ExtractionPool for one batch of documents."""
+    with ExtractionPool(schema, max_workers) as pool:
+        yield from pool.map(documents, chunksize=chunksize)
+
+
+# --------------------------------------------------------------
+# Benchmark on synthetic IMDb-like review pages
+# --------------------------------------------------------------
+
+REVIEWS_SCHEMA = {
+    "name": "IMDb Reviews",
+    "baseSelector": "article.user-review-item",
+    "fields": [
+        {"name": "author", "selector": "[data-testid='author-link']", "type": "text"},
+        {"name": "date", "selector": ".review-date", "type": "text"},
+        {"name": "rating", "selector": ".ipc-rating-star--rating", "type": "text", "coerce": "float"},
+        {"name": "title", "selector": "[data-testid='review-summary'] a", "type": "text"},
+        {"name": "review_text", "selector": ".ipc-html-content-inner-div", "type": "text"},
+        {"name": "helpful_votes", "selector": ".ipc-voting__label__count--up", "type": "text", "coerce": "int"},
+        {"name": "unhelpful_votes", "selector": ".ipc-voting__label__count--down", "type": "text", "coerce": "int"},
+    ],
+}
+
+
+def review_page(page: int, per_page: int = 25) -> str:
+    reviews = "".join(
+        f'<article class="user-review-item"><a data-testid="author-link">user{page}_{i}</a>'
+        f'<span class="review-date">Jan {i + 1}, 2024</span>'
+        f'<span class="ipc-rating-star--rating">{i % 10 + 1}</span>'
+        f'<h3 data-testid="review-summary"><a href="#">Review {page}.{i}</a></h3>'
+        f'<div class="ipc-html-content-inner-div">{"Great film. " * 20}</div>'
+        f'<span class="ipc-voting__label__count--up">{i * 37:,}</span>'
+        f'<span class="ipc-voting__label__count--down">{i}</span></article>'
+        for i in range(per_page)
+    )
+    return f"<html><body><section>{reviews}</section></body></html>"
+
+
+def _extract_uncompiled(schema: Dict[str, Any], document: str) -> List[Dict[str, Any]]:
+    # Baseline: selectors translated again on every page
+    root = lxml_html.fromstring(document)
+    items = []
+    for element in root.cssselect(schema["baseSelector"]):
+        item = {}
+        for field in schema["fields"]:
+            found = element.cssselect(field["selector"])
+            item[field["name"]] = found[0].text_content().strip() if found else None
+        items.append(item)
+    return items
+
+
+def benchmark(documents: int = 2000, max_workers: Optional[int] = None) -> None:
+    pages = [review_page(page) for page in range(documents)]
+
+    start = time.perf_counter()
+    items = sum(len(_extract_uncompiled(REVIEWS_SCHEMA, page)) for page in pages)
+    print(f"uncompiled:        {items} items in {time.perf_counter() - start:.2f}s")
+
+    compiled = CompiledSchema(REVIEWS_SCHEMA)
+    start = time.perf_counter()
+    items = sum(len(compiled.extract_html(page)) for page in pages)
+    print(f"compiled:          {items} items in {time.perf_counter() - start:.2f}s")
+
+    with ExtractionPool(REVIEWS_SCHEMA, max_workers) as pool:
+        list(pool.map(pages[:1]))  # start the workers before timing
+        start = time.perf_counter()
+        items = sum(len(result) for result in pool.map(pages))
+        print(
+            f"compiled, {pool.max_workers} procs: {items} items in "
+            f"{time.perf_counter() - start:.2f}s"
+        )
+    print(compiled.extract_html(pages[0])[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compiled CSS extraction benchmark")
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    benchmark(args.documents, args.workers)
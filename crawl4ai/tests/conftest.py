@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The crawl4ai scripts import each other by bare name, and the shared modules
+# (crawl_state, utils_custom) from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(1, str(Path(__file__).resolve().parents[2]))
@@ -0,0 +1,117 @@
+"""CrawlScheduler with a CrawlStateStore against a local server that sends ETags."""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+# The folder shares its name with the package; skip unless crawl4ai is installed
+pytest.importorskip("crawl4ai.async_webcrawler")
+
+import crawl_scheduler
+from crawl_scheduler import CrawlScheduler, internal_links
+from crawl_state import CrawlStateStore
+
+PAGES = 3  # /0 links to /1, /1 to /2
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        etag = f'"{self.path}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class FakeCrawler:
+    """Stands in for the browser: page /n links to /n+1."""
+
+    def __init__(self, config=None):
+        self.crawler_strategy = SimpleNamespace(kill_session=self.kill_session)
+
+    async def __aenter__(self) -> "FakeCrawler":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    async def kill_session(self, session_id: str) -> None:
+        pass
+
+    async def arun(self, url: str, config=None):
+        base, page = url.rsplit("/", 1)
+        links = [{"href": f"{base}/{int(page) + 1}"}] if int(page) + 1 < PAGES else []
+        return SimpleNamespace(
+            success=True,
+            error_message=None,
+            extracted_content='{"page": %s}' % page,
+            links={"internal": links},
+        )
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CrawlStateStore(tmp_path / "crawl_state.sqlite")
+    yield store
+    store.close()
+
+
+@pytest.fixture(autouse=True)
+def fake_browser(monkeypatch):
+    monkeypatch.setattr(crawl_scheduler, "AsyncWebCrawler", FakeCrawler)
+
+
+def crawl(base_url, store, discover=internal_links):
+    scheduler = CrawlScheduler(max_concurrency=2, min_host_delay=0, discover=discover, state=store)
+
+    async def run():
+        return {outcome.url: outcome async for outcome in scheduler.crawl([f"{base_url}/0"])}
+
+    return asyncio.run(run()), scheduler.stats
+
+
+def test_unchanged_page_stored_without_links_is_crawled_once(base_url, store):
+    # Recorded by a crawl that did not discover links: the next check answers 304
+    store.record(f"{base_url}/0", content=b"/0", etag='"/0"')
+
+    first, stats = crawl(base_url, store)
+    assert len(first) == PAGES
+    assert stats.pages == PAGES and stats.unchanged == 0
+    assert store.get(f"{base_url}/0").links == [f"{base_url}/1"]
+
+    second, stats = crawl(base_url, store)
+    assert len(second) == PAGES  # stored links are followed
+    assert all(outcome.unchanged for outcome in second.values())
+    assert stats.pages == 0 and stats.unchanged == PAGES
+    assert second[f"{base_url}/1"].extraction == {"page": 1}
+
+
+def test_crawl_without_discovery_keeps_stored_links(base_url, store):
+    crawl(base_url, store)
+    # Changed content, crawled without discovery
+    store.record(f"{base_url}/0", content=b"old", etag='"old"')
+    crawl(base_url, store, discover=None)
+    assert store.get(f"{base_url}/0").links == [f"{base_url}/1"]
+
+    outcomes, stats = crawl(base_url, store)
+    assert len(outcomes) == PAGES
+    assert stats.unchanged == PAGES
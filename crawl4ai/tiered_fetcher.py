@@ -0,0 +1,335 @@
+# HTTP-only fast path for static pages, with the browser as a fallback
+#
+# Every other script in this folder renders each page in a headless browser, even
+# static pages like quotes.toscrape.com where the CSS schema can run directly on
+# the raw HTML. A browser render costs 10-50x a plain GET. TieredFetcher:
+# - tier "http": GET on one pooled httpx client, then the extraction strategy
+#   (a css_extraction.CompiledSchema, or e.g. JsonCssExtractionStrategy) on the
+#   response body,
+# - tier "browser": AsyncWebCrawler, started only when first needed, with the
+#   same extraction strategy run on the rendered HTML,
+# - escalates to the browser when the schema yields nothing, the request fails,
+#   or the run config needs JS (js_code / wait_for, like the IMDb "see more"
+#   click in crawl4aiwithScrolling.py),
+# - learns per host which tier works: after min_samples escalations with no HTTP
+#   successes a host goes straight to the browser, with an HTTP probe every
+#   probe_every pages in case the site changes.
+#
+# Run the benchmark against a local test server (no internet needed for the
+# HTTP tier; the browser tier needs crawl4ai's Playwright browser):
+#   python crawl4ai/tiered_fetcher.py --benchmark --pages 50
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CacheMode, CrawlerRunConfig
+
+from css_extraction import CompiledSchema
+
+HTTP = "http"
+BROWSER = "browser"
+
+QUOTES_SCHEMA = {
+    "name": "Quotes",
+    "baseSelector": "div.quote",
+    "fields": [
+        {"name": "quote", "selector": "span.text", "type": "text"},
+        {"name": "author", "selector": "small.author", "type": "text"},
+    ],
+}
+
+# Statuses that mean the page itself is missing; a browser will not do better
+FINAL_STATUSES = {404, 410}
+
+
+@dataclass
+class FetchResult:
+    url: str
+    tier: str
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    html: Optional[str] = None
+    status: Optional[int] = None
+    error: Optional[str] = None
+    escalated: Optional[str] = None  # why the HTTP tier was not enough
+    elapsed: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class HostTier:
+    """What the fetcher has learned about one host."""
+
+    http_successes: int = 0
+    escalations: int = 0
+    browser_pages: int = 0
+
+    def prefers_browser(self, min_samples: int) -> bool:
+        return self.http_successes == 0 and self.escalations >= min_samples
+
+
+class TieredFetcher:
+    """Fetches pages over plain HTTP when possible and with a browser when needed."""
+
+    def __init__(
+        self,
+        extraction_strategy,
+        browser_config: Optional[BrowserConfig] = None,
+        run_config: Optional[CrawlerRunConfig] = None,
+        max_connections: int = 20,
+        timeout: float = 20,
+        min_samples: int = 3,
+        probe_every: int = 20,
+    ):
+        """Initialize the fetcher.
+
+        Args:
+            extraction_strategy: Strategy with extract(url, html) -> list of dicts,
+                e.g. CompiledSchema(schema); used on both tiers
+            browser_config: Config of the fallback browser
+            run_config: Default config for browser fetches
+            max_connections: Size of the HTTP connection pool
+            timeout: Seconds to wait for an HTTP response
+            min_samples: Escalations without an HTTP success before a host goes
+                straight to the browser
+            probe_every: For such hosts, retry the HTTP tier every this many pages
+        """
+        self.extraction_strategy = extraction_strategy
+        self.browser_config = browser_config or BrowserConfig(headless=True, verbose=False)
+        self.run_config = run_config or CrawlerRunConfig(verbose=False)
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self.hosts: Dict[str, HostTier] = {}
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections),
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": "Mozilla/5.0 (compatible; AI_class crawler)"},
+        )
+        self._crawler: Optional[AsyncWebCrawler] = None
+        self._crawler_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "TieredFetcher":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+        if self._crawler is not None:
+            await self._crawler.close()
+            self._crawler = None
+
+    @staticmethod
+    def needs_js(config: CrawlerRunConfig) -> bool:
+        return bool(getattr(config, "js_code", None) or getattr(config, "wait_for", None))
+
+    def _use_http(self, host: str, config: CrawlerRunConfig) -> bool:
+        if self.needs_js(config):
+            return False
+        learned = self.hosts.get(host)
+        if learned is None or not learned.prefers_browser(self.min_samples):
+            return True
+        return learned.browser_pages % self.probe_every == 0
+
+    async def _browser(self) -> AsyncWebCrawler:
+        async with self._crawler_lock:
+            if self._crawler is None:
+                crawler = AsyncWebCrawler(config=self.browser_config)
+                await crawler.start()
+                self._crawler = crawler
+        return self._crawler
+
+    async def fetch_http(self, url: str) -> FetchResult:
+        """HTTP tier only: GET and extract; escalated is set if it was not enough."""
+        start = time.perf_counter()
+        result = FetchResult(url, HTTP)
+        try:
+            response = await self._client.get(url)
+        except httpx.HTTPError as e:
+            result.error, result.escalated = str(e), "request failed"
+        else:
+            result.status = response.status_code
+            if response.status_code != 200:
+                result.error = f"HTTP {response.status_code}"
+                if response.status_code not in FINAL_STATUSES:
+                    result.escalated = result.error
+            else:
+                result.html = response.text
+                result.items = self.extraction_strategy.extract(url, result.html)
+                if not result.items:
+                    result.escalated = "schema matched nothing"
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    async def fetch_browser(self, url: str, config: Optional[CrawlerRunConfig] = None) -> FetchResult:
+        """Browser tier only: render with crawl4ai and extract from the rendered HTML."""
+        start = time.perf_counter()
+        config = config or self.run_config
+        result = FetchResult(url, BROWSER)
+        crawler = await self._browser()
+        try:
+            crawled = await crawler.arun(url=url, config=config)
+        except Exception as e:
+            result.error = str(e)
+        else:
+            result.status = crawled.status_code
+            if crawled.success:
+                result.html = crawled.html
+                result.items = self.extraction_strategy.extract(url, crawled.html)
+            else:
+                result.error = crawled.error_message
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    async def fetch(self, url: str, config: Optional[CrawlerRunConfig] = None) -> FetchResult:
+        """Fetch and extract url on the cheapest tier that works for it.
+
+        Args:
+            url: Page to fetch
+            config: Browser run config for this page (default: run_config); a
+                config with js_code or wait_for always uses the browser
+        """
+        config = config or self.run_config
+        host = urlparse(url).netloc
+        learned = self.hosts.setdefault(host, HostTier())
+
+        reason = "needs JS" if self.needs_js(config) else "learned: host needs the browser"
+        if self._use_http(host, config):
+            result = await self.fetch_http(url)
+            if result.escalated is None:
+                if result.success:
+                    learned.http_successes += 1
+                return result
+            learned.escalations += 1
+            reason = result.escalated
+
+        browser_result = await self.fetch_browser(url, config)
+        learned.browser_pages += 1
+        browser_result.escalated = reason
+        return browser_result
+
+    async def fetch_all(
+        self,
+        urls: Iterable[str],
+        config: Optional[CrawlerRunConfig] = None,
+        max_concurrency: int = 10,
+    ) -> List[FetchResult]:
+        """Fetch many URLs concurrently, in input order."""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch_one(url: str) -> FetchResult:
+            async with semaphore:
+                return await self.fetch(url, config)
+
+        return await asyncio.gather(*(fetch_one(url) for url in urls))
+
+    def tier_counts(self) -> Dict[str, Dict[str, int]]:
+        return {host: vars(learned).copy() for host, learned in self.hosts.items()}
+
+
+# --------------------------------------------------------------
+# Local test server with quotes.toscrape.com-like pages
+# --------------------------------------------------------------
+
+
+def quotes_page(page: int, per_page: int = 10) -> bytes:
+    quotes = "".join(
+        f'<div class="quote"><span class="text">Quote {page}.{i}</span>'
+        f'<span>by <small class="author">Author {i}</small></span></div>'
+        for i in range(per_page)
+    )
+    pager = f'<ul class="pager"><li class="next"><a href="/page/{page + 1}/">Next</a></li></ul>'
+    return f"<html><head><title>Quotes</title></head><body>{quotes}{pager}</body></html>".encode()
+
+
+class QuotesHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        parts = [part for part in self.path.split("/") if part]
+        page = int(parts[1]) if len(parts) > 1 and parts[0] == "page" and parts[1].isdigit() else 1
+        body = quotes_page(page)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def start_quotes_server(port: int = 0) -> ThreadingHTTPServer:
+    """Serve quotes pages on localhost in a background thread (port 0 = any free port)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), QuotesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def benchmark(pages: int = 50, max_concurrency: int = 10) -> None:
+    server = start_quotes_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/page/{page}/" for page in range(1, pages + 1)]
+    strategy = CompiledSchema(QUOTES_SCHEMA)
+    run_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS, verbose=False)
+
+    try:
+        async with TieredFetcher(strategy, run_config=run_config) as fetcher:
+            start = time.perf_counter()
+            tiered = await fetcher.fetch_all(urls, max_concurrency=max_concurrency)
+            tiered_seconds = time.perf_counter() - start
+
+            # Same pages, always rendered in the browser (started before timing)
+            await fetcher._browser()
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def render(url: str) -> FetchResult:
+                async with semaphore:
+                    return await fetcher.fetch_browser(url)
+
+            start = time.perf_counter()
+            rendered = await asyncio.gather(*(render(url) for url in urls))
+            browser_seconds = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    for name, results, seconds in (
+        ("tiered ", tiered, tiered_seconds),
+        ("browser", rendered, browser_seconds),
+    ):
+        items = sum(len(result.items) for result in results)
+        tiers = {tier: sum(result.tier == tier for result in results) for tier in (HTTP, BROWSER)}
+        print(
+            f"{name}: {len(results)} pages, {items} items in {seconds:.2f}s "
+            f"({len(results) / seconds:.1f} pages/s) {tiers}"
+        )
+    print(f"speedup: {browser_seconds / tiered_seconds:.1f}x")
+
+
+async def main(pages: int) -> None:
+    urls = [f"http://quotes.toscrape.com/page/{page}/" for page in range(1, pages + 1)]
+    async with TieredFetcher(CompiledSchema(QUOTES_SCHEMA)) as fetcher:
+        for result in await fetcher.fetch_all(urls):
+            if result.success:
+                print(f"{result.tier:7} {result.elapsed:5.2f}s {len(result.items):3} items {result.url}")
+            else:
+                print(f"FAIL {result.url}: {result.error}", file=sys.stderr)
+        print(fetcher.tier_counts())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiered HTTP / browser fetcher")
+    parser.add_argument("--benchmark", action="store_true", help="run against a local test server")
+    parser.add_argument("--pages", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.pages) if args.benchmark else main(args.pages))
@@ -0,0 +1,252 @@
+"""
+Persistent crawl state for conditional re-crawls.
+
+Every crawl used to fetch every page from scratch, and nightly refreshes of the
+same sitemaps mostly re-downloaded identical pages. CrawlStateStore keeps, per
+URL, the ETag and Last-Modified validators, a hash of the content and the last
+extraction result in SQLite. A re-crawl first sends a conditional GET
+(If-None-Match / If-Modified-Since):
+
+- 304 Not Modified, or a 200 whose body hashes to the stored content hash
+  (servers without validators) -> unchanged: skip the browser, the extraction
+  and the Docling conversion, and reuse the stored extraction,
+- anything else -> changed: crawl it and record the new state.
+
+Shared by the crawl4ai scripts and the Docling scripts, like utils_custom. Each
+consumer needs its own database file: a check touches the stored state, so a
+page that one consumer already saw would look unchanged to the other.
+
+Example:
+    store = CrawlStateStore("data/crawl_state_docling.sqlite")
+    for check in changed_pages(get_sitemap_urls("https://ds4sd.github.io/docling/"), store):
+        ...  # crawl / convert check.url
+        store.record_check(check)
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import httpx
+
+
+@dataclass
+class PageState:
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    status: Optional[int] = None
+    fetched_at: Optional[float] = None
+    changed_at: Optional[float] = None
+    extraction: Optional[Any] = None
+    links: Optional[List[str]] = None  # links discovered on the page, replayed while unchanged
+
+
+@dataclass
+class PageCheck:
+    """Result of a conditional GET against the stored state."""
+
+    url: str
+    changed: bool
+    status: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    body: Optional[bytes] = None
+
+
+def content_hash(content: Union[str, bytes]) -> str:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class CrawlStateStore:
+    """SQLite table of page validators, content hashes and extraction results."""
+
+    def __init__(self, path: Union[str, Path]):
+        """Open (or create) the store.
+
+        Args:
+            path: SQLite file of this consumer, e.g. data/crawl_state_docling.sqlite;
+                never share one file between consumers
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT, "
+            "status INTEGER, fetched_at REAL, changed_at REAL, extraction TEXT, links TEXT)"
+        )
+        # Stores created before links were recorded
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}
+        if "links" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN links TEXT")
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[PageState]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, content_hash, status, fetched_at, "
+                "changed_at, extraction, links FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        state = PageState(*row)
+        state.extraction = json.loads(state.extraction) if state.extraction else None
+        state.links = json.loads(state.links) if state.links is not None else None
+        return state
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        state = self.get(url)
+        headers = {}
+        if state is not None and state.etag:
+            headers["If-None-Match"] = state.etag
+        if state is not None and state.last_modified:
+            headers["If-Modified-Since"] = state.last_modified
+        return headers
+
+    def record(
+        self,
+        url: str,
+        content: Optional[Union[str, bytes]] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        status: int = 200,
+        extraction: Optional[Any] = None,
+        hash_: Optional[str] = None,
+        links: Optional[Iterable[str]] = None,
+    ) -> bool:
+        """Store the state of a freshly crawled page.
+
+        Args:
+            url: The page URL
+            content: Raw page content, hashed unless hash_ is given
+            etag: ETag response header
+            last_modified: Last-Modified response header
+            status: HTTP status of the fetch
+            extraction: Extraction result (JSON-serializable) to reuse while unchanged
+            hash_: Precomputed content hash
+            links: Links discovered on the page, to follow again while it is unchanged;
+                None keeps the links stored before
+
+        Returns:
+            True if the content differs from what was stored before
+        """
+        new_hash = hash_ or (content_hash(content) if content is not None else None)
+        previous = self.get(url)
+        changed = previous is None or previous.content_hash != new_hash
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                # links=None (a crawl without discovery) keeps the links stored before
+                "INSERT INTO pages (url, etag, last_modified, content_hash, status, "
+                "fetched_at, changed_at, extraction, links) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, "
+                "last_modified = excluded.last_modified, content_hash = excluded.content_hash, "
+                "status = excluded.status, fetched_at = excluded.fetched_at, "
+                "changed_at = excluded.changed_at, extraction = excluded.extraction, "
+                "links = COALESCE(excluded.links, links)",
+                (
+                    url,
+                    etag,
+                    last_modified,
+                    new_hash,
+                    status,
+                    now,
+                    now if changed else previous.changed_at,
+                    json.dumps(extraction) if extraction is not None else None,
+                    json.dumps(list(links)) if links is not None else None,
+                ),
+            )
+            self._conn.commit()
+        return changed
+
+    def record_check(
+        self,
+        check: PageCheck,
+        extraction: Optional[Any] = None,
+        links: Optional[Iterable[str]] = None,
+    ) -> bool:
+        """Store the validators and hash of a page checked with check_page()."""
+        return self.record(
+            check.url,
+            etag=check.etag,
+            last_modified=check.last_modified,
+            status=check.status,
+            extraction=extraction,
+            hash_=check.content_hash,
+            links=links,
+        )
+
+    def touch(self, url: str, status: int = 304) -> None:
+        """Mark an unchanged page as checked now."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ?, status = ? WHERE url = ?",
+                (time.time(), status, url),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+async def check_page(url: str, store: CrawlStateStore, client: httpx.AsyncClient) -> PageCheck:
+    """Conditional GET of url against its stored state; unchanged pages are touched."""
+    state = store.get(url)
+    headers = store.conditional_headers(url)
+    response = await client.get(url, headers=headers, follow_redirects=True)
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+
+    if response.status_code == 304 and state is not None:
+        store.touch(url, 304)
+        return PageCheck(url, False, 304, state.etag, state.last_modified, state.content_hash)
+
+    body = response.content
+    body_hash = content_hash(body)
+    unchanged = (
+        response.status_code == 200 and state is not None and state.content_hash == body_hash
+    )
+    if unchanged:
+        store.touch(url, 200)
+    return PageCheck(url, not unchanged, response.status_code, etag, last_modified, body_hash, body)
+
+
+async def check_pages(
+    urls: Iterable[str],
+    store: CrawlStateStore,
+    max_concurrency: int = 16,
+    timeout: float = 30,
+) -> List[PageCheck]:
+    """Conditional GETs for many URLs on one pooled HTTP client."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+
+        async def check(url: str) -> PageCheck:
+            async with semaphore:
+                try:
+                    return await check_page(url, store, client)
+                except httpx.HTTPError:
+                    return PageCheck(url, True, 0)  # let the real crawl report the error
+
+        return await asyncio.gather(*(check(url) for url in urls))
+
+
+def changed_pages(urls: Iterable[str], store: CrawlStateStore, **kwargs) -> List[PageCheck]:
+    """Checks of the URLs that changed since the last recorded crawl (blocking).
+
+    Record each page with store.record_check() once it has been processed, so a
+    failed run is retried next time.
+    """
+    return [check for check in asyncio.run(check_pages(urls, store, **kwargs)) if check.changed]
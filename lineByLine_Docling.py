@@ -3,7 +3,7 @@
 import xml.etree.ElementTree as ET
 from typing import List
 from urllib.parse import urljoin
-from docling.document_converter import DocumentConverter
+from Docling.conversion_engine import ConversionEngine
 import requests
 
 
@@ -28,14 +28,13 @@ urls = ["https://www.grasca.si/gorsko-kolo-scott-spark-920-23",
         "https://www.grasca.si/gorsko-kolo-scott-spark-930-or-22-s",
         "https://www.grasca.si/kolesa/cestno-kolo-scott-addict-rc-30-cr-25"]
 
-        
-converter = DocumentConverter()
-
-conv_results_iter = converter.convert_all(urls)
 
-docs = []
-for result in conv_results_iter:
-    if result.document:
-        document = result.document
-        markdown_output = document.export_to_markdown()
-        docs.append(markdown_output)
+# Convert on a pool of worker processes, each with a warm DocumentConverter.
+# The guard keeps spawned workers from re-running this script.
+if __name__ == "__main__":
+    docs = []
+    with ConversionEngine() as engine:
+        for output in engine.convert_all(urls):
+            if output.document:
+                markdown_output = output.document.export_to_markdown()
+                docs.append(markdown_output)
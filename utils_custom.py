@@ -1,13 +1,215 @@
+import gzip
+import io
+import logging
+import queue
+import threading
 import xml.etree.ElementTree as ET
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple, Union
 from urllib.parse import urljoin
 
 import requests
 
+logger = logging.getLogger(__name__)
+
+# Maximum number of parsed entries buffered ahead of the consumer
+ENTRY_BUFFER_SIZE = 1000
+_DONE = object()
+
+
+@dataclass
+class SitemapEntry:
+    """One <url> of a sitemap, or one <sitemap> of a sitemap index."""
+
+    url: str
+    lastmod: Optional[datetime] = None
+    changefreq: Optional[str] = None
+    priority: Optional[float] = None
+
+
+def _local_name(tag: str) -> str:
+    """Tag without its XML namespace."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Parse a W3C datetime (2024-05-01, 2024-05-01T10:00:00+02:00, ...Z) as UTC."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _as_utc(moment: Optional[Union[datetime, str]]) -> Optional[datetime]:
+    if moment is None or (isinstance(moment, datetime) and moment.tzinfo is not None):
+        return moment
+    if isinstance(moment, str):
+        return parse_lastmod(moment)
+    return moment.replace(tzinfo=timezone.utc)
+
+
+def _open_sitemap(url: str, session: requests.Session, timeout: float):
+    """Open a sitemap as a byte stream, transparently un-gzipping .xml.gz files."""
+    response = session.get(url, stream=True, timeout=timeout)
+    response.raise_for_status()
+    # Content-Encoding: gzip is decoded by urllib3; a gzip *file* is not
+    response.raw.decode_content = True
+    # Let the buffered reader see EOF instead of a closed file
+    response.raw.auto_close = False
+    stream = io.BufferedReader(response.raw, buffer_size=64 * 1024)
+    # Sniff the gzip magic bytes rather than trusting the .gz extension, since
+    # some servers also send such files with Content-Encoding: gzip
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        return response, gzip.GzipFile(fileobj=stream)
+    return response, stream
+
+
+def iter_sitemap(source) -> Iterator[Tuple[str, SitemapEntry]]:
+    """Incrementally parse one sitemap or sitemap index.
+
+    Elements are cleared as soon as they are read, so memory stays flat however
+    large the file is.
+
+    Args:
+        source: File name or binary file object with the sitemap XML
+
+    Yields:
+        ("url", entry) for pages and ("sitemap", entry) for child sitemaps
+    """
+    root = None
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            continue
+        kind = _local_name(elem.tag)
+        if kind not in ("url", "sitemap"):
+            continue
+        fields = {_local_name(child.tag): (child.text or "").strip() for child in elem}
+        if fields.get("loc"):
+            priority = fields.get("priority")
+            try:
+                priority = float(priority) if priority else None
+            except ValueError:
+                priority = None
+            yield kind, SitemapEntry(
+                url=fields["loc"],
+                lastmod=parse_lastmod(fields.get("lastmod")),
+                changefreq=fields.get("changefreq") or None,
+                priority=priority,
+            )
+        # Drop everything parsed so far
+        root.clear()
+
+
+def iter_sitemap_entries(
+    sitemap_url: str,
+    since: Optional[Union[datetime, str]] = None,
+    include_undated: bool = True,
+    max_workers: int = 4,
+    timeout: float = 30,
+    session: Optional[requests.Session] = None,
+) -> Iterator[SitemapEntry]:
+    """Stream the page entries of a sitemap, following sitemap indexes concurrently.
+
+    Args:
+        sitemap_url: URL of a sitemap, sitemap index, or either gzipped (.xml.gz)
+        since: Only yield pages whose lastmod is at or after this moment; child
+            sitemaps with an older lastmod are not downloaded at all
+        include_undated: With since, also yield pages that have no lastmod
+        max_workers: Number of sitemaps downloaded and parsed at the same time
+        timeout: Seconds to wait for each sitemap response
+        session: requests session to reuse connections (default: a new one)
+
+    Yields:
+        SitemapEntry for every page, in no particular order across sitemaps
+
+    Raises:
+        requests.RequestException or ET.ParseError from the top-level sitemap;
+        a child sitemap that fails (e.g. 404) is logged and skipped
+    """
+    since = _as_utc(since)
+    session = session or requests.Session()
+    entries: queue.Queue = queue.Queue(maxsize=ENTRY_BUFFER_SIZE)
+    stop = threading.Event()
+    lock = threading.Lock()
+    seen = set()
+    pending = 0
+    executor = ThreadPoolExecutor(max_workers, thread_name_prefix="sitemap")
+
+    def put(item) -> None:
+        # Blocks while the consumer is behind, gives up once it has stopped
+        while not stop.is_set():
+            try:
+                entries.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def submit(url: str) -> None:
+        nonlocal pending
+        with lock:
+            if url in seen:
+                return
+            seen.add(url)
+            pending += 1
+        executor.submit(parse, url)
+
+    def parse(url: str) -> None:
+        nonlocal pending
+        try:
+            response, stream = _open_sitemap(url, session, timeout)
+            with response:
+                for kind, entry in iter_sitemap(stream):
+                    if stop.is_set():
+                        return
+                    if kind == "sitemap":
+                        if since is None or entry.lastmod is None or entry.lastmod >= since:
+                            submit(urljoin(url, entry.url))
+                    elif since is None or (
+                        entry.lastmod >= since if entry.lastmod else include_undated
+                    ):
+                        put(entry)
+        except Exception as e:
+            if url != sitemap_url:
+                # One broken child sitemap should not lose the pages of the others
+                logger.warning("Skipping sitemap %s: %s", url, e)
+            else:
+                put(e)
+        finally:
+            with lock:
+                pending -= 1
+                finished = pending == 0
+            if finished:
+                put(_DONE)
+
+    submit(sitemap_url)
+    try:
+        while (item := entries.get()) is not _DONE:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
 
 def get_sitemap_urls(base_url: str, sitemap_filename: str = "sitemap.xml") -> List[str]:
     """Fetches and parses a sitemap XML file to extract URLs.
 
+    Sitemap indexes are followed and gzipped sitemaps are supported; use
+    iter_sitemap_entries() directly to stream entries or filter on lastmod.
+
     Args:
         base_url: The base URL of the website
         sitemap_filename: The filename of the sitemap (default: sitemap.xml)
@@ -21,32 +223,17 @@ def get_sitemap_urls(base_url: str, sitemap_filename: str = "sitemap.xml") -> Li
     """
     try:
         sitemap_url = urljoin(base_url, sitemap_filename)
+        return [entry.url for entry in iter_sitemap_entries(sitemap_url, timeout=10)]
 
-        # Fetch sitemap URL
-        response = requests.get(sitemap_url, timeout=10)
-
+    except requests.HTTPError as e:
         # # Return just the base URL if sitemap not found
-        if response.status_code == 404:
+        response = e.response
+        requested = response.history[0].url if response is not None and response.history else None
+        if response is not None and response.status_code == 404 and (
+            (requested or response.url) == sitemap_url
+        ):
             return [base_url.rstrip("/")]
-
-        response.raise_for_status()
-
-        # Parse XML content
-        root = ET.fromstring(response.content)
-
-        # Handle different XML namespaces that sitemaps might use
-        namespaces = (
-            {"ns": root.tag.split("}")[0].strip("{")} if "}" in root.tag else ""
-        )
-
-        # Extract URLs using namespace if present
-        if namespaces:
-            urls = [elem.text for elem in root.findall(".//ns:loc", namespaces)]
-        else:
-            urls = [elem.text for elem in root.findall(".//loc")]
-
-        return urls
-
+        raise ValueError(f"Failed to fetch sitemap: {str(e)}")
     except requests.RequestException as e:
         raise ValueError(f"Failed to fetch sitemap: {str(e)}")
     except ET.ParseError as e:
@@ -56,4 +243,4 @@ def get_sitemap_urls(base_url: str, sitemap_filename: str = "sitemap.xml") -> Li
 
 
 if __name__ == "__main__":
-    print(get_sitemap_urls("https://ds4sd.github.io/docling/"))
\ No newline at end of file
+    print(get_sitemap_urls("https://ds4sd.github.io/docling/"))